@@ -1,31 +1,71 @@
+import json
+import logging
 from datetime import datetime
-from typing import List, Optional
-
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import func
-from sqlalchemy.orm import Session, selectinload
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Query,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from starlette.background import BackgroundTask
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import AsyncSessionLocal, get_db
+from app.core.write_queue import get_write_queue
 from app.models.models import (
+    utcnow,
     User,
     Conversation,
     Message,
     Document,
     ConversationDocument,
 )
+from app.api.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
 from app.api.schemas import (
     ConversationCreate,
     ConversationRead,
     ConversationListItem,
+    GenerationJobRead,
     MessageCreate,
     MessageRead,
 )
-from app.services.context_builder import build_message_history, build_rag_context
-from app.services.llm_client import generate_reply
+from app.services.context_builder import build_message_history, build_rag_passages
+from app.services.generation_jobs import (
+    JOB_QUEUED,
+    QueuedJob,
+    complete_generation_job,
+    create_generation_job,
+    get_generation_pool,
+    register_job_handler,
+)
+from app.services.llm_client import agenerate_reply, astream_reply, estimate_tokens
+from app.services.prompt_packer import PackedPrompt, pack_prompt
+from app.services.rate_limiter import RateLimitExceeded, admit_turn, record_turn_usage
+from app.services.usage import record_reply_usage
+from app.services.summarizer import (
+    compact_conversation,
+    might_need_compaction,
+    schedule_compaction,
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["conversations"])
 
+MESSAGE_PAGE_SIZE = 100
+
 def get_user_or_404(db: Session, user_id: int) -> User:
     user = db.get(User, user_id)
     if not user:
@@ -37,12 +77,7 @@ def get_user_or_404(db: Session, user_id: int) -> User:
 
 
 def get_conversation_or_404(db: Session, conversation_id: int) -> Conversation:
-    conversation = (
-        db.query(Conversation)
-        .options(selectinload(Conversation.messages))
-        .filter(Conversation.id == conversation_id)
-        .first()
-    )
+    conversation = db.get(Conversation, conversation_id)
     if not conversation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -51,125 +86,443 @@ def get_conversation_or_404(db: Session, conversation_id: int) -> Conversation:
     return conversation
 
 
-def get_next_order_index(db: Session, conversation_id: int) -> int:
-    count = (
-        db.query(func.count(Message.id))
-        .filter(Message.conversation_id == conversation_id)
-        .scalar()
-    )
-    if not count:
-        return 1
-    return count + 1
+def allocate_order_index(db: Session, conversation_id: int, count: int = 1) -> int:
+    """
+    Reserve the next `count` order_index values for messages in the
+    conversation and return the first one.
+
+    A single UPDATE ... RETURNING bumps `next_seq` and the denormalized
+    message metadata, so the cost does not depend on conversation length
+    and concurrent writers are serialized by the row update. Must run in
+    the same transaction as the message inserts.
+    """
+    now = utcnow()
+    next_seq = db.execute(
+        update(Conversation)
+        .where(Conversation.id == conversation_id)
+        .values(
+            next_seq=Conversation.next_seq + count,
+            message_count=Conversation.message_count + count,
+            last_message_at=now,
+            updated_at=now,
+        )
+        .returning(Conversation.next_seq)
+    ).scalar_one()
+    return next_seq - count
+
+
+SYSTEM_PROMPT = (
+    "You are a helpful assistant inside a backend conversation service. "
+    "Always respond clearly and concisely."
+)
+
+GROUNDING_INSTRUCTIONS = (
+    "Use ONLY the information from the provided context when it is relevant. "
+    "If the answer is not in the context, say you are unsure instead of guessing."
+)
 
 
-def _maybe_generate_assistant_reply(
+def _prepare_assistant_turn(
     db: Session,
     conversation: Conversation,
-) -> Message:
+    user_content: Optional[str] = None,
+    document_ids: Optional[List[int]] = None,
+    until_order_index: Optional[int] = None,
+) -> PackedPrompt:
     """
-    Build context, call LLM, and persist the assistant's reply as the next message.
+    Build the LLM input for the next assistant turn, packed into the
+    model's prompt token budget.
+
+    `user_content` is a user message not stored yet; it is appended to the
+    stored history in memory. A conversation without an id is one being
+    created, whose only history is that message and whose documents are
+    `document_ids`. With `until_order_index` the turn answers the stored
+    message at that index: later messages are left out of the history.
     """
-  
-    db.refresh(conversation)
-
-    history = build_message_history(
-        conversation,
-        max_messages=settings.MAX_HISTORY_MESSAGES,
-    )
+    history: List[Dict[str, Any]] = []
+    if conversation.id is not None:
+        history = build_message_history(
+            db,
+            conversation,
+            max_messages=settings.MAX_HISTORY_MESSAGES - (user_content is not None),
+            until_order_index=until_order_index,
+        )
+    if user_content is not None:
+        history.append(
+            {
+                "role": "user",
+                "content": user_content,
+                "token_count": estimate_tokens(user_content),
+            }
+        )
 
-    context_text: Optional[str] = None
+    passages: List[Tuple[str, int]] = []
     if conversation.mode.lower() in ("grounded", "rag"):
-        context_text = build_rag_context(
+        last_user_message = next(
+            (m["content"] for m in reversed(history) if m["role"] == "user"),
+            None,
+        )
+        passages = build_rag_passages(
             db,
             conversation,
-            max_chars=settings.MAX_CONTEXT_CHARS,
+            query_text=last_user_message,
+            document_ids=document_ids,
         )
 
-    system_prompt = (
-        "You are a helpful assistant inside a backend conversation service. "
-        "Always respond clearly and concisely."
+    return pack_prompt(
+        SYSTEM_PROMPT,
+        history,
+        passages,
+        context_instructions=GROUNDING_INSTRUCTIONS,
     )
-    if context_text:
-        system_prompt += (
-            " Use ONLY the information from the provided context when it is relevant. "
-            "If the answer is not in the context, say you are unsure instead of guessing."
+
+
+def _message_row(
+    conversation_id: int,
+    role: str,
+    content: str,
+    order_index: int,
+    usage: Optional[Dict[str, int]] = None,
+) -> Dict[str, Any]:
+    usage = usage or {}
+    return {
+        "conversation_id": conversation_id,
+        "role": role,
+        "content": content,
+        "order_index": order_index,
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "completion_tokens": usage.get("completion_tokens"),
+        "model": settings.LLM_MODEL_NAME if role == "assistant" else None,
+        "token_count": estimate_tokens(content),
+    }
+
+
+def _insert_messages(db: Session, rows: List[Dict[str, Any]]) -> List[MessageRead]:
+    """
+    Write message rows with one multi-row INSERT ... RETURNING and build
+    their responses from the values in hand plus the returned id and
+    created_at; nothing is read back.
+    """
+    returned = {
+        r.order_index: r
+        for r in db.execute(
+            insert(Message)
+            .values(rows)
+            .returning(Message.id, Message.order_index, Message.created_at)
         )
+    }
+    return [
+        MessageRead(
+            **row,
+            id=returned[row["order_index"]].id,
+            created_at=returned[row["order_index"]].created_at,
+        )
+        for row in rows
+    ]
+
+
+def _store_assistant_reply(
+    db: Session,
+    conversation_id: int,
+    user_id: int,
+    reply_text: str,
+    usage: Dict[str, int],
+) -> MessageRead:
+    """
+    Persist the assistant's reply as the next message and count it in the
+    user's usage rollup (write-queue job).
+    """
+    order_index = allocate_order_index(db, conversation_id)
+    (assistant_msg,) = _insert_messages(
+        db, [_message_row(conversation_id, "assistant", reply_text, order_index, usage)]
+    )
+    record_reply_usage(db, user_id, [assistant_msg])
+    return assistant_msg
+
+
+def _store_turn(
+    db: Session,
+    conversation_id: int,
+    user_id: int,
+    user_content: str,
+    reply_text: str,
+    usage: Dict[str, int],
+) -> Tuple[MessageRead, MessageRead]:
+    """
+    Persist a user message and the assistant's reply together
+    (write-queue job): one UPDATE reserves both order_index values, one
+    INSERT writes both rows and one upsert counts the reply in the user's
+    usage rollup.
+    """
+    order_index = allocate_order_index(db, conversation_id, count=2)
+    user_msg, assistant_msg = _insert_messages(
+        db,
+        [
+            _message_row(conversation_id, "user", user_content, order_index),
+            _message_row(conversation_id, "assistant", reply_text, order_index + 1, usage),
+        ],
+    )
+    record_reply_usage(db, user_id, [assistant_msg])
+    return user_msg, assistant_msg
+
+
+async def _generate_reply(
+    db: AsyncSession,
+    conversation: Conversation,
+    user_content: str,
+    document_ids: Optional[List[int]] = None,
+) -> Tuple[str, Dict[str, int]]:
+    """
+    Build context for the pending user message and call the LLM.
 
-    reply_text, usage = generate_reply(
-        messages=history,
-        system_prompt=system_prompt,
-        context=context_text,
+    Nothing is written here: the caller stores the user message and the
+    reply in one transaction afterwards. `db` is closed once the prompt is
+    built, so neither a thread nor a pooled connection is held while the
+    provider is generating; `conversation` stays readable detached.
+    """
+    prompt = await db.run_sync(
+        _prepare_assistant_turn, conversation, user_content, document_ids
     )
+    await db.close()
+    return await _complete_prompt(conversation, prompt)
+
 
-    order_index = get_next_order_index(db, conversation.id)
-    assistant_msg = Message(
-        conversation_id=conversation.id,
-        role="assistant",
-        content=reply_text,
-        order_index=order_index,
-        prompt_tokens=usage.get("prompt_tokens"),
-        completion_tokens=usage.get("completion_tokens"),
+async def _complete_prompt(
+    conversation: Conversation,
+    prompt: PackedPrompt,
+) -> Tuple[str, Dict[str, int]]:
+    reply_text, usage = await agenerate_reply(
+        messages=prompt.messages,
+        system_prompt=prompt.system_prompt,
+        context=prompt.context,
+        prompt_tokens=prompt.prompt_tokens,
+        use_cache=conversation.cache_enabled,
     )
-    db.add(assistant_msg)
-    db.commit()
-    db.refresh(assistant_msg)
+    record_turn_usage(conversation.user_id, usage)
+    return reply_text, usage
+
 
+def _add_user_message(
+    db: Session,
+    conversation_id: int,
+    content: str,
+) -> MessageRead:
+    order_index = allocate_order_index(db, conversation_id)
+    (user_msg,) = _insert_messages(
+        db, [_message_row(conversation_id, "user", content, order_index)]
+    )
+    return user_msg
+
+
+def _enqueue_turn(
+    db: Session,
+    conversation_id: int,
+    user_id: int,
+    content: str,
+) -> Tuple[MessageRead, QueuedJob]:
+    """
+    Store the user message of an async turn and its generation job
+    together (write-queue job).
+    """
+    user_msg = _add_user_message(db, conversation_id, content)
+    return user_msg, create_generation_job(db, conversation_id, user_id, user_msg.id)
+
+
+def _store_job_reply(
+    db: Session,
+    job: QueuedJob,
+    reply_text: str,
+    usage: Dict[str, int],
+) -> MessageRead:
+    """
+    Persist the reply of an async turn and mark its job succeeded in the
+    same transaction (write-queue job).
+    """
+    assistant_msg = _store_assistant_reply(
+        db, job.conversation_id, job.user_id, reply_text, usage
+    )
+    complete_generation_job(db, job.id, assistant_msg.id)
     return assistant_msg
 
-@router.post(
-    "/conversations",
-    response_model=ConversationRead,
-    status_code=status.HTTP_201_CREATED,
-)
-def create_conversation(
-    payload: ConversationCreate,
-    db: Session = Depends(get_db),
-):
+
+async def _run_generation_job(job: QueuedJob) -> None:
     """
-    Create a new conversation with the first user message.
-    Automatically generates an assistant reply using the LLM.
+    Generate and store the reply of an async turn (generation worker). The
+    session is closed before the LLM call, so no connection is held while
+    the provider is generating.
+
+    The prompt is built from the history up to the job's own user message,
+    so turns queued after it do not leak into its reply.
     """
- 
-    user = get_user_or_404(db, payload.user_id)
+    async with AsyncSessionLocal() as db:
+        conversation = await db.run_sync(get_conversation_or_404, job.conversation_id)
+        user_order_index = await db.scalar(
+            select(Message.order_index).where(Message.id == job.user_message_id)
+        )
+        prompt = await db.run_sync(
+            _prepare_assistant_turn,
+            conversation,
+            until_order_index=user_order_index,
+        )
+
+    reply_text, usage = await _complete_prompt(conversation, prompt)
+    assistant_msg = await get_write_queue().submit(_store_job_reply, job, reply_text, usage)
+    if might_need_compaction(assistant_msg.order_index):
+        schedule_compaction(job.conversation_id)
+
+
+register_job_handler(_run_generation_job)
 
+
+async def _stream_assistant_reply(
+    conversation: Conversation,
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Stream the assistant's reply for the conversation.
+
+    Yields ("delta", text) for each chunk as it arrives, then
+    ("done", MessageRead) once the reply and its token counts are stored.
+    The prompt is built in a short-lived session, so no connection is held
+    while tokens stream; the reply is stored through the write queue.
+    """
+    async with AsyncSessionLocal() as db:
+        prompt = await db.run_sync(_prepare_assistant_turn, conversation)
+
+    stream = astream_reply(
+        messages=prompt.messages,
+        system_prompt=prompt.system_prompt,
+        context=prompt.context,
+        prompt_tokens=prompt.prompt_tokens,
+        use_cache=conversation.cache_enabled,
+    )
+    async for delta in stream:
+        yield "delta", delta
+    record_turn_usage(conversation.user_id, stream.usage)
+
+    assistant_msg = await get_write_queue().submit(
+        _store_assistant_reply,
+        conversation.id,
+        conversation.user_id,
+        stream.text,
+        stream.usage or {},
+    )
+    yield "done", assistant_msg
+
+
+def _sse_event(event: str, data: Any) -> str:
+    if isinstance(data, BaseModel):
+        payload = data.model_dump_json()
+    else:
+        payload = json.dumps(data)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def _check_new_conversation(db: Session, payload: ConversationCreate) -> None:
+    """
+    Reject a conversation for an unknown user or documents before any
+    LLM call is made.
+    """
+    get_user_or_404(db, payload.user_id)
+
+    if payload.document_ids:
+        found = set(
+            db.scalars(
+                select(Document.id).where(Document.id.in_(payload.document_ids))
+            ).all()
+        )
+        for doc_id in payload.document_ids:
+            if doc_id not in found:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Document with id {doc_id} not found",
+                )
+
+
+def _create_conversation_rows(
+    db: Session,
+    payload: ConversationCreate,
+    reply_text: str,
+    usage: Dict[str, int],
+) -> ConversationRead:
+    """
+    Insert the conversation, its first exchange and document links in one
+    transaction (write-queue job) and build the response from the new rows.
+    """
     title = payload.title or payload.first_message[:80] 
+    now = utcnow()
     conversation = Conversation(
-        user_id=user.id,
+        user_id=payload.user_id,
         mode=payload.mode,
         title=title,
+        cache_enabled=payload.cache_enabled,
+        # The first exchange (order_index 1 and 2) is accounted for up front.
+        next_seq=3,
+        message_count=2,
+        last_message_at=now,
+        updated_at=now,
     )
     db.add(conversation)
     db.flush() 
 
-    first_msg = Message(
-        conversation_id=conversation.id,
-        role="user",
-        content=payload.first_message,
-        order_index=1,
+    messages = _insert_messages(
+        db,
+        [
+            _message_row(conversation.id, "user", payload.first_message, 1),
+            _message_row(conversation.id, "assistant", reply_text, 2, usage),
+        ],
+    )
+    record_reply_usage(db, payload.user_id, messages[1:])
+    db.add_all(
+        ConversationDocument(conversation_id=conversation.id, document_id=doc_id)
+        for doc_id in dict.fromkeys(payload.document_ids or [])
+    )
+    db.flush()
+
+    return ConversationRead(
+        id=conversation.id,
+        user_id=conversation.user_id,
+        mode=conversation.mode,
+        title=conversation.title,
+        is_archived=conversation.is_archived,
+        cache_enabled=conversation.cache_enabled,
+        created_at=conversation.created_at,
+        updated_at=conversation.updated_at,
+        messages=messages,
     )
-    db.add(first_msg)
 
-    if payload.document_ids:
-        for doc_id in payload.document_ids:
-            document = db.get(Document, doc_id)
-            if not document:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Document with id {doc_id} not found",
-                )
-            link = ConversationDocument(
-                conversation_id=conversation.id,
-                document_id=document.id,
-            )
-            db.add(link)
 
-    db.commit()
-    db.refresh(conversation)
+def _delete_conversation_rows(db: Session, conversation_id: int) -> None:
+    db.delete(get_conversation_or_404(db, conversation_id))
+    db.flush()
 
-    assistant_msg = _maybe_generate_assistant_reply(db, conversation)
 
-    conversation = get_conversation_or_404(db, conversation.id)
-    messages = [MessageRead.from_orm(m) for m in conversation.messages]
+def _conversation_read(
+    db: Session,
+    conversation_id: int,
+    limit: int = MESSAGE_PAGE_SIZE,
+    after_order_index: int = 0,
+) -> Tuple[ConversationRead, Optional[str]]:
+    """
+    Build a conversation response with one page of messages (oldest first)
+    and the cursor of the next page, if any.
+    """
+    conversation = get_conversation_or_404(db, conversation_id)
+
+    rows = (
+        db.query(Message)
+        .filter(Message.conversation_id == conversation_id)
+        .filter(Message.order_index > after_order_index)
+        .order_by(Message.order_index)
+        .limit(limit + 1)
+        .all()
+    )
+
+    next_cursor: Optional[str] = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].order_index)
+
+    messages = [MessageRead.from_orm(m) for m in rows]
 
     return ConversationRead(
         id=conversation.id,
@@ -177,147 +530,354 @@ def create_conversation(
         mode=conversation.mode,
         title=conversation.title,
         is_archived=conversation.is_archived,
+        cache_enabled=conversation.cache_enabled,
         created_at=conversation.created_at,
         updated_at=conversation.updated_at,
         messages=messages,
+    ), next_cursor
+
+
+@router.post(
+    "/conversations",
+    response_model=ConversationRead,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_conversation(
+    payload: ConversationCreate,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Create a new conversation with the first user message.
+    Automatically generates an assistant reply using the LLM.
+    """
+    await db.run_sync(_check_new_conversation, payload)
+    admit_turn(payload.user_id)
+
+    draft = Conversation(
+        user_id=payload.user_id, mode=payload.mode, cache_enabled=payload.cache_enabled
+    )
+    reply_text, usage = await _generate_reply(
+        db, draft, payload.first_message, payload.document_ids or []
+    )
+
+    conversation_read = await get_write_queue().submit(
+        _create_conversation_rows, payload, reply_text, usage
     )
+    assistant_msg = conversation_read.messages[-1]
+    if might_need_compaction(assistant_msg.order_index):
+        background_tasks.add_task(compact_conversation, conversation_read.id)
+    return conversation_read
 
 
 @router.post(
     "/conversations/{conversation_id}/messages",
     response_model=MessageRead,
     status_code=status.HTTP_201_CREATED,
+    responses={202: {"model": GenerationJobRead, "description": "Reply queued (async=true)"}},
 )
-def add_message_to_conversation(
+async def add_message_to_conversation(
     conversation_id: int,
     payload: MessageCreate,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    async_reply: bool = Query(False, alias="async"),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Add a new user message to an existing conversation and
     automatically append an assistant reply.
+
+    With `async=true` the user message is stored, the reply is queued for a
+    background worker and 202 returns the job; poll `GET /jobs/{id}`
+    (optionally with `wait=` seconds) for the assistant message.
+
+    Once the conversation outgrows the recent-history window, older turns
+    are folded into its rolling summary after the response is sent.
     """
-    conversation = get_conversation_or_404(db, conversation_id)
+    conversation = await db.run_sync(get_conversation_or_404, conversation_id)
+    admit_turn(conversation.user_id)
+
+    if async_reply:
+        pool = get_generation_pool()
+        await pool.start()
+        user_msg, job = await get_write_queue().submit(
+            _enqueue_turn, conversation_id, conversation.user_id, payload.content
+        )
+        pool.enqueue(job.id, conversation_id)
+        job_read = GenerationJobRead(
+            id=job.id,
+            conversation_id=conversation_id,
+            status=JOB_QUEUED,
+            attempts=0,
+            user_message_id=user_msg.id,
+            created_at=job.created_at,
+        )
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=job_read.model_dump(mode="json"),
+            headers={"Location": f"/jobs/{job.id}"},
+        )
 
-    order_index = get_next_order_index(db, conversation.id)
+    reply_text, usage = await _generate_reply(db, conversation, payload.content)
 
-    user_msg = Message(
-        conversation_id=conversation.id,
-        role="user",
-        content=payload.content,
-        order_index=order_index,
+    user_msg, assistant_msg = await get_write_queue().submit(
+        _store_turn,
+        conversation_id,
+        conversation.user_id,
+        payload.content,
+        reply_text,
+        usage,
     )
-    db.add(user_msg)
-    db.commit()
-    db.refresh(conversation)
+    if might_need_compaction(assistant_msg.order_index):
+        background_tasks.add_task(compact_conversation, conversation_id)
 
-    assistant_msg = _maybe_generate_assistant_reply(db, conversation)
+    return user_msg
 
-    return MessageRead.from_orm(user_msg)
+
+@router.post(
+    "/conversations/{conversation_id}/messages/stream",
+    response_class=StreamingResponse,
+)
+async def stream_message_to_conversation(
+    conversation_id: int,
+    payload: MessageCreate,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Add a new user message and stream the assistant reply as Server-Sent Events.
+
+    Events: `message` (the stored user message), `delta` (reply text as it is
+    generated), `done` (the stored assistant message with token counts) or
+    `error`.
+    """
+    conversation = await db.run_sync(get_conversation_or_404, conversation_id)
+    # Release the connection now: dependency teardown only runs once the
+    # whole body has been streamed. `conversation` stays readable detached.
+    await db.close()
+    admit_turn(conversation.user_id)
+    user_msg = await get_write_queue().submit(
+        _add_user_message, conversation_id, payload.content
+    )
+
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            yield _sse_event("message", user_msg)
+            async for kind, data in _stream_assistant_reply(conversation):
+                if kind == "delta":
+                    yield _sse_event("delta", {"delta": data})
+                else:
+                    yield _sse_event("done", data)
+        except Exception:
+            logger.exception("Streaming reply failed for conversation %s", conversation_id)
+            yield _sse_event("error", {"message": "Failed to generate reply"})
+
+    # The assistant reply will take the order_index after the user message.
+    compaction = None
+    if might_need_compaction(user_msg.order_index + 1):
+        compaction = BackgroundTask(compact_conversation, conversation_id)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=compaction,
+    )
+
+
+@router.websocket("/conversations/{conversation_id}/ws")
+async def conversation_websocket(
+    websocket: WebSocket,
+    conversation_id: int,
+):
+    """
+    Chat over a WebSocket.
+
+    The client sends {"content": "..."} per turn; the server answers with
+    {"type": "message"} (stored user message), a series of
+    {"type": "delta", "delta": "..."} and finally {"type": "done"}
+    carrying the stored assistant message, or {"type": "error"} if the
+    reply failed; the socket stays open for the next turn.
+    """
+    await websocket.accept()
+
+    try:
+        while True:
+            data = await websocket.receive_json()
+            try:
+                payload = MessageCreate.model_validate(data)
+            except ValidationError as exc:
+                await websocket.send_json(
+                    {"type": "error", "message": "Invalid message", "details": exc.errors()}
+                )
+                continue
+
+            try:
+                async with AsyncSessionLocal() as db:
+                    conversation = await db.run_sync(
+                        get_conversation_or_404, conversation_id
+                    )
+            except HTTPException as exc:
+                await websocket.send_json({"type": "error", "message": exc.detail})
+                await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+                return
+
+            try:
+                admit_turn(conversation.user_id)
+            except RateLimitExceeded as exc:
+                await websocket.send_json(
+                    {
+                        "type": "error",
+                        "message": "Rate limit exceeded",
+                        "reason": exc.reason,
+                        "retry_after": exc.retry_after,
+                    }
+                )
+                continue
+
+            user_msg = await get_write_queue().submit(
+                _add_user_message, conversation_id, payload.content
+            )
+            await websocket.send_json(
+                {"type": "message", "message": user_msg.model_dump(mode="json")}
+            )
+
+            try:
+                async for kind, event_data in _stream_assistant_reply(conversation):
+                    if kind == "delta":
+                        await websocket.send_json({"type": "delta", "delta": event_data})
+                    else:
+                        await websocket.send_json(
+                            {"type": "done", "message": event_data.model_dump(mode="json")}
+                        )
+                        if might_need_compaction(event_data.order_index):
+                            schedule_compaction(conversation_id)
+            except WebSocketDisconnect:
+                raise
+            except Exception:
+                # The user message is stored; report the failed reply and
+                # keep the socket open for the next turn.
+                logger.exception(
+                    "Streaming reply failed for conversation %s", conversation_id
+                )
+                await websocket.send_json(
+                    {"type": "error", "message": "Failed to generate reply"}
+                )
+    except WebSocketDisconnect:
+        logger.info("WebSocket closed for conversation %s", conversation_id)
+
+
+def _conversation_page_query(
+    user_id: int,
+    limit: int,
+    after: Optional[Sequence[Any]] = None,
+):
+    """
+    Keyset page of a user's active conversations, most recently updated
+    first. `after` is the (updated_at, id) of the last row already seen.
+    """
+    query = (
+        select(Conversation)
+        .where(Conversation.user_id == user_id)
+        .where(Conversation.is_archived == False)
+    )
+    if after is not None:
+        updated_at, last_id = after
+        query = query.where(
+            or_(
+                Conversation.updated_at < updated_at,
+                and_(
+                    Conversation.updated_at == updated_at,
+                    Conversation.id < last_id,
+                ),
+            )
+        )
+    return query.order_by(Conversation.updated_at.desc(), Conversation.id.desc()).limit(limit)
 
 
 @router.get(
     "/users/{user_id}/conversations",
     response_model=List[ConversationListItem],
 )
-def list_conversations_for_user(
+async def list_conversations_for_user(
     user_id: int,
-    limit: int = 20,
-    offset: int = 0,
-    db: Session = Depends(get_db),
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
 ):
     """
-    List conversations for a given user with pagination.
+    List conversations for a given user with keyset pagination.
     Sorted by most recently updated.
-    """
-    get_user_or_404(db, user_id)
 
+    Pass the `X-Next-Cursor` response header back as `cursor` to get the
+    next page; the header is absent on the last page.
+    """
+    after = decode_cursor(cursor, datetime, int) if cursor else None
     conversations = (
-        db.query(Conversation)
-        .filter(Conversation.user_id == user_id)
-        .filter(Conversation.is_archived == False) 
-        .order_by(Conversation.updated_at.desc())
-        .offset(offset)
-        .limit(limit)
-        .all()
-    )
-
-    result: List[ConversationListItem] = []
-    for conv in conversations:
-        last_message_at: Optional[datetime] = (
-            db.query(func.max(Message.created_at))
-            .filter(Message.conversation_id == conv.id)
-            .scalar()
-        )
-
-        result.append(
-            ConversationListItem(
-                id=conv.id,
-                user_id=conv.user_id,
-                mode=conv.mode,
-                title=conv.title,
-                is_archived=conv.is_archived,
-                created_at=conv.created_at,
-                updated_at=conv.updated_at,
-                last_message_at=last_message_at,
-            )
+        await db.scalars(_conversation_page_query(user_id, limit + 1, after))
+    ).all()
+
+    if not conversations and not cursor:
+        await db.run_sync(get_user_or_404, user_id)
+
+    if len(conversations) > limit:
+        conversations = conversations[:limit]
+        last = conversations[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.updated_at, last.id)
+
+    return [
+        ConversationListItem(
+            id=conv.id,
+            user_id=conv.user_id,
+            mode=conv.mode,
+            title=conv.title,
+            is_archived=conv.is_archived,
+            created_at=conv.created_at,
+            updated_at=conv.updated_at,
+            last_message_at=conv.last_message_at,
+            message_count=conv.message_count,
         )
-
-    return result
+        for conv in conversations
+    ]
 
 
 @router.get(
     "/conversations/{conversation_id}",
     response_model=ConversationRead,
 )
-def get_conversation_detail(
+async def get_conversation_detail(
     conversation_id: int,
-    db: Session = Depends(get_db),
+    response: Response,
+    limit: int = Query(MESSAGE_PAGE_SIZE, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
 ):
     """
-    Get a single conversation with all its messages.
-    """
-    conversation = get_conversation_or_404(db, conversation_id)
+    Get a single conversation with a page of its messages, oldest first.
 
-    messages = [
-        MessageRead.from_orm(m) for m in conversation.messages
-    ]
+    Pass the `X-Next-Cursor` response header back as `cursor` to get the
+    following messages; the header is absent on the last page.
+    """
+    after_order_index = 0
+    if cursor:
+        (after_order_index,) = decode_cursor(cursor, int)
 
-    return ConversationRead(
-        id=conversation.id,
-        user_id=conversation.user_id,
-        mode=conversation.mode,
-        title=conversation.title,
-        is_archived=conversation.is_archived,
-        created_at=conversation.created_at,
-        updated_at=conversation.updated_at,
-        messages=messages,
+    conversation_read, next_cursor = await db.run_sync(
+        _conversation_read, conversation_id, limit, after_order_index
     )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return conversation_read
 
 
 @router.delete(
     "/conversations/{conversation_id}",
     status_code=status.HTTP_204_NO_CONTENT,
 )
-def delete_conversation(
-    conversation_id: int,
-    db: Session = Depends(get_db),
-):
+async def delete_conversation(conversation_id: int):
     """
     Delete a conversation and all its messages.
     For the assignment, hard delete is OK.
     """
-    conversation = (
-        db.query(Conversation)
-        .filter(Conversation.id == conversation_id)
-        .first()
-    )
-    if not conversation:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Conversation with id {conversation_id} not found",
-        )
-
-    db.delete(conversation)
-    db.commit()
+    await get_write_queue().submit(_delete_conversation_rows, conversation_id)
     return None
\ No newline at end of file
@@ -0,0 +1,45 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, status
+
+from app.core.config import settings
+from app.core.tracing import get_exporter
+from app.api.schemas import TraceRead, TraceSummary
+
+router = APIRouter(prefix="/debug", tags=["debug"])
+
+
+@router.get(
+    "/traces",
+    response_model=List[TraceSummary],
+)
+def list_traces(
+    limit: int = Query(50, ge=1, le=500),
+    min_duration_ms: Optional[float] = Query(None, ge=0),
+):
+    """
+    Most recent request traces, newest first. Use `min_duration_ms` to
+    find slow turns, then fetch one by id for its spans.
+    """
+    traces = get_exporter().recent(settings.TRACE_BUFFER_SIZE)
+    if min_duration_ms is not None:
+        traces = [t for t in traces if (t["duration_ms"] or 0) >= min_duration_ms]
+    return traces[:limit]
+
+
+@router.get(
+    "/traces/{trace_id}",
+    response_model=TraceRead,
+)
+def get_trace(trace_id: str):
+    """
+    One trace with all its spans (request, SQL statements, context
+    building, retrieval and LLM calls), ordered by start time.
+    """
+    trace = get_exporter().get(trace_id)
+    if trace is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Trace {trace_id} not found",
+        )
+    return trace
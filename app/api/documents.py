@@ -1,14 +1,66 @@
-from typing import List
+import mimetypes
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import anyio
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import ValidationError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, undefer
 
+from app.core.config import settings
 from app.core.database import get_db
+from app.core.write_queue import get_write_queue
 from app.models.models import Document, User
-from app.api.schemas import DocumentCreate, DocumentRead
+from app.api.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.api.schemas import (
+    BulkDocumentResponse,
+    BulkDocumentResult,
+    DocumentCreate,
+    DocumentRead,
+    DocumentSummary,
+)
+from app.services.blob_store import (
+    BlobTooLargeError,
+    BlobWriter,
+    StoredBlob,
+    get_blob_store,
+    text_fingerprint,
+)
+from app.services.bulk_import import (
+    BulkDocumentImporter,
+    BulkParseError,
+    JSONRowParser,
+    index_documents,
+)
+from app.services.ingestion import (
+    INDEX_STATUS_PENDING,
+    INDEX_STATUS_READY,
+    ingest_document,
+    mark_document_failed,
+)
 
 router = APIRouter(tags=["documents"])
 
+# Upper bound on the size of a non-file multipart field.
+MAX_FORM_FIELD_BYTES = 64 * 1024
+
+# Bytes per read when streaming document content.
+CONTENT_READ_CHUNK_BYTES = 64 * 1024
+
 
 def get_user_or_404(db: Session, user_id: int) -> User:
     user = db.get(User, user_id)
@@ -20,72 +72,485 @@ def get_user_or_404(db: Session, user_id: int) -> User:
     return user
 
 
-@router.post(
-    "/documents",
-    response_model=DocumentRead,
-    status_code=status.HTTP_201_CREATED,
-)
-def create_document(
-    payload: DocumentCreate,
-    db: Session = Depends(get_db),
-):
+def _create_document_rows(db: Session, payload: DocumentCreate) -> DocumentRead:
     """
-    Create a document for a user.
-    For this assignment, we accept only raw_text (no real file upload).
+    Store an inline document, "pending" until it is indexed (write-queue job).
     """
- 
     get_user_or_404(db, payload.user_id)
 
+    content_hash, size_bytes = text_fingerprint(payload.raw_text)
     document = Document(
         user_id=payload.user_id,
         name=payload.name,
         source_type=payload.source_type or "upload",
         raw_text=payload.raw_text,
-        storage_path=None, 
+        storage_path=None,
+        content_hash=content_hash,
+        size_bytes=size_bytes,
+        index_status=INDEX_STATUS_PENDING,
+    )
+    db.add(document)
+    db.flush()
+    db.refresh(document)
+    return DocumentRead.model_validate(document)
+
+
+def _create_document(payload: DocumentCreate) -> DocumentRead:
+    write = get_write_queue().submit_sync
+    document = write(_create_document_rows, payload)
+    try:
+        ingest_document(write, document.id, raw_text=payload.raw_text)
+    except Exception:
+        write(mark_document_failed, document.id)
+        raise
+    return document.model_copy(update={"index_status": INDEX_STATUS_READY})
+
+
+@router.post(
+    "/documents",
+    response_model=DocumentRead,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_document(payload: DocumentCreate):
+    """
+    Create a document for a user from inline raw_text.
+    Files are uploaded through POST /documents/upload instead.
+
+    Chunking and indexing are CPU-bound, so they run in a worker thread
+    rather than on the event loop; the document and its chunks are written
+    through the write queue in short batches. If indexing fails the
+    document is kept as "failed" and the request errors.
+    """
+    return await anyio.to_thread.run_sync(_create_document, payload)
+
+
+class _MultipartUpload:
+    """
+    Streaming multipart/form-data receiver.
+
+    The `file` part is written straight into the blob store as it arrives;
+    other parts are collected as small text fields.
+    """
+
+    def __init__(self, boundary: bytes):
+        self.fields: Dict[str, str] = {}
+        self.filename: Optional[str] = None
+        self.blob: Optional[StoredBlob] = None
+        self._writer: Optional[BlobWriter] = None
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._part_name: Optional[str] = None
+        self._part_data = bytearray()
+        self.parser = MultipartParser(
+            boundary,
+            callbacks={
+                "on_part_begin": self._on_part_begin,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+            },
+        )
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+        self._part_name = None
+        self._part_data = bytearray()
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._part_name = options.get(b"name", b"").decode("utf-8", errors="replace")
+        if self._part_name == "file" and self._writer is None and self.blob is None:
+            self.filename = options.get(b"filename", b"").decode("utf-8", errors="replace")
+            self._writer = get_blob_store().writer(max_bytes=settings.MAX_UPLOAD_BYTES)
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._writer is not None:
+            self._writer.write(data[start:end])
+            return
+        self._part_data += data[start:end]
+        if len(self._part_data) > MAX_FORM_FIELD_BYTES:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Form field '{self._part_name}' is too large",
+            )
+
+    def _on_part_end(self) -> None:
+        if self._writer is not None:
+            self.blob = self._writer.commit()
+            self._writer = None
+        elif self._part_name:
+            self.fields[self._part_name] = self._part_data.decode("utf-8", errors="replace")
+
+    def abort(self) -> None:
+        if self._writer is not None:
+            self._writer.abort()
+            self._writer = None
+
+
+async def _receive_upload(request: Request) -> _MultipartUpload:
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Expected a multipart/form-data body",
+        )
+
+    upload = _MultipartUpload(boundary)
+    try:
+        async for chunk in request.stream():
+            upload.parser.write(chunk)
+        upload.parser.finalize()
+    except BlobTooLargeError as exc:
+        upload.abort()
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(exc),
+        )
+    except BaseException:
+        upload.abort()
+        raise
+    return upload
+
+
+def _create_file_document(
+    db: Session,
+    user_id: int,
+    name: str,
+    source_type: str,
+    blob: StoredBlob,
+) -> DocumentRead:
+    """
+    Store an uploaded file's document row (write-queue job).
+    """
+    get_user_or_404(db, user_id)
+
+    document = Document(
+        user_id=user_id,
+        name=name,
+        source_type=source_type,
+        raw_text=None,
+        storage_path=blob.path,
+        content_hash=blob.content_hash,
+        size_bytes=blob.size,
+        index_status=INDEX_STATUS_PENDING,
     )
     db.add(document)
-    db.commit()
+    db.flush()
     db.refresh(document)
+    return DocumentRead.model_validate(document)
+
+
+@router.post(
+    "/documents/upload",
+    response_model=DocumentRead,
+    status_code=status.HTTP_201_CREATED,
+)
+async def upload_document(
+    request: Request,
+    background_tasks: BackgroundTasks,
+):
+    """
+    Upload a document file as multipart/form-data.
+
+    Fields: `user_id`, optional `name` (defaults to the file name) and
+    `source_type`, and the `file` part. The file is streamed into the
+    content-addressed blob store rather than the database; it is chunked
+    and indexed in the background (`index_status` is "pending" until then).
+    """
+    upload = await _receive_upload(request)
+
+    if upload.blob is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Missing 'file' part",
+        )
+    try:
+        user_id = int(upload.fields.get("user_id", ""))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Field 'user_id' must be an integer",
+        )
+    name = upload.fields.get("name") or upload.filename or upload.blob.content_hash[:12]
+
+    document = await get_write_queue().submit(
+        _create_file_document,
+        user_id,
+        name[:255],
+        upload.fields.get("source_type") or "file",
+        upload.blob,
+    )
+    background_tasks.add_task(index_documents, [document.id])
     return document
 
 
+async def _iter_rows(request: Request) -> AsyncIterator[Any]:
+    """
+    Yield parsed rows from the request body as it streams in.
+    A fatal parse error is yielded as the last item.
+    """
+    parser = JSONRowParser()
+    try:
+        async for chunk in request.stream():
+            for row in parser.feed(chunk):
+                yield row
+        for row in parser.close():
+            yield row
+    except BulkParseError as exc:
+        yield exc
+
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}"
+        for err in exc.errors()
+    )
+
+
+@router.post(
+    "/documents/bulk",
+    response_model=BulkDocumentResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def bulk_create_documents(
+    request: Request,
+    background_tasks: BackgroundTasks,
+):
+    """
+    Create many documents from an NDJSON body (one DocumentCreate per line)
+    or a JSON array of them.
+
+    The body is parsed and validated as it streams in and rows are inserted
+    in batches through the write queue. Every row gets a result (`created` with its id, or `error`)
+    keyed by its position. Chunking and indexing continue in the background;
+    until then documents report `index_status: "pending"`.
+    """
+    importer = BulkDocumentImporter()
+    index = 0
+
+    async for row in _iter_rows(request):
+        if index >= settings.BULK_MAX_ROWS:
+            importer.fail(index, f"Row limit of {settings.BULK_MAX_ROWS} exceeded")
+            break
+
+        if isinstance(row, BulkParseError):
+            importer.fail(index, str(row))
+        else:
+            try:
+                payload = DocumentCreate.model_validate(row)
+            except ValidationError as exc:
+                importer.fail(index, _validation_message(exc))
+            else:
+                content_hash, size_bytes = text_fingerprint(payload.raw_text)
+                importer.add(
+                    index,
+                    {
+                        "user_id": payload.user_id,
+                        "name": payload.name,
+                        "source_type": payload.source_type or "upload",
+                        "raw_text": payload.raw_text,
+                        "content_hash": content_hash,
+                        "size_bytes": size_bytes,
+                    },
+                )
+        index += 1
+
+        if importer.batch_ready:
+            await get_write_queue().submit(importer.flush)
+
+    await get_write_queue().submit(importer.flush)
+
+    if importer.document_ids:
+        background_tasks.add_task(index_documents, importer.document_ids)
+
+    results = sorted(importer.results, key=lambda r: r["index"])
+    return BulkDocumentResponse(
+        created=len(importer.document_ids),
+        failed=len(results) - len(importer.document_ids),
+        results=[BulkDocumentResult(**r) for r in results],
+    )
+
+
 @router.get(
     "/documents",
-    response_model=List[DocumentRead],
+    response_model=List[DocumentSummary],
 )
-def list_documents(
+async def list_documents(
     user_id: int,
-    db: Session = Depends(get_db),
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
 ):
     """
-    List all documents for a user.
+    List a user's documents (metadata only), newest first.
+
+    Keyset-paginated on id: pass the `X-Next-Cursor` response header back
+    as `cursor` for the next page. Bodies are never loaded here; use
+    GET /documents/{id}/content for those.
     """
-    get_user_or_404(db, user_id)
+    query = select(Document).where(Document.user_id == user_id)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, int)
+        query = query.where(Document.id < last_id)
 
-    docs = (
-        db.query(Document)
-        .filter(Document.user_id == user_id)
-        .order_by(Document.created_at.desc())
-        .all()
-    )
+    docs = list(await db.scalars(query.order_by(Document.id.desc()).limit(limit + 1)))
+
+    if not docs and not cursor:
+        await db.run_sync(get_user_or_404, user_id)
+
+    if len(docs) > limit:
+        docs = docs[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(docs[-1].id)
     return docs
 
 
+async def get_document_or_404(
+    db: AsyncSession,
+    document_id: int,
+    with_body: bool = False,
+) -> Document:
+    options = [undefer(Document.raw_text)] if with_body else []
+    doc = await db.get(Document, document_id, options=options)
+    if not doc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Document with id {document_id} not found",
+        )
+    return doc
+
+
 @router.get(
     "/documents/{document_id}",
-    response_model=DocumentRead,
+    responses={status.HTTP_200_OK: {"model": DocumentRead}},
 )
-def get_document(
+async def get_document(
     document_id: int,
-    db: Session = Depends(get_db),
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated fields to return, e.g. 'name,raw_text'. "
+        "Defaults to every field except raw_text.",
+    ),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Get a single document by id.
+
+    The body (`raw_text`) is only loaded and returned when requested via
+    `fields`; GET /documents/{id}/content serves it with range support.
     """
-    doc = db.get(Document, document_id)
-    if not doc:
+    if fields:
+        selected = {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = selected - set(DocumentRead.model_fields)
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}",
+            )
+        selected.add("id")
+    else:
+        selected = set(DocumentRead.model_fields) - {"raw_text"}
+
+    doc = await get_document_or_404(db, document_id, with_body="raw_text" in selected)
+    # Built by hand so unselected (deferred) columns are never loaded.
+    body = {name: getattr(doc, name) for name in DocumentRead.model_fields if name in selected}
+    return JSONResponse(jsonable_encoder(body))
+
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range `Range: bytes=...` header into an inclusive
+    (start, end) pair. Returns None for headers that should be ignored
+    (other units, multiple ranges); raises 416 if unsatisfiable.
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            start = max(size - int(last), 0)
+            end = size - 1
+    except ValueError:
+        return None
+
+    end = min(end, size - 1)
+    if start > end or start >= size:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Document with id {document_id} not found",
+            status_code=status.HTTP_416_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+
+def _iter_blob(path: str, start: int, end: int) -> Iterator[bytes]:
+    with get_blob_store().open_mmap(path) as data:
+        for offset in range(start, end + 1, CONTENT_READ_CHUNK_BYTES):
+            yield bytes(data[offset : min(offset + CONTENT_READ_CHUNK_BYTES, end + 1)])
+
+
+@router.get("/documents/{document_id}/content")
+async def get_document_content(
+    document_id: int,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Return the document body. Supports single `Range: bytes=` requests
+    (206 Partial Content). Uploaded files are streamed from the blob store;
+    inline documents serve their UTF-8 encoded raw_text.
+    """
+    doc = await get_document_or_404(db, document_id)
+
+    if doc.storage_path:
+        size = get_blob_store().size(doc.storage_path)
+        media_type = mimetypes.guess_type(doc.name)[0] or "application/octet-stream"
+        body = None
+    else:
+        await db.refresh(doc, attribute_names=["raw_text"])
+        body = (doc.raw_text or "").encode("utf-8")
+        size = len(body)
+        media_type = "text/plain; charset=utf-8"
+
+    byte_range = _parse_range(range_header, size) if range_header and size else None
+    start, end = byte_range or (0, size - 1)
+    headers = {"Accept-Ranges": "bytes", "Content-Length": str(end - start + 1)}
+    status_code = status.HTTP_200_OK
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+
+    if body is not None or size == 0:
+        return Response(
+            content=(body or b"")[start : end + 1],
+            status_code=status_code,
+            media_type=media_type,
+            headers=headers,
         )
-    return doc
\ No newline at end of file
+    return StreamingResponse(
+        _iter_blob(doc.storage_path, start, end),
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers,
+    )
@@ -0,0 +1,75 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, get_db
+from app.models.models import GenerationJob, Message
+from app.api.schemas import GenerationJobRead, MessageRead
+from app.services.generation_jobs import FINISHED_STATUSES, get_generation_pool
+
+router = APIRouter(tags=["jobs"])
+
+
+def _job_read(db: Session, job_id: int) -> GenerationJobRead:
+    job = db.get(GenerationJob, job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job with id {job_id} not found",
+        )
+    assistant_msg = None
+    if job.assistant_message_id is not None:
+        message = db.get(Message, job.assistant_message_id)
+        if message is not None:
+            assistant_msg = MessageRead.model_validate(message)
+    return GenerationJobRead(
+        id=job.id,
+        conversation_id=job.conversation_id,
+        status=job.status,
+        attempts=job.attempts,
+        user_message_id=job.user_message_id,
+        assistant_message=assistant_msg,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=GenerationJobRead,
+)
+async def get_generation_job(
+    job_id: int,
+    wait: float = Query(0, ge=0, description="Seconds to wait for the job to finish"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Status of an async turn, with the assistant message once it succeeded.
+
+    With `wait`, an unfinished job is long-polled: the response is sent as
+    soon as the job finishes, or after `wait` seconds (capped at
+    JOB_MAX_WAIT_SECONDS) with the job still queued or running. The
+    request's session is closed while waiting, so pollers hold no pooled
+    connection; the job is re-read with a fresh one.
+    """
+    pool = get_generation_pool()
+    # Make sure this process works through jobs left unfinished.
+    await pool.start()
+
+    with pool.watch(job_id) as finished:
+        job = await db.run_sync(_job_read, job_id)
+        timeout = min(wait, settings.JOB_MAX_WAIT_SECONDS)
+        if job.status in FINISHED_STATUSES or timeout <= 0:
+            return job
+        await db.close()
+        try:
+            await asyncio.wait_for(finished, timeout)
+        except asyncio.TimeoutError:
+            pass
+    async with AsyncSessionLocal() as fresh_db:
+        return await fresh_db.run_sync(_job_read, job_id)
@@ -1,5 +1,5 @@
-from datetime import datetime
-from typing import List, Optional
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel
 
@@ -25,12 +25,31 @@ class MessageRead(BaseModel):
     order_index: int
     prompt_tokens: Optional[int] = None
     completion_tokens: Optional[int] = None
+    model: Optional[str] = None
     created_at: datetime
 
     class Config:
         from_attributes = True
 
 
+class MessageSearchHit(BaseModel):
+    """
+    A message matching a search; `snippet` marks the matched terms with
+    <mark></mark>. Lower `score` ranks higher (FTS5 bm25).
+    """
+    message_id: int
+    conversation_id: int
+    conversation_title: Optional[str] = None
+    role: str
+    order_index: int
+    created_at: datetime
+    score: float
+    snippet: str
+
+    class Config:
+        from_attributes = True
+
+
 # ------------ Conversation Schemas ------------
 
 class ConversationCreate(BaseModel):
@@ -39,6 +58,7 @@ class ConversationCreate(BaseModel):
     title: Optional[str] = None
     first_message: str
     document_ids: Optional[List[int]] = None
+    cache_enabled: bool = True
 
 
 class ConversationRead(BaseModel):
@@ -47,6 +67,7 @@ class ConversationRead(BaseModel):
     mode: str
     title: Optional[str]
     is_archived: bool
+    cache_enabled: bool = True
     created_at: datetime
     updated_at: datetime
     messages: List[MessageRead]
@@ -64,6 +85,7 @@ class ConversationListItem(BaseModel):
     created_at: datetime
     updated_at: datetime
     last_message_at: Optional[datetime] = None
+    message_count: int = 0
 
     class Config:
         from_attributes = True
@@ -85,6 +107,55 @@ class UserRead(BaseModel):
     class Config:
         from_attributes = True
 
+
+# ------------ Usage Schemas ------------
+
+class UsageRow(BaseModel):
+    """
+    Usage of one day and / or model, depending on the report's grouping.
+    """
+    day: Optional[date] = None
+    model: Optional[str] = None
+    message_count: int
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    cost: Optional[float] = None
+
+
+class UsageReport(BaseModel):
+    user_id: int
+    start: Optional[date] = None
+    end: Optional[date] = None
+    group_by: str
+    message_count: int
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    # Sum over priced models; None when no model in the range has a price.
+    cost: Optional[float] = None
+    rows: List[UsageRow]
+
+
+# ------------ Generation Job Schemas ------------
+
+class GenerationJobRead(BaseModel):
+    """
+    An async turn: `assistant_message` is set once `status` is "succeeded";
+    `error` explains a "failed" job.
+    """
+    id: int
+    conversation_id: int
+    status: str
+    attempts: int
+    user_message_id: int
+    assistant_message: Optional[MessageRead] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
 # ------------ Document Schemas ------------
 
 class DocumentCreate(BaseModel):
@@ -100,8 +171,68 @@ class DocumentRead(BaseModel):
     name: str
     source_type: Optional[str] = None
     storage_path: Optional[str] = None
+    content_hash: Optional[str] = None
+    size_bytes: Optional[int] = None
     raw_text: Optional[str] = None
+    index_status: str = "ready"
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class DocumentSummary(BaseModel):
+    """
+    Document metadata without the body, for listings.
+    """
+    id: int
+    user_id: int
+    name: str
+    source_type: Optional[str] = None
+    content_hash: Optional[str] = None
+    size_bytes: Optional[int] = None
+    chunk_count: int = 0
+    index_status: str = "ready"
     created_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class BulkDocumentResult(BaseModel):
+    index: int
+    status: str
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BulkDocumentResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkDocumentResult]
+
+
+# ------------ Trace Schemas ------------
+
+class SpanRead(BaseModel):
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    name: str
+    start: float
+    duration_ms: Optional[float] = None
+    status: str
+    attributes: Dict[str, Any] = {}
+
+
+class TraceSummary(BaseModel):
+    trace_id: str
+    name: str
+    start: float
+    duration_ms: Optional[float] = None
+    status: str
+    span_count: int
+
+
+class TraceRead(TraceSummary):
+    spans: List[SpanRead]
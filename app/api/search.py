@@ -0,0 +1,58 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db
+from app.models.models import User
+from app.api.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.api.schemas import MessageSearchHit
+from app.services.message_search import search_messages, search_terms
+
+router = APIRouter(tags=["search"])
+
+
+@router.get(
+    "/users/{user_id}/messages/search",
+    response_model=List[MessageSearchHit],
+)
+async def search_user_messages(
+    user_id: int,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=500),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Full-text search over the messages of a user's conversations.
+
+    Every word of `q` must match (a trailing `*` matches a prefix); hits
+    are ranked best first with a highlighted snippet. Pass the
+    `X-Next-Cursor` response header back as `cursor` for the next page.
+    """
+    if await db.get(User, user_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with id {user_id} not found",
+        )
+
+    terms = search_terms(q)
+    if not terms:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Search query has no searchable words",
+        )
+
+    after = None
+    if cursor:
+        score, last_id = decode_cursor(cursor, (int, float), int)
+        after = (float(score), last_id)
+
+    hits = await db.run_sync(search_messages, user_id, terms, limit + 1, after)
+
+    if len(hits) > limit:
+        hits = hits[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(hits[-1].score, hits[-1].message_id)
+
+    return hits
@@ -0,0 +1,87 @@
+from datetime import date
+from typing import Dict, Literal, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db
+from app.models.models import UsageRollup, User
+from app.api.schemas import UsageReport, UsageRow
+from app.services.usage import usage_cost
+
+router = APIRouter(tags=["usage"])
+
+
+def _add_cost(total: Optional[float], cost: Optional[float]) -> Optional[float]:
+    if cost is None:
+        return total
+    return cost if total is None else total + cost
+
+
+@router.get(
+    "/users/{user_id}/usage",
+    response_model=UsageReport,
+)
+async def get_user_usage(
+    user_id: int,
+    start: Optional[date] = Query(None, description="First UTC day, inclusive"),
+    end: Optional[date] = Query(None, description="Last UTC day, inclusive"),
+    group_by: Literal["day_model", "day", "model"] = "day_model",
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Token usage and cost of a user's assistant replies, read from the
+    per-day, per-model rollups: the work grows with the number of days
+    and models in the range, not with the number of messages.
+    """
+    if await db.get(User, user_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with id {user_id} not found",
+        )
+
+    query = select(UsageRollup).where(UsageRollup.user_id == user_id)
+    if start is not None:
+        query = query.where(UsageRollup.day >= start)
+    if end is not None:
+        query = query.where(UsageRollup.day <= end)
+    rollups = (await db.scalars(query.order_by(UsageRollup.day, UsageRollup.model))).all()
+
+    rows: Dict[Tuple[Optional[date], Optional[str]], UsageRow] = {}
+    report = UsageReport(
+        user_id=user_id,
+        start=start,
+        end=end,
+        group_by=group_by,
+        message_count=0,
+        prompt_tokens=0,
+        completion_tokens=0,
+        total_tokens=0,
+        rows=[],
+    )
+    for rollup in rollups:
+        key = (
+            rollup.day if group_by != "model" else None,
+            rollup.model if group_by != "day" else None,
+        )
+        row = rows.get(key)
+        if row is None:
+            row = rows[key] = UsageRow(
+                day=key[0],
+                model=key[1],
+                message_count=0,
+                prompt_tokens=0,
+                completion_tokens=0,
+                total_tokens=0,
+            )
+        cost = usage_cost(rollup.model, rollup.prompt_tokens, rollup.completion_tokens)
+        for target in (row, report):
+            target.message_count += rollup.message_count
+            target.prompt_tokens += rollup.prompt_tokens
+            target.completion_tokens += rollup.completion_tokens
+            target.total_tokens += rollup.prompt_tokens + rollup.completion_tokens
+            target.cost = _add_cost(target.cost, cost)
+
+    report.rows = sorted(rows.values(), key=lambda r: (r.day or date.min, r.model or ""))
+    return report
@@ -1,28 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
+from app.core.write_queue import get_write_queue
 from app.models.models import User
 from app.api.schemas import UserCreate, UserRead
 
 router = APIRouter(tags=["users"])
 
-@router.post(
-    "/users",
-    response_model=UserRead,
-    status_code=status.HTTP_201_CREATED,
-)
-def create_user(
-    payload: UserCreate,
-    db: Session = Depends(get_db),
-):
-    """
-    Create a user (for testing the conversation APIs).
-    """
-    existing = (
-        db.query(User)
-        .filter(User.email == payload.email)
-        .first()
+
+def _create_user_row(db: Session, payload: UserCreate) -> UserRead:
+    # Runs on the write queue, so the email check and insert cannot race.
+    existing = db.scalar(
+        select(User)
+        .where(User.email == payload.email)
+        .limit(1)
     )
     if existing:
         raise HTTPException(
@@ -35,23 +29,35 @@ def create_user(
         full_name=payload.full_name,
     )
     db.add(user)
-    db.commit()
+    db.flush()
     db.refresh(user)
-    return user
+    return UserRead.model_validate(user)
+
+
+@router.post(
+    "/users",
+    response_model=UserRead,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_user(payload: UserCreate):
+    """
+    Create a user (for testing the conversation APIs).
+    """
+    return await get_write_queue().submit(_create_user_row, payload)
 
 
 @router.get(
     "/users/{user_id}",
     response_model=UserRead,
 )
-def get_user(
+async def get_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    user = db.get(User, user_id)
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"User with id {user_id} not found",
         )
-    return user
\ No newline at end of file
+    return user
@@ -12,12 +12,134 @@ class Settings(BaseSettings):
     APP_VERSION: str = "0.1.0"
 
     DATABASE_URL: str = "sqlite:///./app.db" 
+
+    # In-process Prometheus metrics served at /metrics.
+    METRICS_ENABLED: bool = True
+
+    # Request tracing: the last TRACE_BUFFER_SIZE traces are kept in memory
+    # (GET /debug/traces); TRACE_EXPORT_PATH also appends them as JSON lines.
+    TRACING_ENABLED: bool = True
+    TRACE_BUFFER_SIZE: int = 200
+    TRACE_EXPORT_PATH: str | None = None
+    TRACE_SQL_STATEMENT_CHARS: int = 200
+
+    # Connection pool per engine (ignored for in-memory SQLite).
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 10.0
+
+    # SQLite production profile, applied to every connection.
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024
+    SQLITE_MMAP_SIZE_BYTES: int = 256 * 1024 * 1024
+
+    # Serialized writer: jobs committed together per group commit, and
+    # the Retry-After sent when the database stays locked or the pool is
+    # exhausted.
+    DB_WRITE_MAX_BATCH: int = 64
+    DB_BUSY_RETRY_AFTER_SECONDS: int = 1
+
+    # Per-user admission control on the turn endpoints: a request bucket
+    # and an LLM-token bucket, refilled continuously, and UTC daily /
+    # monthly token budgets (0 disables a limit). Kept in memory and
+    # written to rate_limit_states every RATE_LIMIT_PERSIST_INTERVAL_SECONDS.
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_REQUESTS_PER_MINUTE: float = 60.0
+    RATE_LIMIT_REQUEST_BURST: float = 20.0
+    RATE_LIMIT_TOKENS_PER_MINUTE: float = 100000.0
+    RATE_LIMIT_TOKEN_BURST: float = 200000.0
+    TOKEN_BUDGET_DAILY: int = 0
+    TOKEN_BUDGET_MONTHLY: int = 0
+    RATE_LIMIT_PERSIST_INTERVAL_SECONDS: float = 30.0
+
+    # Async turns (?async=true): replies generated by GENERATION_WORKERS
+    # in-process workers from the generation_jobs table; a job interrupted
+    # by restarts more than GENERATION_JOB_MAX_ATTEMPTS times fails.
+    # GET /jobs/{id}?wait= long-polls for at most JOB_MAX_WAIT_SECONDS.
+    GENERATION_WORKERS: int = 4
+    GENERATION_JOB_MAX_ATTEMPTS: int = 3
+    JOB_MAX_WAIT_SECONDS: float = 30.0
   
     LLM_PROVIDER: str = "dummy" 
     LLM_API_KEY: str | None = None
     LLM_MODEL_NAME: str = "dummy-model"
+    LLM_BASE_URL: str = "https://api.openai.com/v1"
+
+    LLM_CONNECT_TIMEOUT: float = 5.0
+    LLM_READ_TIMEOUT: float = 60.0
+    LLM_MAX_CONNECTIONS: int = 200
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 50
+    LLM_MAX_CONCURRENCY: int = 100
+    LLM_MAX_RETRIES: int = 3
+    LLM_RETRY_BASE_DELAY: float = 0.5
+    LLM_RETRY_MAX_DELAY: float = 8.0
+
+    # Micro-batching of non-streaming completions: concurrent requests for
+    # the same model are held for up to LLM_BATCH_MAX_WAIT_MS (or until
+    # LLM_BATCH_MAX_SIZE are waiting) and sent as one provider batch.
+    LLM_BATCHING_ENABLED: bool = False
+    LLM_BATCH_MAX_SIZE: int = 16
+    LLM_BATCH_MAX_WAIT_MS: float = 5.0
+    # Simulated latency of one dummy provider call (a whole batch counts
+    # as one call, each holding one LLM_MAX_CONCURRENCY slot), for benchmarking.
+    DUMMY_LLM_LATENCY_MS: float = 0.0
 
-    MAX_HISTORY_MESSAGES: int = 10   
+    # Price per 1K tokens by model name, e.g. {"gpt-4o": {"prompt": 0.0025,
+    # "completion": 0.01}}; usage reports show a cost for priced models.
+    LLM_TOKEN_PRICES: dict[str, dict[str, float]] = {}
+
+    # Upper bound on history rows loaded per turn; the token budget below
+    # decides how many of them are actually sent.
+    MAX_HISTORY_MESSAGES: int = 40   
     MAX_CONTEXT_CHARS: int = 4000  
+
+    # Prompt token budget per model name; DEFAULT_PROMPT_TOKEN_BUDGET otherwise.
+    PROMPT_TOKEN_BUDGETS: dict[str, int] = {}
+    DEFAULT_PROMPT_TOKEN_BUDGET: int = 3000
+
+    # Rolling summarization of old turns.
+    SUMMARY_ENABLED: bool = True
+    SUMMARY_KEEP_RECENT_MESSAGES: int = 20
+    SUMMARY_MIN_BATCH_MESSAGES: int = 10
+    SUMMARY_MAX_BATCH_MESSAGES: int = 100
+    SUMMARY_MAX_TOKENS: int = 400
+
+    # Exact-match cache of LLM replies; COMPLETION_CACHE_PATH adds a
+    # SQLite file tier shared across restarts and workers.
+    COMPLETION_CACHE_ENABLED: bool = True
+    COMPLETION_CACHE_MAX_ENTRIES: int = 1024
+    COMPLETION_CACHE_TTL_SECONDS: float = 3600.0
+    COMPLETION_CACHE_PATH: str | None = None
+
+    # Uploaded document files (content-addressed by sha256).
+    BLOB_STORE_DIR: str = "./data/blobs"
+    MAX_UPLOAD_BYTES: int = 200 * 1024 * 1024
+
+    # Bulk document import: rows per INSERT/commit, and rows per request.
+    BULK_INSERT_BATCH_SIZE: int = 1000
+    BULK_MAX_ROWS: int = 100000
+
+    CHUNK_SIZE_CHARS: int = 800
+    CHUNK_OVERLAP_CHARS: int = 150
+    # Chunks built (and embedded) per batch during ingestion.
+    INGEST_BATCH_CHUNKS: int = 256
+    RAG_TOP_K_CHUNKS: int = 5
+
+    BM25_K1: float = 1.5
+    BM25_B: float = 0.75
+
+    # Dense retrieval, fused with BM25 in grounded mode.
+    VECTOR_SEARCH_ENABLED: bool = True
+    EMBEDDING_PROVIDER: str = "hashing"
+    EMBEDDING_DIM: int = 256
+    # Weight of the vector score in the hybrid ranking (0 = BM25 only).
+    HYBRID_VECTOR_WEIGHT: float = 0.5
+    # Per-user vector count above which an IVF index is trained.
+    VECTOR_IVF_MIN_VECTORS: int = 20000
+    VECTOR_IVF_NPROBE: int = 8
+    # Users whose vector index is kept in memory (least recently used evicted).
+    VECTOR_INDEX_CACHE_USERS: int = 64
     
 settings = Settings()
\ No newline at end of file
@@ -1,27 +1,167 @@
-from sqlalchemy import create_engine
+import functools
+from typing import Any, Callable, TypeVar
+
+import anyio
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.util.concurrency import await_only, in_greenlet
 from app.core.config import settings
 
 Base = declarative_base()
 
+T = TypeVar("T")
+
+# Async drivers used for the request path, per sync URL scheme.
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def async_database_url(url: str) -> str:
+    """
+    Map a plain DATABASE_URL to its async-driver form
+    (e.g. sqlite:// -> sqlite+aiosqlite://). URLs that already name a
+    driver are returned unchanged.
+    """
+    parsed = make_url(url)
+    if "+" in parsed.drivername or parsed.drivername not in _ASYNC_DRIVERS:
+        return url
+    return parsed.set(drivername=_ASYNC_DRIVERS[parsed.drivername]).render_as_string(
+        hide_password=False
+    )
+
+
+def sqlite_pragmas() -> dict[str, object]:
+    """
+    Pragmas applied to every SQLite connection: WAL so readers never block
+    on the writer, NORMAL sync (durable in WAL mode up to the last
+    checkpoint), a busy timeout instead of failing fast, and larger page
+    cache / mmap windows.
+    """
+    return {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        # Negative cache_size is in KiB rather than pages.
+        "cache_size": -settings.SQLITE_CACHE_SIZE_KB,
+        "mmap_size": settings.SQLITE_MMAP_SIZE_BYTES,
+        "temp_store": "MEMORY",
+    }
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in sqlite_pragmas().items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def _configure_sqlite(sync_engine: Engine) -> None:
+    event.listen(sync_engine, "connect", _apply_sqlite_pragmas)
+
+
+def _pool_args(url: str) -> dict:
+    """
+    Pool sizing for file-backed databases; in-memory SQLite uses
+    SQLAlchemy's single-connection pools, which take no sizing.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+    }
+
+
+is_sqlite = settings.DATABASE_URL.startswith("sqlite")
+
 connect_args = {}
-if settings.DATABASE_URL.startswith("sqlite"):
+if is_sqlite:
     connect_args = {"check_same_thread": False}
 
-engine = create_engine(
+# Request handlers use the async engine; sessions never hold a thread
+# while waiting on the database.
+engine = create_async_engine(
+    async_database_url(settings.DATABASE_URL),
+    **_pool_args(settings.DATABASE_URL),
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=engine,
+    class_=AsyncSession,
+    autoflush=False,
+    # Objects stay readable after commit without an implicit (sync) refresh.
+    expire_on_commit=False,
+)
+
+# Sync engine for CPU-bound background jobs that run in worker threads,
+# scripts and tests.
+sync_engine = create_engine(
     settings.DATABASE_URL,
     connect_args=connect_args,
+    **_pool_args(settings.DATABASE_URL),
 )
 
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
-    bind=engine,
+    bind=sync_engine,
 )
 
-def get_db():
-    db = SessionLocal()
-    try:
+# Single connection owned by the write queue (app.core.write_queue).
+writer_engine = create_engine(
+    settings.DATABASE_URL,
+    connect_args=connect_args,
+    pool_size=1,
+    max_overflow=0,
+)
+
+WriterSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=False,
+    bind=writer_engine,
+)
+
+if is_sqlite:
+    _configure_sqlite(engine.sync_engine)
+    _configure_sqlite(sync_engine)
+    _configure_sqlite(writer_engine)
+
+    # pysqlite defers BEGIN until the first DML statement, which breaks
+    # SAVEPOINTs; the writer begins explicitly instead, taking the write
+    # lock up front (BEGIN IMMEDIATE) so it never has to upgrade a read lock.
+    @event.listens_for(writer_engine, "connect")
+    def _writer_autocommit_driver(dbapi_connection, connection_record) -> None:
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(writer_engine, "begin")
+    def _writer_begin_immediate(conn) -> None:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+
+def run_blocking(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Call CPU-bound `fn` from sync database code.
+
+    Under AsyncSession.run_sync that code runs on the event loop thread, so
+    `fn` is handed to a worker thread and awaited there instead; sync
+    sessions in worker threads, scripts and tests call it inline.
+    """
+    if in_greenlet():
+        return await_only(anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs)))
+    return fn(*args, **kwargs)
@@ -5,9 +5,14 @@ from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from fastapi import status
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from fastapi import HTTPException
 
+from app.core.config import settings
+from app.services.llm_client import LLMProviderError
+from app.services.rate_limiter import RateLimitExceeded
+
 logger = logging.getLogger(__name__)
 
 
@@ -21,6 +26,18 @@ def _error_body(code: str, message: str, details: Dict[str, Any] | None = None)
     }
 
 
+def _is_database_busy(exc: SQLAlchemyError) -> bool:
+    """
+    True for transient contention: SQLite lock timeouts and an exhausted
+    connection pool. Retrying shortly is expected to succeed.
+    """
+    if isinstance(exc, PoolTimeoutError):
+        return True
+    return isinstance(exc, OperationalError) and (
+        "database is locked" in str(exc.orig) or "database is busy" in str(exc.orig)
+    )
+
+
 def register_exception_handlers(app: FastAPI) -> None:
     """
     Register global exception handlers on the FastAPI app.
@@ -46,6 +63,17 @@ def register_exception_handlers(app: FastAPI) -> None:
         request: Request,
         exc: SQLAlchemyError,
    ):
+        if _is_database_busy(exc):
+            logger.warning("Database busy on %s: %s", request.url.path, str(exc))
+            return JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content=_error_body(
+                    code="DATABASE_BUSY",
+                    message="The database is busy, please retry",
+                ),
+                headers={"Retry-After": str(settings.DB_BUSY_RETRY_AFTER_SECONDS)},
+            )
+
         logger.error("Database error on %s: %s", request.url.path, str(exc))
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -55,6 +83,36 @@ def register_exception_handlers(app: FastAPI) -> None:
             ),
         )
 
+    @app.exception_handler(LLMProviderError)
+    async def llm_provider_exception_handler(
+        request: Request,
+        exc: LLMProviderError,
+    ):
+        logger.error("LLM provider error on %s: %s", request.url.path, str(exc))
+        return JSONResponse(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            content=_error_body(
+                code="LLM_PROVIDER_ERROR",
+                message="The language model provider failed to respond",
+            ),
+        )
+
+    @app.exception_handler(RateLimitExceeded)
+    async def rate_limit_exception_handler(
+        request: Request,
+        exc: RateLimitExceeded,
+    ):
+        logger.info("Rate limited on %s: %s", request.url.path, exc.reason)
+        return JSONResponse(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            content=_error_body(
+                code="RATE_LIMITED",
+                message="Rate limit exceeded, please retry later",
+                details={"reason": exc.reason, "retry_after": exc.retry_after},
+            ),
+            headers={"Retry-After": str(exc.retry_after)},
+        )
+
     @app.exception_handler(HTTPException)
     async def http_exception_handler(
         request: Request,
@@ -73,6 +131,7 @@ def register_exception_handlers(app: FastAPI) -> None:
                 code="HTTP_ERROR",
                 message=str(exc.detail),
             ),
+            headers=getattr(exc, "headers", None),
         )
 
     @app.exception_handler(Exception)
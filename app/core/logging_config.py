@@ -1,6 +1,8 @@
 import logging
 import sys
 
+from app.core.tracing import TraceContextFilter
+
 
 def configure_logging() -> None:
     """
@@ -16,8 +18,9 @@ def configure_logging() -> None:
 
     handler = logging.StreamHandler(sys.stdout)
     formatter = logging.Formatter(
-        "[%(asctime)s] [%(levelname)s] [%(name)s] %(message)s"
+        "[%(asctime)s] [%(levelname)s] [%(name)s] [trace=%(trace_id)s] %(message)s"
     )
     handler.setFormatter(formatter)
+    handler.addFilter(TraceContextFilter())
 
     root_logger.addHandler(handler)
\ No newline at end of file
@@ -0,0 +1,325 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+TRACE_HEADER = "X-Trace-Id"
+
+# Requests that are not traced: scrapes and the trace viewer itself.
+_UNTRACED_PREFIXES = ("/metrics", "/health", "/debug/")
+
+# W3C trace context: version-traceid-parentid-flags.
+_TRACEPARENT_RE = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+@dataclass
+class Span:
+    """
+    One timed operation within a trace. Times are epoch seconds / ms.
+    """
+
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    start: float
+    duration_ms: Optional[float] = None
+    status: str = "ok"
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+class TraceExporter:
+    """
+    Collects the spans of in-flight traces and, once a trace's root span
+    ends, keeps the whole trace in a ring buffer of the last `max_traces`
+    traces and optionally appends it as one JSON line to `path`.
+    """
+
+    def __init__(self, max_traces: int = 200, path: Optional[str] = None):
+        self.path = path
+        self._finished: Deque[Dict[str, Any]] = deque(maxlen=max_traces)
+        self._open: "OrderedDict[str, List[Span]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, span: Span) -> None:
+        with self._lock:
+            spans = self._open.get(span.trace_id)
+            if spans is None:
+                spans = self._open[span.trace_id] = []
+                # Bound traces whose root never finishes (e.g. cancelled).
+                while len(self._open) > self._finished.maxlen * 4:
+                    self._open.popitem(last=False)
+            spans.append(span)
+            if span.parent_id is not None and not span.attributes.get("remote_parent"):
+                return
+            trace = self._build(self._open.pop(span.trace_id), span)
+            self._finished.append(trace)
+
+        if self.path:
+            self._write(trace)
+
+    @staticmethod
+    def _build(spans: List[Span], root: Span) -> Dict[str, Any]:
+        spans.sort(key=lambda s: s.start)
+        return {
+            "trace_id": root.trace_id,
+            "name": root.name,
+            "start": root.start,
+            "duration_ms": root.duration_ms,
+            "status": root.status,
+            "span_count": len(spans),
+            "spans": [s.to_dict() for s in spans],
+        }
+
+    def _write(self, trace: Dict[str, Any]) -> None:
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(trace, default=str) + "\n")
+        except OSError:
+            logger.exception("Writing trace %s to %s failed", trace["trace_id"], self.path)
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            traces = list(self._finished)[-limit:]
+        traces.reverse()
+        return traces
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for trace in reversed(self._finished):
+                if trace["trace_id"] == trace_id:
+                    return trace
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._finished.clear()
+            self._open.clear()
+
+
+_exporter: Optional[TraceExporter] = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter() -> TraceExporter:
+    """
+    Process-wide exporter built from TRACE_BUFFER_SIZE / TRACE_EXPORT_PATH.
+    """
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                _exporter = TraceExporter(
+                    max_traces=settings.TRACE_BUFFER_SIZE,
+                    path=settings.TRACE_EXPORT_PATH,
+                )
+    return _exporter
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+def _finish(span: Span, start: float) -> None:
+    span.duration_ms = round((time.perf_counter() - start) * 1000, 3)
+    get_exporter().record(span)
+
+
+@contextmanager
+def start_span(
+    name: str,
+    root: bool = False,
+    trace_id: Optional[str] = None,
+    parent_id: Optional[str] = None,
+    **attributes: Any,
+) -> Iterator[Optional[Span]]:
+    """
+    Open a span as the child of the current one and make it current.
+
+    Outside a trace nothing is recorded (yields None) unless `root` is set,
+    which starts a new trace, continuing `trace_id` / `parent_id` from an
+    upstream caller when given. Also usable as a decorator.
+    """
+    parent = _current_span.get()
+    if not settings.TRACING_ENABLED or (parent is None and not root):
+        yield None
+        return
+
+    if parent is not None and not root:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    elif parent_id is not None:
+        # Root of the local trace, but continuing a remote parent.
+        attributes["remote_parent"] = True
+
+    span = Span(
+        trace_id=trace_id or _new_id(16),
+        span_id=_new_id(8),
+        parent_id=parent_id,
+        name=name,
+        start=time.time(),
+        attributes=attributes,
+    )
+    token = _current_span.set(span)
+    start = time.perf_counter()
+    try:
+        yield span
+    except BaseException as exc:
+        span.status = "error"
+        span.attributes["error"] = type(exc).__name__
+        raise
+    finally:
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # Closed from another context (e.g. an abandoned async generator).
+            pass
+        _finish(span, start)
+
+
+def parse_traceparent(header: Optional[str]) -> tuple:
+    """
+    (trace_id, parent_span_id) from a W3C `traceparent` header, or (None, None).
+    """
+    match = _TRACEPARENT_RE.match(header or "")
+    if not match:
+        return None, None
+    return match.group(1), match.group(2)
+
+
+def trace_engine(engine: Engine, name: str) -> None:
+    """
+    Record a child span for every statement run inside a trace.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        parent = _current_span.get()
+        if parent is None or not settings.TRACING_ENABLED:
+            return
+        context._trace_span = (
+            Span(
+                trace_id=parent.trace_id,
+                span_id=_new_id(8),
+                parent_id=parent.span_id,
+                name="db.query",
+                start=time.time(),
+                attributes={
+                    "db.engine": name,
+                    "db.statement": statement[: settings.TRACE_SQL_STATEMENT_CHARS],
+                },
+            ),
+            time.perf_counter(),
+        )
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        pending = getattr(context, "_trace_span", None)
+        if pending is not None:
+            context._trace_span = None
+            _finish(*pending)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        context = exception_context.execution_context
+        pending = getattr(context, "_trace_span", None) if context is not None else None
+        if pending is not None:
+            context._trace_span = None
+            pending[0].status = "error"
+            pending[0].attributes["error"] = type(exception_context.original_exception).__name__
+            _finish(*pending)
+
+
+class TraceContextFilter(logging.Filter):
+    """
+    Add `trace_id` / `span_id` of the current span ("-" outside a trace)
+    to every log record.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        span = _current_span.get()
+        record.trace_id = span.trace_id if span else "-"
+        record.span_id = span.span_id if span else "-"
+        return True
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening the root span of each HTTP request. The span is
+    named after the matched route template and the trace id is returned in
+    the X-Trace-Id response header; an incoming W3C `traceparent` header is
+    continued rather than starting a new trace.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not settings.TRACING_ENABLED
+            or scope["path"].startswith(_UNTRACED_PREFIXES)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        trace_id, parent_id = parse_traceparent(
+            headers.get(b"traceparent", b"").decode("latin-1")
+        )
+
+        with start_span(
+            f"{scope['method']} {scope['path']}",
+            root=True,
+            trace_id=trace_id,
+            parent_id=parent_id,
+        ) as span:
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    span.attributes["http.status_code"] = message["status"]
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (TRACE_HEADER.lower().encode(), span.trace_id.encode())
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                path = getattr(route, "path", None)
+                if path:
+                    span.name = f"{scope['method']} {path}"
+                span.attributes["http.method"] = scope["method"]
+                span.attributes["http.route"] = path or "unmatched"
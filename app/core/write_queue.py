@@ -0,0 +1,180 @@
+import asyncio
+import contextvars
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple, TypeVar
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.core.database import WriterSessionLocal
+from app.core.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_Job = Tuple[Callable[..., Any], tuple, Future, contextvars.Context]
+_STOP = object()
+
+
+class WriteQueue:
+    """
+    Run database writes one at a time on a dedicated writer thread.
+
+    SQLite allows a single writer; funnelling writes through one connection
+    replaces lock contention (and `database is locked` errors) with a
+    queue, while readers keep using the pooled engines. Jobs waiting in the
+    queue are applied together: each runs in its own SAVEPOINT, so a
+    failing job is rolled back on its own, and the batch is made durable
+    with a single commit (group commit).
+
+    A job is a sync function `fn(session, *args)`. It must not commit; its
+    return value is handed back once the batch is committed, so it should
+    return plain values or schemas rather than ORM objects bound to the
+    writer session.
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker = WriterSessionLocal,
+        max_batch: Optional[int] = None,
+    ):
+        self._session_factory = session_factory
+        self.max_batch = max_batch or settings.DB_WRITE_MAX_BATCH
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.jobs = 0
+
+    async def submit(self, fn: Callable[..., T], *args: Any) -> T:
+        """
+        Queue `fn(session, *args)` and wait for its committed result.
+        """
+        return await asyncio.wrap_future(self._put(fn, args))
+
+    def submit_sync(self, fn: Callable[..., T], *args: Any) -> T:
+        """
+        Blocking counterpart of `submit` for worker threads. Never call it
+        on the event loop or from a write job.
+        """
+        return self._put(fn, args).result()
+
+    def _put(self, fn: Callable[..., Any], args: tuple) -> Future:
+        self._ensure_started()
+        future: Future = Future()
+        # Run the job in the caller's context, so it joins the request's trace.
+        self._queue.put((fn, args, future, contextvars.copy_context()))
+        return future
+
+    def stop(self) -> None:
+        """
+        Finish the queued jobs and stop the writer thread.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="db-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            stop = _STOP in batch
+            jobs = [job for job in batch if job is not _STOP]
+            if jobs:
+                self._apply(jobs)
+            if stop:
+                return
+
+    def _next_batch(self) -> List[Any]:
+        # Block for the first job, then take whatever queued up meanwhile.
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch and batch[-1] is not _STOP:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _apply(self, jobs: List[_Job]) -> None:
+        results: List[Tuple[Future, bool, Any]] = []
+        session: Session = self._session_factory()
+        try:
+            with session.begin():
+                for fn, args, future, context in jobs:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with session.begin_nested():
+                            results.append((future, True, context.run(fn, session, *args)))
+                    except Exception as exc:
+                        results.append((future, False, exc))
+        except Exception as exc:
+            logger.exception("Group commit of %d writes failed", len(jobs))
+            job_errors = {id(f): value for f, ok, value in results if not ok}
+            for _, _, future, _ in jobs:
+                if not future.done():
+                    future.set_exception(job_errors.get(id(future), exc))
+            return
+        finally:
+            session.close()
+
+        self.batches += 1
+        self.jobs += len(jobs)
+        for future, ok, value in results:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+_write_queue: Optional[WriteQueue] = None
+_write_queue_lock = threading.Lock()
+
+
+def get_write_queue() -> WriteQueue:
+    """
+    Process-wide write queue.
+    """
+    global _write_queue
+    if _write_queue is None:
+        with _write_queue_lock:
+            if _write_queue is None:
+                _write_queue = WriteQueue()
+    return _write_queue
+
+
+def close_write_queue() -> None:
+    global _write_queue
+    with _write_queue_lock:
+        write_queue, _write_queue = _write_queue, None
+    if write_queue is not None:
+        write_queue.stop()
+
+
+REGISTRY.callback(
+    "db_write_batches_total",
+    "Group commits made by the write queue.",
+    "counter",
+    lambda: {(): _write_queue.batches} if _write_queue is not None else {},
+)
+REGISTRY.callback(
+    "db_write_jobs_total",
+    "Write jobs applied by the write queue.",
+    "counter",
+    lambda: {(): _write_queue.jobs} if _write_queue is not None else {},
+)
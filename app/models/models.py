@@ -1,20 +1,35 @@
-from datetime import datetime
+import logging
+from datetime import date, datetime, timezone
 
 from sqlalchemy import (
     Column,
     Integer,
     String,
+    Date,
     DateTime,
     Boolean,
+    Float,
     ForeignKey,
     Text,
+    LargeBinary,
     func,
+    Index,
     UniqueConstraint,
+    event,
+    inspect,
+    text,
 )
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 
 from app.core.database import Base
 
+logger = logging.getLogger(__name__)
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
 
 class User(Base):
     __tablename__ = "users"
@@ -34,6 +49,10 @@ class User(Base):
 
 class Conversation(Base):
     __tablename__ = "conversations"
+    __table_args__ = (
+        # Serves the per-user listing (filter + ORDER BY updated_at) from the index.
+        Index("ix_conversations_user_archived_updated", "user_id", "is_archived", "updated_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
@@ -46,13 +65,26 @@ class Conversation(Base):
         server_default=func.now(),
         nullable=False,
     )
+    # Set from Python so stored values share one format and can be
+    # compared against pagination cursors.
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
+        default=utcnow,
         server_default=func.now(),
-        onupdate=func.now(),
+        onupdate=utcnow,
         nullable=False,
     )
 
+    # Denormalized message metadata, maintained when messages are written.
+    last_message_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    message_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    # Next Message.order_index to hand out; bumped atomically on each insert.
+    next_seq: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+
+    # Per-conversation opt-out of the LLM completion cache.
+    cache_enabled: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True)
+
     user = relationship("User", back_populates="conversations")
     messages = relationship(
         "Message",
@@ -65,10 +97,24 @@ class Conversation(Base):
         back_populates="conversation",
         cascade="all, delete-orphan",
     )
+    summary = relationship(
+        "ConversationSummary",
+        back_populates="conversation",
+        uselist=False,
+        cascade="all, delete-orphan",
+    )
+    generation_jobs = relationship(
+        "GenerationJob",
+        back_populates="conversation",
+        cascade="all, delete-orphan",
+    )
 
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        UniqueConstraint("conversation_id", "order_index", name="uq_message_conversation_order"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     conversation_id: Mapped[int] = mapped_column(ForeignKey("conversations.id"), nullable=False)
@@ -80,6 +126,11 @@ class Message(Base):
 
     prompt_tokens: Mapped[int | None] = mapped_column(Integer, nullable=True)
     completion_tokens: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # Model that generated an assistant reply.
+    model: Mapped[str | None] = mapped_column(String(100), nullable=True)
+
+    # Token estimate of `content`, computed once when the message is written.
+    token_count: Mapped[int | None] = mapped_column(Integer, nullable=True)
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
@@ -90,8 +141,41 @@ class Message(Base):
     conversation = relationship("Conversation", back_populates="messages")
 
 
+class ConversationSummary(Base):
+    """
+    Rolling summary of the older turns of a conversation.
+    Messages with order_index <= covered_until are represented by `content`.
+    """
+
+    __tablename__ = "conversation_summaries"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    conversation_id: Mapped[int] = mapped_column(
+        ForeignKey("conversations.id"),
+        unique=True,
+        nullable=False,
+    )
+
+    content: Mapped[str] = mapped_column(Text, nullable=False)
+    covered_until: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    token_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=utcnow,
+        onupdate=utcnow,
+        nullable=False,
+    )
+
+    conversation = relationship("Conversation", back_populates="summary")
+
+
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        # Serves the per-user keyset listing (WHERE user_id ORDER BY id DESC).
+        Index("ix_documents_user_id_id", "user_id", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
@@ -102,9 +186,20 @@ class Document(Base):
         nullable=True,
     )
 
+    # Uploaded files live in the content-addressed blob store instead of
+    # raw_text; storage_path is relative to BLOB_STORE_DIR.
     storage_path: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    size_bytes: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+    # Deferred: only loaded when the body is actually needed.
+    raw_text: Mapped[str | None] = mapped_column(Text, nullable=True, deferred=True)
 
-    raw_text: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Ingestion stats, used as BM25 collection statistics.
+    chunk_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    term_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # "ready" once chunked and indexed; bulk imports start as "pending".
+    index_status: Mapped[str] = mapped_column(String(20), nullable=False, default="ready")
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
@@ -118,6 +213,12 @@ class Document(Base):
         back_populates="document",
         cascade="all, delete-orphan",
     )
+    chunks = relationship(
+        "DocumentChunk",
+        back_populates="document",
+        order_by="DocumentChunk.chunk_index",
+        cascade="all, delete-orphan",
+    )
 
 
 class ConversationDocument(Base):
@@ -135,4 +236,321 @@ class ConversationDocument(Base):
     document_id: Mapped[int] = mapped_column(ForeignKey("documents.id"), nullable=False)
 
     conversation = relationship("Conversation", back_populates="documents")
-    document = relationship("Document", back_populates="conversations")
\ No newline at end of file
+    document = relationship("Document", back_populates="conversations")
+
+
+class DocumentChunk(Base):
+    """
+    A passage of a document produced by ingestion.
+    Chunks overlap; offsets are character positions in raw_text, or byte
+    positions in the stored file for file-backed documents.
+    """
+
+    __tablename__ = "document_chunks"
+    __table_args__ = (
+        UniqueConstraint("document_id", "chunk_index", name="uq_document_chunk"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    document_id: Mapped[int] = mapped_column(ForeignKey("documents.id"), nullable=False)
+    chunk_index: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    start_offset: Mapped[int] = mapped_column(Integer, nullable=False)
+    end_offset: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Passage text of inline documents. Empty for file-backed documents,
+    # whose passages are read from the blob by offset
+    # (app.services.ingestion.chunk_texts) rather than copied in here.
+    content: Mapped[str] = mapped_column(Text, nullable=False)
+
+    # Number of indexed terms in the chunk (BM25 document length).
+    term_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # LLM token estimate of the passage, used by the prompt packer.
+    token_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # float32 embedding of the passage (EMBEDDING_DIM values), for vector search.
+    embedding: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+
+    document = relationship("Document", back_populates="chunks")
+    postings = relationship(
+        "TermPosting",
+        back_populates="chunk",
+        cascade="all, delete-orphan",
+    )
+
+
+class TermPosting(Base):
+    """
+    Inverted index entry: how often a term occurs in a chunk.
+    Built once at ingestion and read by BM25 retrieval.
+    """
+
+    __tablename__ = "term_postings"
+    __table_args__ = (
+        UniqueConstraint("term", "chunk_id", name="uq_term_posting"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    term: Mapped[str] = mapped_column(String(100), nullable=False)
+    chunk_id: Mapped[int] = mapped_column(ForeignKey("document_chunks.id"), nullable=False)
+    # Denormalized so postings can be restricted to linked documents without a join.
+    document_id: Mapped[int] = mapped_column(ForeignKey("documents.id"), nullable=False)
+    term_freq: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    chunk = relationship("DocumentChunk", back_populates="postings")
+
+
+class RateLimitState(Base):
+    """
+    Persisted admission-control state of a user (app.services.rate_limiter):
+    bucket levels as of `updated_at` (epoch seconds) and the tokens used in
+    the current UTC day and month.
+    """
+
+    __tablename__ = "rate_limit_states"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    request_tokens: Mapped[float] = mapped_column(Float, nullable=False)
+    llm_tokens: Mapped[float] = mapped_column(Float, nullable=False)
+    updated_at: Mapped[float] = mapped_column(Float, nullable=False)
+
+    day: Mapped[str] = mapped_column(String(10), nullable=False)
+    day_tokens: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    month: Mapped[str] = mapped_column(String(7), nullable=False)
+    month_tokens: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class GenerationJob(Base):
+    """
+    Assistant reply of an async turn, generated in the background
+    (app.services.generation_jobs). Jobs still queued or running at
+    startup are picked up again.
+    """
+
+    __tablename__ = "generation_jobs"
+    __table_args__ = (
+        # Serves the startup scan for unfinished jobs.
+        Index("ix_generation_jobs_status", "status", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    conversation_id: Mapped[int] = mapped_column(
+        ForeignKey("conversations.id"), nullable=False, index=True
+    )
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    user_message_id: Mapped[int] = mapped_column(ForeignKey("messages.id"), nullable=False)
+
+    # queued -> running -> succeeded | failed
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="queued")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    assistant_message_id: Mapped[int | None] = mapped_column(
+        ForeignKey("messages.id"), nullable=True
+    )
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=utcnow,
+        nullable=False,
+    )
+    started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    conversation = relationship("Conversation", back_populates="generation_jobs")
+
+
+class UsageRollup(Base):
+    """
+    Assistant replies and their token usage per user, UTC day and model.
+    Incremented in the transaction that stores each reply
+    (app.services.usage) and rebuilt by scripts/backfill_usage.py.
+    """
+
+    __tablename__ = "usage_rollups"
+    __table_args__ = (
+        # Upsert target; also serves per-user date-range reports.
+        UniqueConstraint("user_id", "day", "model", name="uq_usage_rollup"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+
+    message_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    prompt_tokens: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    completion_tokens: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+# ------------ Schema upgrades ------------
+
+# Columns backfilled from existing rows when they are added to an older
+# database; next_seq is repaired on every start (see below).
+_BACKFILLS = {
+    "conversations.message_count": (
+        "UPDATE conversations SET message_count = "
+        "(SELECT COUNT(*) FROM messages WHERE messages.conversation_id = conversations.id)"
+    ),
+    "conversations.last_message_at": (
+        "UPDATE conversations SET last_message_at = "
+        "(SELECT MAX(created_at) FROM messages WHERE messages.conversation_id = conversations.id)"
+    ),
+    # Documents stored before chunking existed are indexed again on startup
+    # (app.services.bulk_import.resume_pending_documents).
+    "documents.index_status": (
+        "UPDATE documents SET index_status = 'pending' "
+        "WHERE raw_text IS NOT NULL AND raw_text != '' AND NOT EXISTS "
+        "(SELECT 1 FROM document_chunks WHERE document_chunks.document_id = documents.id)"
+    ),
+}
+
+# Move every conversation's order_index counter past its stored messages,
+# so the next append cannot collide with an existing order_index.
+_REPAIR_NEXT_SEQ = """
+    UPDATE conversations SET next_seq = (
+        SELECT MAX(order_index) + 1 FROM messages
+        WHERE messages.conversation_id = conversations.id
+    )
+    WHERE next_seq <= (
+        SELECT COALESCE(MAX(order_index), 0) FROM messages
+        WHERE messages.conversation_id = conversations.id
+    )
+"""
+
+# SQLite stores DateTime as text, so keyset cursors compare strings. Older
+# databases hold server-default `YYYY-MM-DD HH:MM:SS` values, which sort
+# before the `YYYY-MM-DD HH:MM:SS.ffffff` SQLAlchemy binds for the same
+# instant; rewrite them into the storage format (also on every start).
+_NORMALIZE_TIMESTAMPS = tuple(
+    f"UPDATE conversations SET {column} = {column} || '.000000' "
+    f"WHERE length({column}) = 19"
+    for column in ("updated_at", "last_message_at")
+)
+
+
+def _add_column_ddl(connection, table, column) -> str:
+    dialect = connection.dialect
+    ddl = (
+        f"ALTER TABLE {table.name} ADD COLUMN {column.name} "
+        f"{column.type.compile(dialect=dialect)}"
+    )
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if default is not None:
+        ddl += f" DEFAULT {column.type.literal_processor(dialect)(default)}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+    return ddl
+
+
+def _add_unique_constraint(connection, table, constraint) -> None:
+    columns = ", ".join(c.name for c in constraint.columns)
+    duplicate = connection.execute(
+        text(f"SELECT 1 FROM {table.name} GROUP BY {columns} HAVING COUNT(*) > 1 LIMIT 1")
+    ).first()
+    if duplicate:
+        logger.warning(
+            "Not adding %s: %s has duplicate (%s) rows", constraint.name, table.name, columns
+        )
+        return
+    connection.execute(
+        text(f"CREATE UNIQUE INDEX {constraint.name} ON {table.name} ({columns})")
+    )
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _upgrade_existing_tables(target, connection, **kw) -> None:
+    """
+    Bring a database created by an older version up to the current models.
+
+    create_all only creates missing tables, so columns, indexes and unique
+    constraints added to existing tables are added here, and the values the
+    write paths maintain (message counters, index status) are backfilled.
+    Legacy SQLite timestamps used as pagination keys are rewritten into
+    the format SQLAlchemy stores.
+    Usage rollups are rebuilt separately by scripts/backfill_usage.py.
+    """
+    inspector = inspect(connection)
+    added = set()
+    for table in target.sorted_tables:
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                connection.execute(text(_add_column_ddl(connection, table, column)))
+                added.add(f"{table.name}.{column.name}")
+
+        unique = {c["name"] for c in inspector.get_unique_constraints(table.name)}
+        unique |= {i["name"] for i in inspector.get_indexes(table.name) if i["unique"]}
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint) and constraint.name not in unique:
+                _add_unique_constraint(connection, table, constraint)
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+    if added:
+        logger.info("Added columns to an existing database: %s", ", ".join(sorted(added)))
+    for column, statement in _BACKFILLS.items():
+        if column in added:
+            connection.execute(text(statement))
+    connection.execute(text(_REPAIR_NEXT_SEQ))
+    if connection.dialect.name == "sqlite":
+        for statement in _NORMALIZE_TIMESTAMPS:
+            connection.execute(text(statement))
+
+
+# ------------ Full-text search ------------
+
+# External-content FTS5 index over messages.content (SQLite only), kept in
+# sync by triggers so every write path, including multi-row INSERTs and
+# cascaded deletes, updates it in the writing transaction.
+MESSAGE_FTS_TABLE = "messages_fts"
+
+_MESSAGE_FTS_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+        INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_message_fts(target, connection, **kw) -> None:
+    """
+    Create the FTS index with the other tables; an index added to an
+    existing database is filled from the stored messages.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": MESSAGE_FTS_TABLE},
+    ).first()
+    if exists:
+        return
+    try:
+        connection.execute(
+            text(
+                f"CREATE VIRTUAL TABLE {MESSAGE_FTS_TABLE} USING fts5("
+                "content, content='messages', content_rowid='id', "
+                "tokenize='porter unicode61 remove_diacritics 2')"
+            )
+        )
+    except OperationalError:
+        logger.warning("SQLite was built without FTS5; message search falls back to LIKE")
+        return
+    for ddl in _MESSAGE_FTS_TRIGGERS:
+        connection.execute(text(ddl))
+    connection.execute(
+        text(f"INSERT INTO {MESSAGE_FTS_TABLE}({MESSAGE_FTS_TABLE}) VALUES ('rebuild')")
+    )
@@ -0,0 +1,142 @@
+import hashlib
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple, Union
+
+from app.core.config import settings
+
+Buffer = Union[bytes, mmap.mmap]
+
+
+def text_fingerprint(text: Optional[str]) -> Tuple[Optional[str], Optional[int]]:
+    """
+    (sha256 hex, UTF-8 size in bytes) of an inline document body,
+    matching what the store records for uploaded files.
+    """
+    if text is None:
+        return None, None
+    data = text.encode("utf-8")
+    return hashlib.sha256(data).hexdigest(), len(data)
+
+
+class BlobTooLargeError(ValueError):
+    """
+    Raised when an upload exceeds MAX_UPLOAD_BYTES.
+    """
+
+
+@dataclass
+class StoredBlob:
+    """
+    A blob in the store: its sha256, size in bytes and store-relative path.
+    """
+
+    content_hash: str
+    size: int
+    path: str
+
+
+class BlobWriter:
+    """
+    Incrementally write one upload into the blob store.
+
+    Data is hashed (sha256) while it is written to a temporary file in the
+    store; `commit` moves the file to its content address, so identical
+    uploads are stored once. Nothing is held in memory beyond the chunk
+    being written.
+    """
+
+    def __init__(self, store: "BlobStore", max_bytes: Optional[int] = None):
+        self._store = store
+        self._max_bytes = max_bytes
+        self._hash = hashlib.sha256()
+        fd, self._tmp_path = tempfile.mkstemp(dir=store.tmp_dir, prefix="upload-")
+        self._file = os.fdopen(fd, "wb")
+        self.size = 0
+
+    def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self._max_bytes is not None and self.size > self._max_bytes:
+            raise BlobTooLargeError(f"Upload exceeds {self._max_bytes} bytes")
+        self._hash.update(data)
+        self._file.write(data)
+
+    def commit(self) -> StoredBlob:
+        """
+        Finish the upload and return its location in the store.
+        """
+        self._file.close()
+        content_hash = self._hash.hexdigest()
+        relative_path = self._store.relative_path(content_hash)
+        final_path = self._store.absolute_path(relative_path)
+
+        if os.path.exists(final_path):
+            os.unlink(self._tmp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(self._tmp_path, final_path)
+        return StoredBlob(content_hash=content_hash, size=self.size, path=relative_path)
+
+    def abort(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.unlink(self._tmp_path)
+
+
+class BlobStore:
+    """
+    Content-addressed file store: blobs live at <root>/<h[:2]>/<h[2:4]>/<h>
+    where h is the sha256 of their bytes. Paths recorded on documents are
+    relative to the root.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def relative_path(self, content_hash: str) -> str:
+        return os.path.join(content_hash[:2], content_hash[2:4], content_hash)
+
+    def absolute_path(self, relative_path: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, relative_path))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Blob path escapes the store: {relative_path}")
+        return path
+
+    def writer(self, max_bytes: Optional[int] = None) -> BlobWriter:
+        return BlobWriter(self, max_bytes=max_bytes)
+
+    def size(self, relative_path: str) -> int:
+        return os.path.getsize(self.absolute_path(relative_path))
+
+    @contextmanager
+    def open_mmap(self, relative_path: str) -> Iterator[Buffer]:
+        """
+        Map a blob read-only. Slicing the map reads only the pages touched,
+        so large blobs never have to be loaded whole. Empty blobs (which
+        cannot be mapped) yield b"".
+        """
+        with open(self.absolute_path(relative_path), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield b""
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+
+
+_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    """
+    Process-wide blob store rooted at BLOB_STORE_DIR.
+    """
+    global _store
+    if _store is None or _store.root != os.path.abspath(settings.BLOB_STORE_DIR):
+        _store = BlobStore(settings.BLOB_STORE_DIR)
+    return _store
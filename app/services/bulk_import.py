@@ -0,0 +1,258 @@
+import asyncio
+import codecs
+import json
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import anyio
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, SessionLocal
+from app.core.write_queue import get_write_queue
+from app.models.models import Document, User
+from app.services.ingestion import INDEX_STATUS_PENDING, ingest_document, mark_document_failed
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = " \t\r\n"
+
+
+class BulkParseError(ValueError):
+    """
+    Raised when the request body stops being valid NDJSON / JSON array
+    input; rows parsed before this point are kept.
+    """
+
+
+class JSONRowParser:
+    """
+    Incremental parser for a JSON array of rows or NDJSON (one row per line).
+
+    Feed raw body chunks as they arrive; each call returns the rows that
+    are complete so far, so the body is never held in memory at once.
+    The format is detected from the first non-blank character. A row that
+    is not valid JSON in NDJSON input is returned as a BulkParseError in
+    its place; a malformed JSON array raises, as nothing after it can be
+    parsed.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._mode: Optional[str] = None
+        self._closed_array = False
+
+    def feed(self, data: bytes) -> List[Any]:
+        self._buffer += self._decoder.decode(data)
+        return self._drain(final=False)
+
+    def close(self) -> List[Any]:
+        self._buffer += self._decoder.decode(b"", final=True)
+        rows = self._drain(final=True)
+        if self._mode == "array" and not self._closed_array:
+            raise BulkParseError("JSON array is not terminated")
+        return rows
+
+    def _skip_whitespace(self) -> None:
+        while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+            self._pos += 1
+
+    def _drain(self, final: bool) -> List[Any]:
+        if self._mode is None:
+            self._skip_whitespace()
+            if self._pos >= len(self._buffer):
+                return []
+            if self._buffer[self._pos] == "[":
+                self._mode = "array"
+                self._pos += 1
+            else:
+                self._mode = "ndjson"
+
+        rows = self._drain_array(final) if self._mode == "array" else self._drain_ndjson(final)
+
+        # Drop consumed input so the buffer only holds the incomplete tail.
+        self._buffer = self._buffer[self._pos :]
+        self._pos = 0
+        return rows
+
+    def _drain_ndjson(self, final: bool) -> List[Any]:
+        rows: List[Any] = []
+        while True:
+            newline = self._buffer.find("\n", self._pos)
+            if newline == -1:
+                if not final:
+                    break
+                newline = len(self._buffer)
+            line = self._buffer[self._pos : newline].strip()
+            self._pos = min(newline + 1, len(self._buffer))
+            if line:
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError as exc:
+                    rows.append(BulkParseError(f"Invalid JSON: {exc.msg}"))
+            if self._pos >= len(self._buffer):
+                break
+        return rows
+
+    def _drain_array(self, final: bool) -> List[Any]:
+        rows: List[Any] = []
+        while not self._closed_array:
+            self._skip_whitespace()
+            if self._pos < len(self._buffer) and self._buffer[self._pos] == ",":
+                self._pos += 1
+                self._skip_whitespace()
+            if self._pos >= len(self._buffer):
+                break
+            if self._buffer[self._pos] == "]":
+                self._pos += 1
+                self._closed_array = True
+                break
+            try:
+                row, end = self._json.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as exc:
+                if final:
+                    raise BulkParseError(f"Invalid JSON array: {exc.msg}") from exc
+                break  # Wait for the rest of the value.
+            # A value that runs to the end of the buffer may be cut short
+            # (e.g. a number); wait until something follows it.
+            if end >= len(self._buffer) and not final:
+                break
+            rows.append(row)
+            self._pos = end
+        return rows
+
+
+class BulkDocumentImporter:
+    """
+    Insert validated document rows in batches.
+
+    Rows are buffered and written with one multi-row INSERT ... RETURNING
+    per BULK_INSERT_BATCH_SIZE rows; `flush` is a write-queue job, so each
+    batch is committed by the single writer. Chunking and
+    indexing are left to index_documents, so documents are stored with
+    index_status "pending". `results` holds one
+    {index, status, id | error} dict per row.
+    """
+
+    def __init__(self, batch_size: Optional[int] = None):
+        self.batch_size = batch_size or settings.BULK_INSERT_BATCH_SIZE
+        self.results: List[Dict[str, Any]] = []
+        self.document_ids: List[int] = []
+        self._pending: List[Tuple[int, Dict[str, Any]]] = []
+        self._known_users: Set[int] = set()
+        self._missing_users: Set[int] = set()
+
+    @property
+    def batch_ready(self) -> bool:
+        return len(self._pending) >= self.batch_size
+
+    def add(self, index: int, values: Dict[str, Any]) -> None:
+        """
+        Queue a validated row (Document column values) for insertion.
+        """
+        self._pending.append((index, {**values, "index_status": INDEX_STATUS_PENDING}))
+
+    def fail(self, index: int, message: str) -> None:
+        self.results.append({"index": index, "status": "error", "error": message})
+
+    def flush(self, db: Session) -> None:
+        """
+        Insert the queued rows in one transaction (write-queue job).
+        """
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+
+        self._check_users(db, {values["user_id"] for _, values in pending})
+
+        rows: List[Tuple[int, Dict[str, Any]]] = []
+        for index, values in pending:
+            if values["user_id"] in self._missing_users:
+                self.fail(index, f"User with id {values['user_id']} not found")
+            else:
+                rows.append((index, values))
+        if not rows:
+            return
+
+        ids = db.scalars(
+            insert(Document).returning(Document.id, sort_by_parameter_order=True),
+            [values for _, values in rows],
+        ).all()
+
+        for (index, _), document_id in zip(rows, ids):
+            self.results.append({"index": index, "status": "created", "id": document_id})
+            self.document_ids.append(document_id)
+
+    def _check_users(self, db: Session, user_ids: Set[int]) -> None:
+        unknown = user_ids - self._known_users - self._missing_users
+        if not unknown:
+            return
+        found = {
+            user_id
+            for (user_id,) in db.query(User.id).filter(User.id.in_(unknown)).all()
+        }
+        self._known_users |= found
+        self._missing_users |= unknown - found
+
+
+def index_documents(document_ids: Sequence[int]) -> None:
+    """
+    Chunk and index documents still "pending" (uploads and bulk imports).
+    Runs in a worker thread after the response has been sent.
+
+    Documents are read one at a time and their chunks are written through
+    the write queue in short batches (see ingest_document), so a large
+    import never holds SQLite's write lock against chat writes for long. A
+    document that fails is marked "failed" on its own.
+    """
+    write = get_write_queue().submit_sync
+    for document_id in document_ids:
+        with SessionLocal() as db:
+            document = db.execute(
+                select(Document.raw_text, Document.storage_path)
+                .where(Document.id == document_id)
+                .where(Document.index_status == INDEX_STATUS_PENDING)
+            ).first()
+        if document is None:
+            continue
+        try:
+            ingest_document(
+                write,
+                document_id,
+                raw_text=document.raw_text,
+                storage_path=document.storage_path,
+            )
+        except Exception:
+            logger.exception("Indexing document %s failed", document_id)
+            write(mark_document_failed, document_id)
+
+
+_background_tasks: Set[asyncio.Task] = set()
+
+
+async def resume_pending_documents() -> None:
+    """
+    Index documents left "pending" by a crash or restart (startup hook).
+    Indexing runs in a worker thread in the background.
+    """
+    async with AsyncSessionLocal() as db:
+        document_ids = (
+            await db.scalars(
+                select(Document.id)
+                .where(Document.index_status == INDEX_STATUS_PENDING)
+                .order_by(Document.id)
+            )
+        ).all()
+    if not document_ids:
+        return
+
+    logger.info("Re-queued %d pending documents for indexing", len(document_ids))
+    task = asyncio.get_running_loop().create_task(
+        anyio.to_thread.run_sync(index_documents, list(document_ids))
+    )
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
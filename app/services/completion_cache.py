@@ -0,0 +1,319 @@
+import hashlib
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import anyio
+
+from app.core.config import settings
+from app.core.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CachedReply = Tuple[str, Dict[str, int]]
+
+# Prune expired rows from the disk tier every this many writes.
+_DISK_PRUNE_EVERY = 256
+
+_STOP = object()
+
+
+def completion_cache_key(
+    model_name: str,
+    messages: List[Dict[str, str]],
+    system_prompt: Optional[str] = None,
+    context: Optional[str] = None,
+) -> str:
+    """
+    Stable hash of everything that determines the reply.
+    """
+    payload = json.dumps(
+        {
+            "model": model_name,
+            "system": system_prompt,
+            "context": context,
+            "messages": [[m["role"], m["content"]] for m in messages],
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """
+    Exact-match cache of LLM replies.
+
+    An in-memory LRU bounded by `max_entries` with a TTL, optionally backed
+    by a SQLite file so entries survive restarts and are shared between
+    workers. Safe to use from the event loop and worker threads.
+
+    Disk writes are handed to a writer thread that commits them in batches,
+    and async callers read the disk tier through `aget` in a worker thread,
+    so the event loop never waits on SQLite I/O.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600.0,
+        path: Optional[str] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, CachedReply]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk: Optional[sqlite3.Connection] = None
+        self._disk_lock = threading.Lock()
+        self._disk_queue: "queue.Queue[Any]" = queue.Queue()
+        self._disk_thread: Optional[threading.Thread] = None
+        self._disk_writes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        if path:
+            self._disk = sqlite3.connect(path, check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS completion_cache ("
+                "key TEXT PRIMARY KEY, reply TEXT NOT NULL, usage TEXT NOT NULL, "
+                "expires_at REAL NOT NULL)"
+            )
+            self._disk.commit()
+            self._disk_thread = threading.Thread(
+                target=self._disk_writer, name="completion-cache-writer", daemon=True
+            )
+            self._disk_thread.start()
+
+    def get(self, key: str) -> Optional[CachedReply]:
+        """
+        Look the key up in memory, then on disk (blocking; async code
+        should use `aget`).
+        """
+        value = self._memory_get(key)
+        if value is not None or self._disk is None:
+            return value
+        return self._disk_hit(key, self._disk_get(key))
+
+    async def aget(self, key: str) -> Optional[CachedReply]:
+        value = self._memory_get(key)
+        if value is not None or self._disk is None:
+            return value
+        return self._disk_hit(key, await anyio.to_thread.run_sync(self._disk_get, key))
+
+    def set(self, key: str, reply_text: str, usage: Dict[str, int]) -> None:
+        """
+        Store a reply. The disk write is queued for the writer thread.
+        """
+        value: CachedReply = (reply_text, dict(usage))
+        with self._lock:
+            self._remember(key, value, time.monotonic() + self.ttl_seconds)
+        if self._disk_thread is not None:
+            self._disk_queue.put((key, value, time.time() + self.ttl_seconds))
+
+    def flush(self) -> None:
+        """
+        Wait until queued disk writes are committed.
+        """
+        if self._disk_thread is not None:
+            self._disk_queue.join()
+
+    def clear(self) -> None:
+        self.flush()
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.disk_hits = 0
+        with self._disk_lock:
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM completion_cache")
+                self._disk.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+            }
+
+    def close(self) -> None:
+        thread, self._disk_thread = self._disk_thread, None
+        if thread is not None:
+            self._disk_queue.put(_STOP)
+            thread.join()
+        with self._disk_lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
+
+    def _memory_get(self, key: str) -> Optional[CachedReply]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            if self._disk is None:
+                self.misses += 1
+            return None
+
+    def _disk_hit(
+        self,
+        key: str,
+        found: Optional[Tuple[CachedReply, float]],
+    ) -> Optional[CachedReply]:
+        with self._lock:
+            if found is None:
+                self.misses += 1
+                return None
+            value, expires_at = found
+            # Keep the disk entry's expiry rather than starting a fresh TTL.
+            self._remember(key, value, time.monotonic() + (expires_at - time.time()))
+            self.hits += 1
+            self.disk_hits += 1
+            return value
+
+    def _remember(self, key: str, value: CachedReply, expires_at: float) -> None:
+        # Expects self._lock to be held.
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_get(self, key: str) -> Optional[Tuple[CachedReply, float]]:
+        """
+        Return (reply, expires_at in epoch seconds) from the disk tier.
+        """
+        with self._disk_lock:
+            if self._disk is None:
+                return None
+            try:
+                row = self._disk.execute(
+                    "SELECT reply, usage, expires_at FROM completion_cache "
+                    "WHERE key = ? AND expires_at > ?",
+                    (key, time.time()),
+                ).fetchone()
+            except sqlite3.Error:
+                logger.exception("Completion cache read failed")
+                return None
+        if row is None:
+            return None
+        return (row[0], json.loads(row[1])), row[2]
+
+    def _disk_writer(self) -> None:
+        """
+        Writer thread: apply queued writes, committing everything queued
+        so far with one commit.
+        """
+        while True:
+            items = [self._disk_queue.get()]
+            while True:
+                try:
+                    items.append(self._disk_queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._disk_write([item for item in items if item is not _STOP])
+            finally:
+                for _ in items:
+                    self._disk_queue.task_done()
+            if _STOP in items:
+                return
+
+    def _disk_write(self, items: List[Tuple[str, CachedReply, float]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._disk_lock:
+            if self._disk is None:
+                return
+            try:
+                self._disk.executemany(
+                    "INSERT OR REPLACE INTO completion_cache (key, reply, usage, expires_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    [
+                        (key, value[0], json.dumps(value[1]), expires_at)
+                        for key, value, expires_at in items
+                    ],
+                )
+                previous, self._disk_writes = self._disk_writes, self._disk_writes + len(items)
+                if previous // _DISK_PRUNE_EVERY != self._disk_writes // _DISK_PRUNE_EVERY:
+                    self._disk.execute(
+                        "DELETE FROM completion_cache WHERE expires_at <= ?", (now,)
+                    )
+                self._disk.commit()
+            except sqlite3.Error:
+                logger.exception("Completion cache write failed")
+
+
+_cache: Optional[CompletionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_completion_cache() -> Optional[CompletionCache]:
+    """
+    Process-wide cache built from settings, or None when caching is disabled.
+    """
+    global _cache
+    if not settings.COMPLETION_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CompletionCache(
+                    max_entries=settings.COMPLETION_CACHE_MAX_ENTRIES,
+                    ttl_seconds=settings.COMPLETION_CACHE_TTL_SECONDS,
+                    path=settings.COMPLETION_CACHE_PATH,
+                )
+    return _cache
+
+
+def close_completion_cache() -> None:
+    """
+    Commit queued disk writes and close the process-wide cache (shutdown hook).
+    """
+    global _cache
+    with _cache_lock:
+        cache, _cache = _cache, None
+    if cache is not None:
+        cache.close()
+
+
+def _cache_request_counts() -> Dict[Tuple[str, ...], float]:
+    if _cache is None:
+        return {}
+    stats = _cache.stats()
+    return {
+        ("memory_hit",): stats["hits"] - stats["disk_hits"],
+        ("disk_hit",): stats["disk_hits"],
+        ("miss",): stats["misses"],
+    }
+
+
+def _cache_entries() -> Dict[Tuple[str, ...], float]:
+    return {(): _cache.stats()["entries"]} if _cache is not None else {}
+
+
+REGISTRY.callback(
+    "completion_cache_requests_total",
+    "Completion cache lookups by result.",
+    "counter",
+    _cache_request_counts,
+    ("result",),
+)
+REGISTRY.callback(
+    "completion_cache_entries",
+    "Replies held in the in-memory completion cache.",
+    "gauge",
+    _cache_entries,
+)
@@ -1,105 +1,275 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.models.models import Conversation, ConversationDocument, Document, Message
+from app.core.metrics import CONTEXT_BUILD_SECONDS
+from app.core.tracing import start_span
+from app.models.models import (
+    Conversation,
+    ConversationDocument,
+    Document,
+    DocumentChunk,
+    Message,
+)
+from app.services.ingestion import chunk_texts
+from app.services.llm_client import estimate_tokens
+from app.services.summarizer import get_summary, summary_message
+from app.services.text_index import bm25_scores, tokenize
+from app.services.vector_index import vector_scores
 
+def load_history_window(
+    db: Session,
+    conversation_id: int,
+    max_messages: int,
+    after_order_index: int = 0,
+    until_order_index: Optional[int] = None,
+) -> List[Message]:
+    """
+    Load only the last `max_messages` messages of a conversation, oldest first,
+    skipping those at or before `after_order_index` (already summarized) and,
+    if given, those after `until_order_index`.
+
+    Uses ORDER BY order_index DESC LIMIT N on the (conversation_id, order_index)
+    index, so the cost does not grow with conversation length.
+    """
+    query = (
+        db.query(Message)
+        .filter(Message.conversation_id == conversation_id)
+        .filter(Message.order_index > after_order_index)
+    )
+    if until_order_index is not None:
+        query = query.filter(Message.order_index <= until_order_index)
+    rows = (
+        query.order_by(Message.order_index.desc())
+        .limit(max_messages)
+        .all()
+    )
+    rows.reverse()
+    return rows
+
+@CONTEXT_BUILD_SECONDS.time(step="history")
+@start_span("context.build_message_history")
 def build_message_history(
+    db: Session,
     conversation: Conversation,
     max_messages: Optional[int] = None,
+    until_order_index: Optional[int] = None,
 ) -> List[Dict[str, str]]:
     """
-    Build a list of {role, content} dicts for the last N messages of a conversation.
+    Build a list of {role, content, token_count} dicts for the last N messages
+    of a conversation, or the last N up to `until_order_index`.
+    token_count is the count cached when the message was written.
+
+    If older turns have been summarized, the summary is prepended (as a pinned
+    system entry) in place of the raw messages it covers.
     """
     if max_messages is None:
         max_messages = settings.MAX_HISTORY_MESSAGES
 
-    messages = conversation.messages[-max_messages:]
+    summary = get_summary(db, conversation.id) if settings.SUMMARY_ENABLED else None
+    covered_until = summary.covered_until if summary else 0
+
+    messages = load_history_window(
+        db,
+        conversation.id,
+        max_messages,
+        after_order_index=covered_until,
+        until_order_index=until_order_index,
+    )
 
-    history = []
+    history = [summary_message(summary)] if summary else []
     for m in messages:
         history.append(
             {
                 "role": m.role,
                 "content": m.content,
+                "token_count": m.token_count,
             }
         )
     return history
 
-def _get_last_user_message(conversation: Conversation) -> Optional[str]:
+def _get_last_user_message(db: Session, conversation: Conversation) -> Optional[str]:
     """
     Return content of last user message in the conversation.
     """
-    for m in reversed(conversation.messages):
-        if m.role == "user":
-            return m.content
-    return None
+    return (
+        db.query(Message.content)
+        .filter(Message.conversation_id == conversation.id)
+        .filter(Message.role == "user")
+        .order_by(Message.order_index.desc())
+        .limit(1)
+        .scalar()
+    )
+
+def fuse_scores(
+    lexical: Dict[int, float],
+    semantic: Dict[int, float],
+    vector_weight: float,
+) -> Dict[int, float]:
+    """
+    Hybrid score per chunk: each ranking is scaled to [0, 1] by its best
+    score, then the two are blended with `vector_weight`.
+    """
+    if not semantic:
+        return lexical
+
+    lexical_max = max(lexical.values(), default=0.0) or 1.0
+    semantic_max = max(semantic.values()) or 1.0
+
+    fused: Dict[int, float] = {}
+    for chunk_id in lexical.keys() | semantic.keys():
+        lex = lexical.get(chunk_id, 0.0) / lexical_max
+        vec = max(semantic.get(chunk_id, 0.0), 0.0) / semantic_max
+        fused[chunk_id] = (1 - vector_weight) * lex + vector_weight * vec
+    return fused
 
-def build_rag_context(
+def rank_context_chunks(
     db: Session,
-    conversation: Conversation,
+    document_ids: List[int],
+    query_text: str,
+    limit: int,
+) -> List[Tuple[DocumentChunk, float]]:
+    """
+    Return up to `limit` (chunk, score) pairs, best first.
+
+    Chunks are ranked by BM25 fused with embedding similarity (see
+    fuse_scores), so passages can match without sharing literal words.
+    If nothing matches the query, the leading chunks of the documents are
+    returned instead so the model still sees some grounding material.
+    """
+    if not document_ids or limit <= 0:
+        return []
+
+    with start_span("retrieval.bm25", documents=len(document_ids)):
+        scores = bm25_scores(db, tokenize(query_text), document_ids)
+    if settings.VECTOR_SEARCH_ENABLED and settings.HYBRID_VECTOR_WEIGHT > 0:
+        with start_span("retrieval.vector", documents=len(document_ids)):
+            semantic = vector_scores(db, document_ids, query_text, limit)
+        scores = fuse_scores(scores, semantic, settings.HYBRID_VECTOR_WEIGHT)
+        scores = {cid: score for cid, score in scores.items() if score > 0}
+
+    if scores:
+        ranked_ids = sorted(scores, key=lambda cid: (scores[cid], -cid), reverse=True)[:limit]
+        candidates = {
+            c.id: c
+            for c in db.query(DocumentChunk)
+            .filter(DocumentChunk.id.in_(ranked_ids))
+            .all()
+        }
+        return [(candidates[cid], scores[cid]) for cid in ranked_ids if cid in candidates]
+
+    leading = (
+        db.query(DocumentChunk)
+        .filter(DocumentChunk.document_id.in_(document_ids))
+        .order_by(DocumentChunk.chunk_index, DocumentChunk.document_id)
+        .limit(limit)
+        .all()
+    )
+    return [(c, 0.0) for c in leading]
+
+
+def select_context_chunks(
+    db: Session,
+    document_ids: List[int],
+    query_text: str,
+    top_k: Optional[int] = None,
     max_chars: Optional[int] = None,
-) -> Optional[str]:
+) -> List[Tuple[DocumentChunk, float]]:
     """
-    Build a simple RAG context string from documents linked to the conversation.
+    Return up to top_k (chunk, score) pairs that together fit in max_chars.
 
-    Strategy (simple but reasonable for assignment):
-    1. Get last user message as a "query".
-    2. Fetch all linked documents.
-    3. Score documents based on how many query words appear in raw_text.
-    4. Sort by score and concatenate top docs.
-    5. Truncate to max_chars.
+    A chunk that does not fit the remaining budget is skipped so a smaller,
+    lower-ranked one can still be used.
     """
+    if top_k is None:
+        top_k = settings.RAG_TOP_K_CHUNKS
     if max_chars is None:
         max_chars = settings.MAX_CONTEXT_CHARS
 
-    query_text = _get_last_user_message(conversation) or ""
-    query_words = {
-        w.lower()
-        for w in query_text.split()
-        if len(w) > 2
-    }
+    ranked = rank_context_chunks(db, document_ids, query_text, limit=top_k * 4)
 
-    links = (
-        db.query(ConversationDocument)
+    texts = chunk_texts(db, [chunk for chunk, _ in ranked])
+
+    selected: List[Tuple[DocumentChunk, float]] = []
+    remaining = max_chars
+    for (chunk, score), text in zip(ranked, texts):
+        if len(selected) >= top_k:
+            break
+        if len(text) > remaining:
+            continue
+        selected.append((chunk, score))
+        remaining -= len(text)
+
+    return selected
+
+
+def _linked_document_ids(db: Session, conversation: Conversation) -> List[int]:
+    return [
+        doc_id
+        for (doc_id,) in db.query(ConversationDocument.document_id)
         .filter(ConversationDocument.conversation_id == conversation.id)
         .all()
-    )
+    ]
 
-    if not links:
-        return None
 
-    doc_ids = [link.document_id for link in links]
-    documents = (
-        db.query(Document)
-        .filter(Document.id.in_(doc_ids))
+def _format_passages(
+    db: Session,
+    selected: List[Tuple[DocumentChunk, float]],
+) -> List[Tuple[str, int]]:
+    """
+    Render chunks as "Document: ..." passages with their token counts.
+    """
+    if not selected:
+        return []
+
+    names = dict(
+        db.query(Document.id, Document.name)
+        .filter(Document.id.in_({c.document_id for c, _ in selected}))
         .all()
     )
 
-    scored_docs: List[tuple[int, Document]] = []
-    for doc in documents:
-        if not doc.raw_text:
-            continue
-        text = doc.raw_text.lower()
-        score = sum(1 for w in query_words if w in text)
-        scored_docs.append((score, doc))
+    texts = chunk_texts(db, [chunk for chunk, _ in selected])
+
+    passages: List[Tuple[str, int]] = []
+    for (chunk, score), text in zip(selected, texts):
+        header = (
+            f"Document: {names.get(chunk.document_id, chunk.document_id)} "
+            f"[chunk {chunk.chunk_index}] (score={score:.2f})"
+        )
+        passages.append(
+            (f"{header}\n{text}", chunk.token_count + estimate_tokens(header))
+        )
+    return passages
 
-    if not scored_docs:
-        return None
 
-    scored_docs.sort(key=lambda x: x[0], reverse=True)
+@CONTEXT_BUILD_SECONDS.time(step="rag")
+@start_span("context.build_rag_passages")
+def build_rag_passages(
+    db: Session,
+    conversation: Conversation,
+    query_text: Optional[str] = None,
+    top_k: Optional[int] = None,
+    document_ids: Optional[List[int]] = None,
+) -> List[Tuple[str, int]]:
+    """
+    Return the top-k retrieved passages for the conversation as
+    (text, token_count) pairs in rank order, for the prompt packer.
+    `document_ids` overrides the conversation's linked documents (e.g.
+    for a conversation that is not stored yet).
+    """
+    if top_k is None:
+        top_k = settings.RAG_TOP_K_CHUNKS
 
-    pieces: List[str] = []
-    for score, doc in scored_docs:
-        if doc.raw_text:
-            header = f"Document: {doc.name} (score={score})"
-            pieces.append(header)
-            pieces.append(doc.raw_text)
+    if document_ids is None:
+        doc_ids = _linked_document_ids(db, conversation)
+    else:
+        doc_ids = list(document_ids)
+    if not doc_ids:
+        return []
 
-    combined = "\n\n----- DOCUMENT SEPARATOR -----\n\n".join(pieces)
+    if query_text is None:
+        query_text = _get_last_user_message(db, conversation) or ""
 
-    if len(combined) > max_chars:
-        combined = combined[:max_chars]
+    return _format_passages(db, rank_context_chunks(db, doc_ids, query_text, limit=top_k))
 
-    return combined
\ No newline at end of file
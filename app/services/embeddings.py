@@ -0,0 +1,94 @@
+import hashlib
+import math
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple, Type
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.text_index import tokenize
+
+
+class EmbeddingProvider:
+    """
+    Base class for embedding providers.
+
+    `embed` returns a (len(texts), dim) float32 array of L2-normalized rows,
+    so cosine similarity is a plain dot product.
+    """
+
+    name = "base"
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+@lru_cache(maxsize=65536)
+def _feature_slot(feature: str, dim: int) -> Tuple[int, float]:
+    # Stable across processes, unlike the builtin (salted) hash().
+    digest = int.from_bytes(
+        hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(),
+        "little",
+    )
+    return digest % dim, (1.0 if (digest >> 63) & 1 else -1.0)
+
+
+class HashingEmbedder(EmbeddingProvider):
+    """
+    Deterministic offline embedder using the signed hashing trick.
+
+    Each text is represented by its index terms and their character
+    trigrams, so related word forms ("index", "indexing") land close
+    together even without an exact term match. No model or network needed.
+    """
+
+    name = "hashing"
+
+    def _features(self, text: str) -> Dict[str, float]:
+        counts: Dict[str, float] = {}
+        for term in tokenize(text):
+            counts[term] = counts.get(term, 0.0) + 1.0
+            padded = f"<{term}>"
+            for i in range(len(padded) - 2):
+                gram = "#" + padded[i : i + 3]
+                counts[gram] = counts.get(gram, 0.0) + 0.5
+        return counts
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text).items():
+                slot, sign = _feature_slot(feature, self.dim)
+                # Sublinear term frequency.
+                vectors[row, slot] += sign * math.log1p(weight)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+_EMBEDDERS: Dict[str, Type[EmbeddingProvider]] = {
+    HashingEmbedder.name: HashingEmbedder,
+}
+
+_embedder_instances: Dict[Tuple[str, int], EmbeddingProvider] = {}
+
+
+def get_embedder(name: Optional[str] = None) -> EmbeddingProvider:
+    """
+    Return the (cached) embedding provider for `name` or EMBEDDING_PROVIDER.
+    """
+    provider = (name or settings.EMBEDDING_PROVIDER).lower()
+
+    if provider not in _EMBEDDERS:
+        raise NotImplementedError(
+            f"Embedding provider '{provider}' is not implemented. "
+            f"Available providers: {', '.join(sorted(_EMBEDDERS))}."
+        )
+
+    key = (provider, settings.EMBEDDING_DIM)
+    if key not in _embedder_instances:
+        _embedder_instances[key] = _EMBEDDERS[provider](settings.EMBEDDING_DIM)
+    return _embedder_instances[key]
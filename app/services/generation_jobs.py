@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.metrics import GENERATION_JOBS, REGISTRY
+from app.core.tracing import start_span
+from app.core.write_queue import get_write_queue
+from app.models.models import GenerationJob, utcnow
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+FINISHED_STATUSES = (JOB_SUCCEEDED, JOB_FAILED)
+
+
+@dataclass(frozen=True)
+class QueuedJob:
+    id: int
+    conversation_id: int
+    user_id: int
+    user_message_id: int
+    created_at: datetime
+
+
+def _queued_job(job: GenerationJob) -> QueuedJob:
+    return QueuedJob(
+        job.id, job.conversation_id, job.user_id, job.user_message_id, job.created_at
+    )
+
+
+# ------------ Job table (write-queue jobs) ------------
+
+
+def create_generation_job(
+    db: Session,
+    conversation_id: int,
+    user_id: int,
+    user_message_id: int,
+) -> QueuedJob:
+    job = GenerationJob(
+        conversation_id=conversation_id,
+        user_id=user_id,
+        user_message_id=user_message_id,
+        status=JOB_QUEUED,
+    )
+    db.add(job)
+    db.flush()
+    return _queued_job(job)
+
+
+def claim_generation_job(db: Session, job_id: int, max_attempts: int) -> Optional[QueuedJob]:
+    """
+    Mark a job running and count the attempt. Returns None for a job that
+    is gone (its conversation was deleted) or already finished, and fails
+    one that has used up its attempts.
+    """
+    job = db.get(GenerationJob, job_id)
+    if job is None or job.status in FINISHED_STATUSES:
+        return None
+    if job.attempts >= max_attempts:
+        job.status = JOB_FAILED
+        job.error = f"Gave up after {job.attempts} interrupted attempts"
+        job.finished_at = utcnow()
+        GENERATION_JOBS.inc(status=JOB_FAILED)
+        return None
+    job.status = JOB_RUNNING
+    job.attempts += 1
+    job.started_at = utcnow()
+    return _queued_job(job)
+
+
+def complete_generation_job(db: Session, job_id: int, assistant_message_id: int) -> None:
+    """
+    Mark a job succeeded; called in the transaction that stores its reply.
+    """
+    job = db.get(GenerationJob, job_id)
+    if job is None:
+        return
+    job.status = JOB_SUCCEEDED
+    job.assistant_message_id = assistant_message_id
+    job.error = None
+    job.finished_at = utcnow()
+    GENERATION_JOBS.inc(status=JOB_SUCCEEDED)
+
+
+def fail_generation_job(db: Session, job_id: int, error: str) -> None:
+    job = db.get(GenerationJob, job_id)
+    if job is None:
+        return
+    job.status = JOB_FAILED
+    job.error = error[:1000]
+    job.finished_at = utcnow()
+    GENERATION_JOBS.inc(status=JOB_FAILED)
+
+
+# ------------ Worker pool ------------
+
+JobHandler = Callable[[QueuedJob], Awaitable[None]]
+
+_handler: Optional[JobHandler] = None
+
+
+def register_job_handler(handler: JobHandler) -> None:
+    """
+    Set the coroutine that generates and stores the reply of a claimed job.
+    It must mark the job succeeded (complete_generation_job) in the
+    transaction that stores the reply; raising marks it failed.
+    """
+    global _handler
+    _handler = handler
+
+
+class GenerationWorkerPool:
+    """
+    In-process pool of asyncio workers generating async-turn replies.
+
+    Each worker owns a queue and jobs are routed by conversation id, so the
+    replies of one conversation are generated one at a time, in order. The
+    generation_jobs table is the source of truth: the in-memory queues only
+    hold job ids, and `start` re-queues every job left queued or running,
+    whether by a restart or by the event loop the workers ran on going away
+    (e.g. between test clients).
+    """
+
+    def __init__(self, workers: int = 4, max_attempts: int = 3):
+        self.workers = max(1, workers)
+        self.max_attempts = max_attempts
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        # Ids of the jobs queued or running here, until they finish.
+        self._pending: Set[int] = set()
+        self._watchers: Dict[int, Set[asyncio.Future]] = {}
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    async def start(self) -> None:
+        """
+        Start the workers on the running loop (no-op if running there) and
+        queue the unfinished jobs.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._pending = set()
+        self._watchers = {}
+        self._queues = [asyncio.Queue() for _ in range(self.workers)]
+        self._tasks = [
+            loop.create_task(self._work(q), name=f"generation-worker-{i}")
+            for i, q in enumerate(self._queues)
+        ]
+        async with AsyncSessionLocal() as db:
+            rows = (
+                await db.execute(
+                    select(GenerationJob.id, GenerationJob.conversation_id)
+                    .where(GenerationJob.status.in_((JOB_QUEUED, JOB_RUNNING)))
+                    .order_by(GenerationJob.id)
+                )
+            ).all()
+        for job_id, conversation_id in rows:
+            self.enqueue(job_id, conversation_id)
+        if rows:
+            logger.info("Re-queued %d unfinished generation jobs", len(rows))
+
+    async def stop(self) -> None:
+        """
+        Cancel the workers. Jobs they were running stay `running` in the
+        table and are retried on the next start.
+        """
+        tasks, self._tasks = self._tasks, []
+        loop, self._loop = self._loop, None
+        if loop is not asyncio.get_running_loop():
+            # Workers of a loop that is gone were dropped with it.
+            return
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def enqueue(self, job_id: int, conversation_id: int) -> None:
+        """
+        Queue a committed job (after `start`, on the same loop).
+        """
+        if job_id in self._pending:
+            return
+        self._pending.add(job_id)
+        self._queues[conversation_id % self.workers].put_nowait(job_id)
+
+    @contextmanager
+    def watch(self, job_id: int) -> Iterator[asyncio.Future]:
+        """
+        Future resolved when the job finishes in this process. Register it
+        before reading the job's status, so a finish in between is not missed.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._watchers.setdefault(job_id, set()).add(future)
+        try:
+            yield future
+        finally:
+            watchers = self._watchers.get(job_id)
+            if watchers is not None:
+                watchers.discard(future)
+                if not watchers:
+                    del self._watchers[job_id]
+
+    def _notify(self, job_id: int) -> None:
+        for future in self._watchers.pop(job_id, ()):
+            if not future.done():
+                future.set_result(None)
+
+    async def _work(self, queue: asyncio.Queue) -> None:
+        while True:
+            job_id = await queue.get()
+            try:
+                await self._run(job_id)
+            except Exception:
+                logger.exception("Generation job %s could not be processed", job_id)
+            finally:
+                self._pending.discard(job_id)
+                self._notify(job_id)
+
+    async def _run(self, job_id: int) -> None:
+        with start_span("generation.job", root=True, job_id=job_id):
+            write_queue = get_write_queue()
+            job = await write_queue.submit(claim_generation_job, job_id, self.max_attempts)
+            if job is None:
+                return
+            try:
+                await _handler(job)
+            except Exception as exc:
+                logger.exception("Generation job %s failed", job_id)
+                await write_queue.submit(
+                    fail_generation_job, job_id, str(exc) or type(exc).__name__
+                )
+
+
+_pool: Optional[GenerationWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_generation_pool() -> GenerationWorkerPool:
+    """
+    Process-wide pool built from the GENERATION_* settings.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = GenerationWorkerPool(
+                    workers=settings.GENERATION_WORKERS,
+                    max_attempts=settings.GENERATION_JOB_MAX_ATTEMPTS,
+                )
+    return _pool
+
+
+async def stop_generation_workers() -> None:
+    if _pool is not None:
+        await _pool.stop()
+
+
+REGISTRY.callback(
+    "generation_jobs_in_flight",
+    "Async turn jobs queued or running in this process.",
+    "gauge",
+    lambda: {(): _pool.in_flight} if _pool is not None else {},
+)
@@ -0,0 +1,236 @@
+from collections import Counter
+from contextlib import ExitStack
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import Document, DocumentChunk, TermPosting
+from app.services.blob_store import Buffer, get_blob_store
+from app.services.embeddings import get_embedder
+from app.services.llm_client import estimate_tokens
+from app.services.text_index import index_chunks, term_frequencies
+from app.services.vector_index import embedding_to_bytes
+
+INDEX_STATUS_PENDING = "pending"
+INDEX_STATUS_READY = "ready"
+INDEX_STATUS_FAILED = "failed"
+
+# Chunk rows (DocumentChunk column values) and their term counts.
+ChunkBatch = Tuple[List[Dict[str, Any]], List[Counter]]
+
+# Runs `fn(session, *args)` in a write transaction and returns its result,
+# e.g. WriteQueue.submit_sync.
+WriteFn = Callable[..., Any]
+
+
+def split_into_chunks(
+    text: Union[str, Buffer],
+    chunk_size: Optional[int] = None,
+    overlap: Optional[int] = None,
+) -> List[Tuple[int, int]]:
+    """
+    Split text into overlapping windows and return their (start, end) offsets.
+
+    Windows end on whitespace when possible so words are not cut in half,
+    and each window starts `overlap` characters before the previous end.
+    `text` may also be bytes or an mmap of UTF-8 text, in which case the
+    offsets are byte positions and only the bytes around each cut are read.
+    """
+    if chunk_size is None:
+        chunk_size = settings.CHUNK_SIZE_CHARS
+    if overlap is None:
+        overlap = settings.CHUNK_OVERLAP_CHARS
+    overlap = max(0, min(overlap, chunk_size // 2))
+
+    if isinstance(text, str):
+        space, newline, tab = " ", "\n", "\t"
+    else:
+        space, newline, tab = b" ", b"\n", b"\t"
+
+    length = len(text)
+    spans: List[Tuple[int, int]] = []
+    start = 0
+    while start < length:
+        end = min(start + chunk_size, length)
+        if end < length:
+            cut = text.rfind(space, start + chunk_size // 2, end)
+            if cut == -1:
+                cut = max(
+                    text.rfind(newline, start + chunk_size // 2, end),
+                    text.rfind(tab, start + chunk_size // 2, end),
+                )
+            if cut != -1:
+                end = cut
+
+        spans.append((start, end))
+        if end >= length:
+            break
+
+        next_start = max(end - overlap, start + 1)
+        # Do not start in the middle of a word.
+        boundary = text.find(space, next_start, end)
+        if boundary != -1:
+            next_start = boundary + 1
+        start = next_start
+
+    return spans
+
+
+def _passages(text: Union[str, Buffer]) -> Iterator[Tuple[int, int, str]]:
+    """
+    Yield (start, end, text) for each non-blank chunk window, decoding only
+    the window's bytes when `text` is a buffer.
+    """
+    for start, end in split_into_chunks(text):
+        content = text[start:end]
+        if not isinstance(content, str):
+            content = content.decode("utf-8", errors="replace")
+        if content.strip():
+            yield start, end, content
+
+
+def _chunk_batches(
+    document_id: int,
+    text: Union[str, Buffer],
+    store_content: bool,
+    batch_size: int,
+) -> Iterator[ChunkBatch]:
+    """
+    Yield the document's chunks as (rows, term_freqs) batches of at most
+    `batch_size`, with their embeddings; only one batch of passages is in
+    memory at a time. Without `store_content` (file-backed documents) the
+    chunks keep just their byte offsets.
+    """
+    passages = _passages(text)
+    chunk_index = 0
+    while True:
+        batch = list(islice(passages, batch_size))
+        if not batch:
+            return
+        texts = [content for _, _, content in batch]
+        term_freqs = [term_frequencies(content) for content in texts]
+        embeddings: List[Optional[bytes]] = [None] * len(batch)
+        if settings.VECTOR_SEARCH_ENABLED:
+            embeddings = [embedding_to_bytes(v) for v in get_embedder().embed(texts)]
+
+        rows = [
+            {
+                "document_id": document_id,
+                "chunk_index": chunk_index + i,
+                "start_offset": start,
+                "end_offset": end,
+                "content": content if store_content else "",
+                "term_count": sum(freqs.values()),
+                "token_count": estimate_tokens(content),
+                "embedding": embedding,
+            }
+            for i, ((start, end, content), freqs, embedding) in enumerate(
+                zip(batch, term_freqs, embeddings)
+            )
+        ]
+        chunk_index += len(batch)
+        yield rows, term_freqs
+
+
+def _clear_chunks(db: Session, document_id: int) -> None:
+    """
+    Remove chunks (and their postings) left by an earlier, interrupted
+    ingestion of the document (write-queue job).
+    """
+    chunk_ids = select(DocumentChunk.id).where(DocumentChunk.document_id == document_id)
+    if db.execute(chunk_ids.limit(1)).first() is None:
+        return
+    db.execute(delete(TermPosting).where(TermPosting.chunk_id.in_(chunk_ids)))
+    db.execute(delete(DocumentChunk).where(DocumentChunk.document_id == document_id))
+
+
+def _finish_document(db: Session, document_id: int, chunk_count: int, term_count: int) -> None:
+    db.execute(
+        update(Document)
+        .where(Document.id == document_id)
+        .values(chunk_count=chunk_count, term_count=term_count, index_status=INDEX_STATUS_READY)
+    )
+
+
+def mark_document_failed(db: Session, document_id: int) -> None:
+    """
+    Drop whatever was indexed for the document and mark it "failed"
+    (write-queue job).
+    """
+    _clear_chunks(db, document_id)
+    db.execute(
+        update(Document)
+        .where(Document.id == document_id)
+        .values(chunk_count=0, term_count=0, index_status=INDEX_STATUS_FAILED)
+    )
+
+
+def ingest_document(
+    write: WriteFn,
+    document_id: int,
+    raw_text: Optional[str] = None,
+    storage_path: Optional[str] = None,
+) -> int:
+    """
+    Split a stored document into chunks, index them and store their
+    embeddings, then mark it "ready". Returns the number of chunks created.
+
+    Chunks are built and embedded INGEST_BATCH_CHUNKS at a time in the
+    calling thread, and each batch is written by its own `write` call
+    (normally WriteQueue.submit_sync), so neither memory nor the length of
+    a write transaction grows with the document, and other writers are not
+    held up behind a large one. Callers mark the document failed if this
+    raises (mark_document_failed).
+
+    File-backed documents (storage_path set) are read through mmap from
+    the blob store; their chunk offsets are byte positions in the file and
+    their passage text is not copied into the database (see chunk_texts).
+    """
+    write(_clear_chunks, document_id)
+    chunk_count = term_count = 0
+    with ExitStack() as stack:
+        if storage_path:
+            text = stack.enter_context(get_blob_store().open_mmap(storage_path))
+        else:
+            text = raw_text or ""
+        batches = _chunk_batches(
+            document_id, text, not storage_path, settings.INGEST_BATCH_CHUNKS
+        )
+        for rows, term_freqs in batches:
+            term_count += write(index_chunks, rows, term_freqs)
+            chunk_count += len(rows)
+
+    write(_finish_document, document_id, chunk_count, term_count)
+    return chunk_count
+
+
+def chunk_texts(db: Session, chunks: Sequence[DocumentChunk]) -> List[str]:
+    """
+    Passage text of each chunk: its `content` for inline documents, or the
+    bytes at its offsets in the blob, read through mmap, for file-backed ones.
+    """
+    if not chunks:
+        return []
+    texts = [chunk.content for chunk in chunks]
+    paths = dict(
+        db.query(Document.id, Document.storage_path)
+        .filter(Document.id.in_({chunk.document_id for chunk in chunks}))
+        .filter(Document.storage_path.isnot(None))
+        .all()
+    )
+    by_path: Dict[str, List[int]] = {}
+    for i, chunk in enumerate(chunks):
+        if chunk.document_id in paths:
+            by_path.setdefault(paths[chunk.document_id], []).append(i)
+
+    for path, positions in by_path.items():
+        with get_blob_store().open_mmap(path) as data:
+            for i in positions:
+                chunk = chunks[i]
+                texts[i] = data[chunk.start_offset : chunk.end_offset].decode(
+                    "utf-8", errors="replace"
+                )
+    return texts
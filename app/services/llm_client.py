@@ -1,10 +1,65 @@
-from typing import Dict, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import (
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
+
+import httpx
 
 from app.core.config import settings
+from app.core.metrics import LLM_BATCH_SIZE, LLM_GENERATE_SECONDS, record_llm_usage
+from app.core.tracing import start_span
+from app.services.completion_cache import (
+    CompletionCache,
+    completion_cache_key,
+    get_completion_cache,
+)
+
+logger = logging.getLogger(__name__)
+
+# A word plus its trailing whitespace, so deltas re-join to the exact text.
+_DELTA_RE = re.compile(r"\s*\S+\s*|\s+")
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a conversation. Merge the previous "
+    "summary with the new messages into one concise summary that keeps facts, "
+    "decisions, names and open questions. Reply with the summary only."
+)
+
+# Usage reported for replies served from the completion cache:
+# nothing was sent to the provider.
+_CACHED_USAGE = {"prompt_tokens": 0, "completion_tokens": 0}
+
+# Provider responses worth retrying.
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMProviderError(Exception):
+    """
+    Raised when the LLM provider cannot produce a reply
+    (after retries, or because of a non-retryable error).
+    """
+
 
-def _estimate_tokens(text: str) -> int:
+def estimate_tokens(text: str) -> int:
     """
     Very rough token estimate. Good enough for logging / cost awareness in this assignment.
+    Counts are cached on messages and chunks at write time, so this runs once per text.
     """
     if not text:
         return 0
@@ -31,14 +86,71 @@ def _build_prompt_text(
 
     return "\n\n".join(parts)
 
-def _call_dummy_llm(
+class ReplyStream:
+    """
+    Iterator over the text deltas of an LLM reply.
+
+    Once fully consumed, `text` holds the whole reply and `usage`
+    the token counts for it.
+    """
+
+    def __init__(
+        self,
+        deltas: Iterator[str],
+        usage_fn: Callable[[str], Dict[str, int]],
+    ):
+        self._deltas = deltas
+        self._usage_fn = usage_fn
+        self._parts: List[str] = []
+        self.usage: Optional[Dict[str, int]] = None
+
+    def __iter__(self) -> Iterator[str]:
+        for delta in self._deltas:
+            self._parts.append(delta)
+            yield delta
+        self.usage = self._usage_fn(self.text)
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+
+class AsyncReplyStream:
+    """
+    Async counterpart of ReplyStream, returned by the async provider API.
+    """
+
+    def __init__(
+        self,
+        deltas: AsyncIterator[str],
+        usage_fn: Callable[[str], Dict[str, int]],
+    ):
+        self._deltas = deltas
+        self._usage_fn = usage_fn
+        self._parts: List[str] = []
+        self.usage: Optional[Dict[str, int]] = None
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        async for delta in self._deltas:
+            self._parts.append(delta)
+            yield delta
+        self.usage = self._usage_fn(self.text)
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+
+def _stream_dummy_llm(
     messages: List[Dict[str, str]],
     system_prompt: Optional[str],
     context: Optional[str],
-) -> Tuple[str, Dict[str, int]]:
+    prompt_tokens: Optional[int] = None,
+) -> ReplyStream:
     """
     Dummy LLM: does NOT call any external service.
     It just echoes the last user message and notes if RAG context exists.
+    The reply is emitted word by word to mimic a streaming provider.
     """
 
     last_user_message = ""
@@ -60,33 +172,715 @@ def _call_dummy_llm(
 
     reply_text = "\n\n".join(reply_parts)
 
-    prompt_text = _build_prompt_text(messages, system_prompt=system_prompt, context=context)
+    if prompt_tokens is None:
+        prompt_text = _build_prompt_text(messages, system_prompt=system_prompt, context=context)
+        prompt_tokens = estimate_tokens(prompt_text)
 
-    usage = {
-        "prompt_tokens": _estimate_tokens(prompt_text),
-        "completion_tokens": _estimate_tokens(reply_text),
-    }
+    def usage_fn(text: str) -> Dict[str, int]:
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": estimate_tokens(text),
+        }
 
-    return reply_text, usage
+    return ReplyStream(iter(_DELTA_RE.findall(reply_text)), usage_fn)
+
+
+# ------------ Async provider interface ------------
+
+class _SharedHTTPState:
+    """
+    Process-wide HTTP client and per-provider semaphores.
+
+    Both are bound to the event loop that created them, so they are
+    rebuilt if the running loop changes (e.g. between test clients).
+    """
+
+    def __init__(self):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.client: Optional[httpx.AsyncClient] = None
+        self.semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _ensure_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.client = None
+            self.semaphores = {}
+
+    def get_client(self) -> httpx.AsyncClient:
+        self._ensure_loop()
+        if self.client is None or self.client.is_closed:
+            self.client = httpx.AsyncClient(
+                timeout=httpx.Timeout(
+                    connect=settings.LLM_CONNECT_TIMEOUT,
+                    read=settings.LLM_READ_TIMEOUT,
+                    write=settings.LLM_CONNECT_TIMEOUT,
+                    pool=settings.LLM_CONNECT_TIMEOUT,
+                ),
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                ),
+            )
+        return self.client
+
+    def get_semaphore(self, provider_name: str) -> asyncio.Semaphore:
+        self._ensure_loop()
+        if provider_name not in self.semaphores:
+            self.semaphores[provider_name] = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+        return self.semaphores[provider_name]
+
+    async def aclose(self) -> None:
+        if self.client is not None and not self.client.is_closed:
+            await self.client.aclose()
+        self.client = None
+
+
+_http_state = _SharedHTTPState()
+
+
+async def close_http_client() -> None:
+    """
+    Close the shared provider HTTP client (called on app shutdown).
+    """
+    await _http_state.aclose()
+
+
+@dataclass
+class CompletionRequest:
+    """
+    Inputs of one non-streaming completion, as queued for a batch.
+    """
+
+    messages: List[Dict[str, str]]
+    system_prompt: Optional[str] = None
+    context: Optional[str] = None
+    prompt_tokens: Optional[int] = None
+
+
+# Per-request outcome of a batch: (reply, usage) or the request's error.
+BatchResult = Union[Tuple[str, Dict[str, int]], Exception]
+
+
+class LLMProvider:
+    """
+    Base class for async LLM providers.
+
+    Subclasses implement `complete` (whole reply) and `stream`
+    (incremental deltas). Both take the same inputs as agenerate_reply.
+    Providers with a batch endpoint also override `complete_batch`.
+    """
+
+    name = "base"
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str] = None,
+        context: Optional[str] = None,
+        prompt_tokens: Optional[int] = None,
+    ) -> Tuple[str, Dict[str, int]]:
+        stream = self.stream(
+            messages,
+            system_prompt=system_prompt,
+            context=context,
+            prompt_tokens=prompt_tokens,
+        )
+        async for _ in stream:
+            pass
+        return stream.text, stream.usage or {}
+
+    async def complete_batch(self, requests: List[CompletionRequest]) -> List[BatchResult]:
+        """
+        Complete several requests; results are in request order and a
+        failed request yields its exception rather than failing the batch.
+        By default the requests are sent concurrently, one call each.
+        """
+        return await asyncio.gather(
+            *(
+                self.complete(
+                    r.messages,
+                    system_prompt=r.system_prompt,
+                    context=r.context,
+                    prompt_tokens=r.prompt_tokens,
+                )
+                for r in requests
+            ),
+            return_exceptions=True,
+        )
+
+    def stream(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str] = None,
+        context: Optional[str] = None,
+        prompt_tokens: Optional[int] = None,
+    ) -> AsyncReplyStream:
+        raise NotImplementedError
+
+    async def summarize(
+        self,
+        previous_summary: Optional[str],
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+    ) -> str:
+        """
+        Fold `messages` into `previous_summary` and return the new summary.
+        """
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        request = (
+            f"Previous summary:\n{previous_summary or '(none)'}\n\n"
+            f"New messages:\n{transcript}\n\n"
+            f"Write the updated summary in at most {max_tokens} tokens."
+        )
+        text, _ = await self.complete(
+            [{"role": "user", "content": request}],
+            system_prompt=SUMMARY_SYSTEM_PROMPT,
+        )
+        return text.strip()
+
+
+class DummyProvider(LLMProvider):
+    """
+    Async wrapper around the dummy model (no network).
+    """
+
+    name = "dummy"
+
+    async def _simulate_latency(self) -> None:
+        # Calls share the provider's LLM_MAX_CONCURRENCY slots, like a
+        # backend with finite capacity.
+        if settings.DUMMY_LLM_LATENCY_MS > 0:
+            async with _http_state.get_semaphore(self.name):
+                await asyncio.sleep(settings.DUMMY_LLM_LATENCY_MS / 1000)
+
+    @staticmethod
+    def _reply(request: CompletionRequest) -> Tuple[str, Dict[str, int]]:
+        stream = _stream_dummy_llm(
+            request.messages,
+            system_prompt=request.system_prompt,
+            context=request.context,
+            prompt_tokens=request.prompt_tokens,
+        )
+        for _ in stream:
+            pass
+        return stream.text, stream.usage or {}
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str] = None,
+        context: Optional[str] = None,
+        prompt_tokens: Optional[int] = None,
+    ) -> Tuple[str, Dict[str, int]]:
+        await self._simulate_latency()
+        return self._reply(CompletionRequest(messages, system_prompt, context, prompt_tokens))
+
+    async def complete_batch(self, requests: List[CompletionRequest]) -> List[BatchResult]:
+        """
+        The whole batch costs one simulated call, like a backend that runs
+        the batch through the model together.
+        """
+        await self._simulate_latency()
+        return [self._reply(r) for r in requests]
+
+    def stream(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str] = None,
+        context: Optional[str] = None,
+        prompt_tokens: Optional[int] = None,
+    ) -> AsyncReplyStream:
+        sync_stream = _stream_dummy_llm(
+            messages,
+            system_prompt=system_prompt,
+            context=context,
+            prompt_tokens=prompt_tokens,
+        )
+
+        async def deltas() -> AsyncIterator[str]:
+            for delta in sync_stream:
+                yield delta
+
+        return AsyncReplyStream(deltas(), lambda text: sync_stream.usage or {})
+
+    async def summarize(
+        self,
+        previous_summary: Optional[str],
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+    ) -> str:
+        """
+        Extractive summary: one clipped line per message appended to the
+        previous summary, dropping the oldest lines beyond max_tokens.
+        """
+        lines = previous_summary.splitlines() if previous_summary else []
+        for m in messages:
+            words = m["content"].split()
+            clipped = " ".join(words[:25]) + (" ..." if len(words) > 25 else "")
+            lines.append(f"- {m['role']}: {clipped}")
+
+        while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+            lines.pop(0)
+        return "\n".join(lines)
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """
+    Provider for any OpenAI-compatible `/chat/completions` endpoint.
+
+    Requests go through the shared pooled httpx client, are limited by a
+    per-provider semaphore, and are retried with exponential backoff and
+    full jitter on timeouts, connection errors and 408/409/429/5xx.
+    """
 
-def generate_reply(
+    name = "openai"
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        model: Optional[str] = None,
+        max_retries: Optional[int] = None,
+    ):
+        self.base_url = (base_url or settings.LLM_BASE_URL).rstrip("/")
+        self.api_key = api_key if api_key is not None else settings.LLM_API_KEY
+        self.model = model or settings.LLM_MODEL_NAME
+        self.max_retries = settings.LLM_MAX_RETRIES if max_retries is None else max_retries
+
+    def _payload(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str],
+        context: Optional[str],
+        stream: bool,
+    ) -> Dict:
+        chat: List[Dict[str, str]] = []
+        system_parts = [p for p in (system_prompt, context and f"Context:\n{context}") if p]
+        if system_parts:
+            chat.append({"role": "system", "content": "\n\n".join(system_parts)})
+        chat.extend({"role": m["role"], "content": m["content"]} for m in messages)
+
+        payload: Dict = {"model": self.model, "messages": chat, "stream": stream}
+        if stream:
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+
+    def _headers(self) -> Dict[str, str]:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), settings.LLM_RETRY_MAX_DELAY)
+        cap = min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BASE_DELAY * (2 ** attempt))
+        return random.uniform(0, cap)
+
+    async def _send(self, payload: Dict, stream: bool) -> httpx.Response:
+        """
+        Send the request, retrying transient failures.
+        For streaming requests the returned response is still open.
+        """
+        client = _http_state.get_client()
+        url = f"{self.base_url}/chat/completions"
+
+        attempt = 0
+        while True:
+            response: Optional[httpx.Response] = None
+            try:
+                request = client.build_request("POST", url, json=payload, headers=self._headers())
+                response = await client.send(request, stream=stream)
+                if response.status_code < 400:
+                    return response
+                if stream:
+                    await response.aread()
+                    await response.aclose()
+                if response.status_code not in _RETRYABLE_STATUS:
+                    raise LLMProviderError(
+                        f"LLM provider returned {response.status_code}: {response.text[:200]}"
+                    )
+                error: Exception = LLMProviderError(
+                    f"LLM provider returned {response.status_code}"
+                )
+            except (httpx.TimeoutException, httpx.TransportError) as exc:
+                error = exc
+
+            if attempt >= self.max_retries:
+                raise LLMProviderError(
+                    f"LLM provider request failed after {attempt + 1} attempts: {error}"
+                ) from error
+
+            delay = self._retry_delay(attempt, response)
+            logger.warning(
+                "LLM request to %s failed (%s), retrying in %.2fs",
+                self.name,
+                error,
+                delay,
+            )
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str] = None,
+        context: Optional[str] = None,
+        prompt_tokens: Optional[int] = None,
+    ) -> Tuple[str, Dict[str, int]]:
+        payload = self._payload(messages, system_prompt, context, stream=False)
+
+        async with _http_state.get_semaphore(self.name):
+            response = await self._send(payload, stream=False)
+
+        try:
+            data = response.json()
+            text = data["choices"][0]["message"]["content"] or ""
+        except (ValueError, KeyError, IndexError, TypeError) as exc:
+            raise LLMProviderError("Malformed response from LLM provider") from exc
+
+        usage = data.get("usage") or {}
+        return text, {
+            "prompt_tokens": usage.get("prompt_tokens", prompt_tokens or 0),
+            "completion_tokens": usage.get("completion_tokens", estimate_tokens(text)),
+        }
+
+    def stream(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str] = None,
+        context: Optional[str] = None,
+        prompt_tokens: Optional[int] = None,
+    ) -> AsyncReplyStream:
+        payload = self._payload(messages, system_prompt, context, stream=True)
+        reported: Dict[str, int] = {}
+
+        async def deltas() -> AsyncIterator[str]:
+            async with _http_state.get_semaphore(self.name):
+                response = await self._send(payload, stream=True)
+                try:
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        try:
+                            event = json.loads(data)
+                        except ValueError:
+                            continue
+                        if event.get("usage"):
+                            reported.update(event["usage"])
+                        for choice in event.get("choices") or []:
+                            delta = (choice.get("delta") or {}).get("content")
+                            if delta:
+                                yield delta
+                except (httpx.TimeoutException, httpx.TransportError) as exc:
+                    raise LLMProviderError(f"LLM stream interrupted: {exc}") from exc
+                finally:
+                    await response.aclose()
+
+        def usage_fn(text: str) -> Dict[str, int]:
+            return {
+                "prompt_tokens": reported.get("prompt_tokens", prompt_tokens or 0),
+                "completion_tokens": reported.get("completion_tokens", estimate_tokens(text)),
+            }
+
+        return AsyncReplyStream(deltas(), usage_fn)
+
+
+_PROVIDERS: Dict[str, Type[LLMProvider]] = {
+    "dummy": DummyProvider,
+    "openai": OpenAICompatibleProvider,
+}
+
+_provider_instances: Dict[str, LLMProvider] = {}
+
+
+def get_provider(name: Optional[str] = None) -> LLMProvider:
+    """
+    Return the (cached) provider instance for `name` or LLM_PROVIDER.
+    """
+    provider = (name or settings.LLM_PROVIDER or "dummy").lower()
+
+    if provider not in _PROVIDERS:
+        raise NotImplementedError(
+            f"LLM provider '{provider}' is not implemented. "
+            f"Available providers: {', '.join(sorted(_PROVIDERS))}."
+        )
+
+    if provider not in _provider_instances:
+        _provider_instances[provider] = _PROVIDERS[provider]()
+    return _provider_instances[provider]
+
+
+# ------------ Micro-batching ------------
+
+
+@dataclass
+class _PendingBatch:
+    provider: LLMProvider
+    items: List[Tuple[CompletionRequest, asyncio.Future]] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class BatchScheduler:
+    """
+    Groups concurrent completions for the same provider and model into
+    provider batches.
+
+    The first request of a batch starts a `max_wait_ms` timer; the batch is
+    sent through `complete_batch` when the timer fires or `max_batch_size`
+    requests are waiting, whichever comes first, and each caller gets its
+    own result (or error) back. A caller that is cancelled while waiting
+    is dropped from its batch if the batch has not been sent yet.
+
+    Batches live on the event loop that queued them; state is reset if the
+    running loop changes (e.g. between test clients).
+    """
+
+    def __init__(self, max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[Tuple[str, str], _PendingBatch] = {}
+        self._dispatching: Set[asyncio.Task] = set()
+        self.batches = 0
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._pending = {}
+            self._dispatching = set()
+        return loop
+
+    async def submit(
+        self,
+        provider: LLMProvider,
+        request: CompletionRequest,
+    ) -> Tuple[str, Dict[str, int]]:
+        loop = self._ensure_loop()
+        key = (provider.name, getattr(provider, "model", settings.LLM_MODEL_NAME))
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = _PendingBatch(provider)
+            batch.timer = loop.call_later(self.max_wait_ms / 1000, self._flush, key, batch)
+
+        future = loop.create_future()
+        batch.items.append((request, future))
+        if len(batch.items) >= self.max_batch_size:
+            self._flush(key, batch)
+        return await future
+
+    def _flush(self, key: Tuple[str, str], batch: _PendingBatch) -> None:
+        if self._pending.get(key) is batch:
+            del self._pending[key]
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = asyncio.get_running_loop().create_task(self._dispatch(batch))
+        self._dispatching.add(task)
+        task.add_done_callback(self._dispatching.discard)
+
+    async def _dispatch(self, batch: _PendingBatch) -> None:
+        items = [(request, future) for request, future in batch.items if not future.done()]
+        if not items:
+            return
+        provider = batch.provider
+        self.batches += 1
+        LLM_BATCH_SIZE.observe(len(items), provider=provider.name)
+
+        results: List[BatchResult]
+        try:
+            results = await provider.complete_batch([request for request, _ in items])
+            if len(results) != len(items):
+                raise LLMProviderError(
+                    f"LLM provider returned {len(results)} results for a batch of {len(items)}"
+                )
+        except Exception as exc:
+            logger.exception("LLM batch of %d requests to %s failed", len(items), provider.name)
+            results = [exc] * len(items)
+
+        for (_, future), result in zip(items, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+_scheduler: Optional[BatchScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_batch_scheduler() -> BatchScheduler:
+    """
+    Process-wide scheduler built from the LLM_BATCH_* settings.
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = BatchScheduler(
+                    max_batch_size=settings.LLM_BATCH_MAX_SIZE,
+                    max_wait_ms=settings.LLM_BATCH_MAX_WAIT_MS,
+                )
+    return _scheduler
+
+
+def _observed_stream(provider: LLMProvider, inner: AsyncReplyStream) -> AsyncReplyStream:
+    """
+    Wrap a provider stream so its duration and token usage are recorded
+    once it has been fully consumed.
+    """
+
+    async def deltas() -> AsyncIterator[str]:
+        start = time.perf_counter()
+        with start_span("llm.generate_reply", provider=provider.name, stream=True) as span:
+            async for delta in inner:
+                yield delta
+            if span is not None:
+                span.attributes["usage"] = inner.usage
+        LLM_GENERATE_SECONDS.observe(
+            time.perf_counter() - start, provider=provider.name, mode="stream"
+        )
+        record_llm_usage(provider.name, inner.usage)
+
+    return AsyncReplyStream(deltas(), lambda text: inner.usage or {})
+
+
+def _reply_cache(
+    provider: LLMProvider,
+    use_cache: bool,
+    messages: List[Dict[str, str]],
+    system_prompt: Optional[str],
+    context: Optional[str],
+) -> Tuple[Optional[CompletionCache], str]:
+    """
+    The completion cache and this prompt's key, or (None, "") when not caching.
+    """
+    cache = get_completion_cache() if use_cache else None
+    if cache is None:
+        return None, ""
+    model_name = f"{provider.name}:{settings.LLM_MODEL_NAME}"
+    return cache, completion_cache_key(model_name, messages, system_prompt, context)
+
+
+async def agenerate_reply(
     messages: List[Dict[str, str]],
     system_prompt: Optional[str] = None,
     context: Optional[str] = None,
+    prompt_tokens: Optional[int] = None,
+    use_cache: bool = True,
 ) -> Tuple[str, Dict[str, int]]:
     """
-    Main entry point for the rest of the app.
+    Async entry point: full reply and usage from the configured provider.
+    Does not hold a thread while waiting on the provider.
+
+    Identical prompts are answered from the completion cache (reporting
+    zero usage) unless `use_cache` is False. With LLM_BATCHING_ENABLED the
+    request joins a micro-batch of concurrent requests (BatchScheduler).
+    """
+    provider = get_provider()
+    cache, key = _reply_cache(provider, use_cache, messages, system_prompt, context)
+    if cache is not None:
+        cached = await cache.aget(key)
+        if cached is not None:
+            with start_span("llm.generate_reply", provider=provider.name, cache_hit=True):
+                return cached[0], dict(_CACHED_USAGE)
+
+    batched = settings.LLM_BATCHING_ENABLED and settings.LLM_BATCH_MAX_SIZE > 1
+    with (
+        start_span("llm.generate_reply", provider=provider.name, batched=batched) as span,
+        LLM_GENERATE_SECONDS.time(provider=provider.name, mode="complete"),
+    ):
+        if batched:
+            reply_text, usage = await get_batch_scheduler().submit(
+                provider,
+                CompletionRequest(messages, system_prompt, context, prompt_tokens),
+            )
+        else:
+            reply_text, usage = await provider.complete(
+                messages,
+                system_prompt=system_prompt,
+                context=context,
+                prompt_tokens=prompt_tokens,
+            )
+        if span is not None:
+            span.attributes["usage"] = usage
+    record_llm_usage(provider.name, usage)
+    if cache is not None and reply_text:
+        cache.set(key, reply_text, usage)
+    return reply_text, usage
+
+
+def astream_reply(
+    messages: List[Dict[str, str]],
+    system_prompt: Optional[str] = None,
+    context: Optional[str] = None,
+    prompt_tokens: Optional[int] = None,
+    use_cache: bool = True,
+) -> AsyncReplyStream:
+    """
+    Async streaming entry point: an AsyncReplyStream of text deltas.
 
-    For this assignment we keep it simple:
-    - If LLM_PROVIDER == "dummy": use the dummy echo-like model.
-    - Otherwise: raise NotImplementedError (you can extend this later to call a real LLM).
+    A cached reply is delivered as a single delta; a fresh one is cached
+    once the stream has been fully consumed.
     """
-    provider = (settings.LLM_PROVIDER or "dummy").lower()
+    provider = get_provider()
+    cache, key = _reply_cache(provider, use_cache, messages, system_prompt, context)
+    if cache is None:
+        return _observed_stream(
+            provider,
+            provider.stream(
+                messages,
+                system_prompt=system_prompt,
+                context=context,
+                prompt_tokens=prompt_tokens,
+            ),
+        )
+
+    usage: Dict[str, int] = {}
+
+    async def deltas() -> AsyncIterator[str]:
+        # Looked up on first iteration, so a disk-tier read is awaited
+        # rather than run on the event loop.
+        cached = await cache.aget(key)
+        if cached is not None:
+            usage.update(_CACHED_USAGE)
+            yield cached[0]
+            return
+
+        inner = _observed_stream(
+            provider,
+            provider.stream(
+                messages,
+                system_prompt=system_prompt,
+                context=context,
+                prompt_tokens=prompt_tokens,
+            ),
+        )
+        async for delta in inner:
+            yield delta
+        usage.update(inner.usage or {})
+        if inner.text:
+            cache.set(key, inner.text, usage)
+
+    return AsyncReplyStream(deltas(), lambda text: dict(usage))
 
-    if provider == "dummy":
-        return _call_dummy_llm(messages, system_prompt=system_prompt, context=context)
 
-    raise NotImplementedError(
-        f"LLM provider '{settings.LLM_PROVIDER}' is not implemented yet. "
-        "For this assignment, keep LLM_PROVIDER='dummy'."
-    )
\ No newline at end of file
+async def asummarize(
+    previous_summary: Optional[str],
+    messages: List[Dict[str, str]],
+    max_tokens: int,
+) -> str:
+    """
+    Fold older conversation messages into a running summary
+    using the configured provider.
+    """
+    return await get_provider().summarize(previous_summary, messages, max_tokens)
+
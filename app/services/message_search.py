@@ -0,0 +1,183 @@
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import and_, select, text
+from sqlalchemy.orm import Session
+
+from app.core.tracing import start_span
+from app.models.models import MESSAGE_FTS_TABLE, Conversation, Message
+
+# Query terms: words, optionally ending in * for a prefix match.
+_TERM_RE = re.compile(r"\w+\*?")
+
+SNIPPET_OPEN = "<mark>"
+SNIPPET_CLOSE = "</mark>"
+# Tokens of context around the matches in each snippet (FTS5) and the
+# characters around the first match for the LIKE fallback.
+SNIPPET_TOKENS = 12
+_FALLBACK_SNIPPET_CHARS = 60
+
+# Sort key of a hit: (score, message id), ascending.
+SearchKey = Tuple[float, int]
+
+
+@dataclass
+class SearchHit:
+    message_id: int
+    conversation_id: int
+    conversation_title: Optional[str]
+    role: str
+    order_index: int
+    created_at: datetime
+    score: float
+    snippet: str
+
+
+def search_terms(query: str) -> List[str]:
+    return _TERM_RE.findall(query)
+
+
+def fts_query(terms: List[str]) -> str:
+    """
+    FTS5 MATCH expression requiring every term. Terms are quoted, so user
+    input cannot inject FTS operators or fail to parse.
+    """
+    quoted = []
+    for term in terms:
+        prefix = term.endswith("*")
+        quoted.append('"' + term.rstrip("*") + '"' + ("*" if prefix else ""))
+    return " ".join(quoted)
+
+
+# Databases (by URL) known to have the FTS index; it is never dropped.
+_fts_databases: Set[str] = set()
+
+
+def has_fts_index(db: Session) -> bool:
+    bind = db.get_bind()
+    if bind.dialect.name != "sqlite":
+        return False
+    url = str(bind.url)
+    if url not in _fts_databases:
+        found = db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": MESSAGE_FTS_TABLE},
+        ).first()
+        if found is None:
+            return False
+        _fts_databases.add(url)
+    return True
+
+
+def _search_fts(
+    db: Session,
+    user_id: int,
+    terms: List[str],
+    limit: int,
+    after: Optional[SearchKey],
+) -> List[SearchHit]:
+    # bm25() and snippet() only work in the query that runs MATCH, so the
+    # keyset condition is applied on the ranked subquery.
+    sql = f"""
+        SELECT * FROM (
+            SELECT m.id AS message_id,
+                   m.conversation_id AS conversation_id,
+                   c.title AS conversation_title,
+                   m.role AS role,
+                   m.order_index AS order_index,
+                   m.created_at AS created_at,
+                   bm25({MESSAGE_FTS_TABLE}) AS score,
+                   snippet({MESSAGE_FTS_TABLE}, 0, :open, :close, '…', :tokens) AS snippet
+            FROM {MESSAGE_FTS_TABLE}
+            JOIN messages m ON m.id = {MESSAGE_FTS_TABLE}.rowid
+            JOIN conversations c ON c.id = m.conversation_id
+            WHERE {MESSAGE_FTS_TABLE} MATCH :query AND c.user_id = :user_id
+        )
+        {"WHERE score > :score OR (score = :score AND message_id > :last_id)" if after else ""}
+        ORDER BY score, message_id
+        LIMIT :limit
+    """
+    params = {
+        "query": fts_query(terms),
+        "user_id": user_id,
+        "open": SNIPPET_OPEN,
+        "close": SNIPPET_CLOSE,
+        "tokens": SNIPPET_TOKENS,
+        "limit": limit,
+    }
+    if after:
+        params["score"], params["last_id"] = after
+    rows = db.execute(
+        text(sql).columns(created_at=Message.created_at.type), params
+    ).mappings()
+    return [SearchHit(**row) for row in rows]
+
+
+def _fallback_snippet(content: str, terms: List[str]) -> str:
+    lowered = content.lower()
+    positions = [lowered.find(t.rstrip("*").lower()) for t in terms]
+    start = min((p for p in positions if p >= 0), default=0)
+    begin = max(0, start - _FALLBACK_SNIPPET_CHARS)
+    end = min(len(content), start + _FALLBACK_SNIPPET_CHARS)
+    return ("…" if begin else "") + content[begin:end] + ("…" if end < len(content) else "")
+
+
+def _like_pattern(term: str) -> str:
+    # Terms are \w+ so "_" is the only LIKE wildcard they can contain.
+    return "%" + term.rstrip("*").replace("_", "\\_") + "%"
+
+
+def _search_like(
+    db: Session,
+    user_id: int,
+    terms: List[str],
+    limit: int,
+    after: Optional[SearchKey],
+) -> List[SearchHit]:
+    """
+    Unranked scan for databases without an FTS index: every hit scores 0
+    and hits come back in message id order.
+    """
+    query = (
+        select(Message, Conversation.title)
+        .join(Conversation, Conversation.id == Message.conversation_id)
+        .where(Conversation.user_id == user_id)
+        .where(and_(*(Message.content.ilike(_like_pattern(t), escape="\\") for t in terms)))
+    )
+    if after:
+        query = query.where(Message.id > after[1])
+    rows = db.execute(query.order_by(Message.id).limit(limit)).all()
+    return [
+        SearchHit(
+            message_id=message.id,
+            conversation_id=message.conversation_id,
+            conversation_title=title,
+            role=message.role,
+            order_index=message.order_index,
+            created_at=message.created_at,
+            score=0.0,
+            snippet=_fallback_snippet(message.content, terms),
+        )
+        for message, title in rows
+    ]
+
+
+def search_messages(
+    db: Session,
+    user_id: int,
+    terms: List[str],
+    limit: int,
+    after: Optional[SearchKey] = None,
+) -> List[SearchHit]:
+    """
+    Messages of the user's conversations containing every term, best
+    match first (FTS5 bm25; lower scores rank higher), starting after the
+    `after` sort key.
+    """
+    use_fts = has_fts_index(db)
+    with start_span("search.messages", backend="fts5" if use_fts else "like", terms=len(terms)):
+        if use_fts:
+            return _search_fts(db, user_id, terms, limit, after)
+        return _search_like(db, user_id, terms, limit, after)
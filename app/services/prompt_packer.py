@@ -0,0 +1,115 @@
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.services.llm_client import estimate_tokens
+
+CONTEXT_SEPARATOR = "\n\n----- DOCUMENT SEPARATOR -----\n\n"
+
+
+@dataclass
+class PackedPrompt:
+    """
+    LLM input that fits the model's prompt token budget.
+    """
+
+    system_prompt: str
+    context: Optional[str]
+    messages: List[Dict[str, str]] = field(default_factory=list)
+    prompt_tokens: int = 0
+
+
+def prompt_token_budget(model_name: Optional[str] = None) -> int:
+    """
+    Prompt token budget for a model (PROMPT_TOKEN_BUDGETS, else the default).
+    """
+    model_name = model_name or settings.LLM_MODEL_NAME
+    return settings.PROMPT_TOKEN_BUDGETS.get(model_name, settings.DEFAULT_PROMPT_TOKEN_BUDGET)
+
+
+@lru_cache(maxsize=256)
+def _static_tokens(text: str) -> int:
+    # System prompts and separators repeat on every turn.
+    return estimate_tokens(text)
+
+
+def _message_tokens(message: Dict) -> int:
+    cached = message.get("token_count")
+    if cached is None:
+        cached = estimate_tokens(message["content"])
+    return cached
+
+
+def pack_prompt(
+    system_prompt: str,
+    history: Sequence[Dict],
+    passages: Sequence[Tuple[str, int]] = (),
+    context_instructions: str = "",
+    budget: Optional[int] = None,
+) -> PackedPrompt:
+    """
+    Greedily fill one token budget.
+
+    Order of precedence: system prompt, the newest message (always kept so
+    the model sees the question), pinned entries such as the conversation
+    summary, retrieved passages in rank order, then older history
+    newest-first until the budget runs out. Token counts come from the
+    cached `token_count` of messages and passages; nothing already stored
+    is re-tokenized.
+
+    `history` is oldest-first {role, content, token_count[, pinned]} dicts.
+    `passages` are (text, token_count) pairs in rank order.
+    `context_instructions` is appended to the system prompt only if at
+    least one passage is included.
+    """
+    if budget is None:
+        budget = prompt_token_budget()
+
+    used = _static_tokens(system_prompt)
+
+    pinned = [m for m in history if m.get("pinned")]
+    history = [m for m in history if not m.get("pinned")]
+
+    kept_history: List[Dict] = []
+    if history:
+        newest = history[-1]
+        kept_history.append(newest)
+        used += _message_tokens(newest)
+
+    kept_pinned: List[Dict] = []
+    for message in pinned:
+        tokens = _message_tokens(message)
+        if used + tokens <= budget:
+            kept_pinned.append(message)
+            used += tokens
+
+    included: List[str] = []
+    if passages:
+        extra = _static_tokens(context_instructions) if context_instructions else 0
+        separator = _static_tokens(CONTEXT_SEPARATOR)
+        for text, tokens in passages:
+            cost = tokens + (extra if not included else separator)
+            if used + cost > budget:
+                continue
+            included.append(text)
+            used += cost
+
+    for message in reversed(history[:-1]):
+        tokens = _message_tokens(message)
+        if used + tokens > budget:
+            break
+        kept_history.append(message)
+        used += tokens
+    kept_history.reverse()
+    kept_history = kept_pinned + kept_history
+
+    if included and context_instructions:
+        system_prompt = f"{system_prompt} {context_instructions}"
+
+    return PackedPrompt(
+        system_prompt=system_prompt,
+        context=CONTEXT_SEPARATOR.join(included) if included else None,
+        messages=[{"role": m["role"], "content": m["content"]} for m in kept_history],
+        prompt_tokens=used,
+    )
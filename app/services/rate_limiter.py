@@ -0,0 +1,329 @@
+import asyncio
+import calendar
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.metrics import RATE_LIMIT_REJECTIONS
+from app.core.write_queue import get_write_queue
+from app.models.models import RateLimitState
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    """
+    A turn was refused by admission control; retry after `retry_after`
+    whole seconds (rounded up, as sent in the Retry-After header).
+    """
+
+    def __init__(self, reason: str, retry_after: float):
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"Rate limit exceeded ({reason}), retry after {self.retry_after}s")
+
+
+class TokenBucket:
+    """
+    Continuously refilled bucket of `capacity` tokens gaining `rate` tokens
+    per second. The level may go negative when usage is charged after the
+    fact; nothing is admitted until it has refilled above zero.
+    """
+
+    __slots__ = ("capacity", "rate", "level", "updated")
+
+    def __init__(self, capacity: float, rate: float, level: float, updated: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.level = level
+        self.updated = updated
+
+    def refill(self, now: float) -> float:
+        if now > self.updated:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+        return self.level
+
+    def wait_for(self, now: float, amount: float) -> float:
+        """
+        Seconds until `amount` tokens are available (0 if they are now).
+        """
+        missing = amount - self.refill(now)
+        if missing <= 0:
+            return 0.0
+        return missing / self.rate if self.rate > 0 else math.inf
+
+
+class _UserState:
+    __slots__ = ("requests", "tokens", "day", "day_tokens", "month", "month_tokens")
+
+    def __init__(self, requests: TokenBucket, tokens: TokenBucket, day: str, month: str):
+        self.requests = requests
+        self.tokens = tokens
+        self.day = day
+        self.day_tokens = 0
+        self.month = month
+        self.month_tokens = 0
+
+
+def _periods(now: float) -> Tuple[str, str]:
+    moment = datetime.fromtimestamp(now, timezone.utc)
+    return moment.strftime("%Y-%m-%d"), moment.strftime("%Y-%m")
+
+
+def _seconds_until_next_day(now: float) -> float:
+    return 86400 - now % 86400
+
+
+def _seconds_until_next_month(now: float) -> float:
+    moment = datetime.fromtimestamp(now, timezone.utc)
+    days = calendar.monthrange(moment.year, moment.month)[1] - moment.day
+    return days * 86400 + _seconds_until_next_day(now)
+
+
+class AdmissionController:
+    """
+    Per-user admission control for LLM turns.
+
+    Each user has a request bucket and an LLM-token bucket, plus daily and
+    monthly token budgets (UTC). `admit` takes one request token and refuses
+    the turn while the token bucket is in debt or a budget is spent;
+    `record_usage` charges the tokens the provider reported once the reply
+    is known. Both are a dict lookup and some arithmetic under a lock, with
+    no database access: state is loaded once with `restore` and written
+    back from `dirty_states`. A limit of 0 disables that check.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 60.0,
+        request_burst: float = 20.0,
+        tokens_per_minute: float = 100000.0,
+        token_burst: float = 200000.0,
+        daily_token_budget: int = 0,
+        monthly_token_budget: int = 0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.request_burst = request_burst
+        self.tokens_per_minute = tokens_per_minute
+        self.token_burst = token_burst
+        self.daily_token_budget = daily_token_budget
+        self.monthly_token_budget = monthly_token_budget
+        self._clock = clock
+        self._users: Dict[int, _UserState] = {}
+        self._dirty: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def _state(self, user_id: int, now: float) -> _UserState:
+        day, month = _periods(now)
+        state = self._users.get(user_id)
+        if state is None:
+            state = self._users[user_id] = _UserState(
+                TokenBucket(self.request_burst, self.requests_per_minute / 60, self.request_burst, now),
+                TokenBucket(self.token_burst, self.tokens_per_minute / 60, self.token_burst, now),
+                day,
+                month,
+            )
+        if state.day != day:
+            state.day, state.day_tokens = day, 0
+        if state.month != month:
+            state.month, state.month_tokens = month, 0
+        return state
+
+    def admit(self, user_id: int) -> None:
+        """
+        Take one request for `user_id` or raise RateLimitExceeded.
+        """
+        now = self._clock()
+        with self._lock:
+            state = self._state(user_id, now)
+            if self.monthly_token_budget and state.month_tokens >= self.monthly_token_budget:
+                raise self._reject("monthly_token_budget", _seconds_until_next_month(now))
+            if self.daily_token_budget and state.day_tokens >= self.daily_token_budget:
+                raise self._reject("daily_token_budget", _seconds_until_next_day(now))
+            if self.tokens_per_minute:
+                wait = state.tokens.wait_for(now, 0)
+                if wait:
+                    raise self._reject("tokens_per_minute", wait)
+            if self.requests_per_minute:
+                wait = state.requests.wait_for(now, 1)
+                if wait:
+                    raise self._reject("requests_per_minute", wait)
+                state.requests.level -= 1
+            self._dirty.add(user_id)
+
+    def record_usage(self, user_id: int, usage: Optional[Dict[str, int]]) -> None:
+        """
+        Charge the prompt + completion tokens of a finished turn.
+        """
+        tokens = sum((usage or {}).get(k) or 0 for k in ("prompt_tokens", "completion_tokens"))
+        if not tokens:
+            return
+        now = self._clock()
+        with self._lock:
+            state = self._state(user_id, now)
+            state.tokens.refill(now)
+            state.tokens.level -= tokens
+            state.day_tokens += tokens
+            state.month_tokens += tokens
+            self._dirty.add(user_id)
+
+    @staticmethod
+    def _reject(reason: str, retry_after: float) -> RateLimitExceeded:
+        RATE_LIMIT_REJECTIONS.inc(reason=reason)
+        return RateLimitExceeded(reason, retry_after)
+
+    def dirty_states(self) -> List[Dict[str, Any]]:
+        """
+        Snapshot the users changed since the last call, as RateLimitState rows.
+        """
+        now = self._clock()
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            rows = []
+            for user_id in dirty:
+                state = self._state(user_id, now)
+                rows.append(
+                    {
+                        "user_id": user_id,
+                        "request_tokens": state.requests.refill(now),
+                        "llm_tokens": state.tokens.refill(now),
+                        "updated_at": now,
+                        "day": state.day,
+                        "day_tokens": state.day_tokens,
+                        "month": state.month,
+                        "month_tokens": state.month_tokens,
+                    }
+                )
+            return rows
+
+    def mark_dirty(self, user_ids: Iterable[int]) -> None:
+        with self._lock:
+            self._dirty.update(user_id for user_id in user_ids if user_id in self._users)
+
+    def restore(self, rows: Iterable[RateLimitState]) -> None:
+        """
+        Load persisted state; buckets refill from the stored `updated_at` on
+        next use and usage from a past day / month is dropped then.
+        """
+        with self._lock:
+            for row in rows:
+                state = self._state(row.user_id, row.updated_at)
+                state.requests.level = min(row.request_tokens, self.request_burst)
+                state.tokens.level = min(row.llm_tokens, self.token_burst)
+                state.requests.updated = state.tokens.updated = row.updated_at
+                if row.day == state.day:
+                    state.day_tokens = row.day_tokens
+                if row.month == state.month:
+                    state.month_tokens = row.month_tokens
+
+
+_controller: Optional[AdmissionController] = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """
+    Process-wide controller built from the RATE_LIMIT_* / TOKEN_BUDGET_* settings.
+    """
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController(
+                    requests_per_minute=settings.RATE_LIMIT_REQUESTS_PER_MINUTE,
+                    request_burst=settings.RATE_LIMIT_REQUEST_BURST,
+                    tokens_per_minute=settings.RATE_LIMIT_TOKENS_PER_MINUTE,
+                    token_burst=settings.RATE_LIMIT_TOKEN_BURST,
+                    daily_token_budget=settings.TOKEN_BUDGET_DAILY,
+                    monthly_token_budget=settings.TOKEN_BUDGET_MONTHLY,
+                )
+    return _controller
+
+
+def admit_turn(user_id: int) -> None:
+    if settings.RATE_LIMIT_ENABLED:
+        get_admission_controller().admit(user_id)
+
+
+def record_turn_usage(user_id: int, usage: Optional[Dict[str, int]]) -> None:
+    if settings.RATE_LIMIT_ENABLED:
+        get_admission_controller().record_usage(user_id, usage)
+
+
+# ------------ Persistence ------------
+
+
+def _save_states(db: Session, rows: List[Dict[str, Any]]) -> None:
+    for row in rows:
+        db.merge(RateLimitState(**row))
+    db.flush()
+
+
+async def load_rate_limit_state() -> None:
+    """
+    Restore persisted limiter state (one query, at startup).
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    async with AsyncSessionLocal() as db:
+        rows = (await db.scalars(select(RateLimitState))).all()
+    get_admission_controller().restore(rows)
+    logger.info("Restored rate limit state for %d users", len(rows))
+
+
+async def flush_rate_limit_state() -> None:
+    """
+    Write the users whose limiter state changed through the write queue.
+    """
+    controller = get_admission_controller()
+    rows = controller.dirty_states()
+    if not rows:
+        return
+    try:
+        await get_write_queue().submit(_save_states, rows)
+    except Exception:
+        logger.exception("Persisting rate limit state for %d users failed", len(rows))
+        controller.mark_dirty(row["user_id"] for row in rows)
+
+
+_persist_task: Optional[asyncio.Task] = None
+
+
+async def _persist_periodically(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        await flush_rate_limit_state()
+
+
+def start_rate_limit_persistence() -> None:
+    global _persist_task
+    if settings.RATE_LIMIT_ENABLED and _persist_task is None:
+        _persist_task = asyncio.get_running_loop().create_task(
+            _persist_periodically(settings.RATE_LIMIT_PERSIST_INTERVAL_SECONDS)
+        )
+
+
+async def stop_rate_limit_persistence() -> None:
+    """
+    Stop the periodic flush and persist what is left.
+    """
+    global _persist_task
+    task, _persist_task = _persist_task, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    if settings.RATE_LIMIT_ENABLED:
+        await flush_rate_limit_state()
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.write_queue import get_write_queue
+from app.models.models import Conversation, ConversationSummary, Message
+from app.services.llm_client import asummarize, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+# Conversations currently being compacted in this process.
+_in_progress: Set[int] = set()
+
+# Strong references to fire-and-forget tasks so they are not garbage collected.
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def get_summary(db: Session, conversation_id: int) -> Optional[ConversationSummary]:
+    return (
+        db.query(ConversationSummary)
+        .filter(ConversationSummary.conversation_id == conversation_id)
+        .first()
+    )
+
+
+def summary_message(summary: ConversationSummary) -> Dict:
+    """
+    Render a stored summary as a pinned history entry for the prompt packer.
+    """
+    return {
+        "role": "system",
+        "content": SUMMARY_PREFIX + summary.content,
+        "token_count": summary.token_count + estimate_tokens(SUMMARY_PREFIX),
+        "pinned": True,
+    }
+
+
+def might_need_compaction(last_order_index: int) -> bool:
+    """
+    Cheap pre-check from the newest message's order_index: is the
+    conversation long enough that a batch of messages has aged out of the
+    recent window? The background task re-checks against the stored summary.
+    """
+    if not settings.SUMMARY_ENABLED:
+        return False
+    return last_order_index >= (
+        settings.SUMMARY_KEEP_RECENT_MESSAGES + settings.SUMMARY_MIN_BATCH_MESSAGES
+    )
+
+
+def schedule_compaction(conversation_id: int) -> None:
+    """
+    Run compact_conversation in the background on the current event loop
+    (for callers without a request-scoped BackgroundTasks, e.g. WebSockets).
+    """
+    task = asyncio.get_running_loop().create_task(compact_conversation(conversation_id))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def _load_pending(db: Session, conversation_id: int):
+    """
+    Return (summary, messages to fold in) or (summary, []) if below threshold.
+    """
+    conversation = db.get(Conversation, conversation_id)
+    if conversation is None:
+        return None, []
+
+    summary = get_summary(db, conversation_id)
+    covered_until = summary.covered_until if summary else 0
+    aged_until = conversation.next_seq - 1 - settings.SUMMARY_KEEP_RECENT_MESSAGES
+
+    if aged_until - covered_until < settings.SUMMARY_MIN_BATCH_MESSAGES:
+        return summary, []
+
+    messages = (
+        db.query(Message)
+        .filter(Message.conversation_id == conversation_id)
+        .filter(Message.order_index > covered_until)
+        .filter(Message.order_index <= aged_until)
+        .order_by(Message.order_index)
+        .limit(settings.SUMMARY_MAX_BATCH_MESSAGES)
+        .all()
+    )
+    return summary, messages
+
+
+def _store_summary(
+    db: Session,
+    conversation_id: int,
+    previous_covered_until: int,
+    content: str,
+    covered_until: int,
+) -> bool:
+    """
+    Save the extended summary unless another writer already moved it
+    forward (write-queue job).
+    """
+    summary = get_summary(db, conversation_id)
+    if summary is None:
+        summary = ConversationSummary(conversation_id=conversation_id)
+        db.add(summary)
+    elif summary.covered_until != previous_covered_until:
+        return False
+
+    summary.content = content
+    summary.covered_until = covered_until
+    summary.token_count = estimate_tokens(content)
+    return True
+
+
+async def compact_conversation(conversation_id: int) -> bool:
+    """
+    Fold messages that aged out of the recent window into the stored summary.
+
+    Runs as a background task after a turn; returns True if the summary was
+    extended. Older turns are summarized at most SUMMARY_MAX_BATCH_MESSAGES
+    at a time through the configured LLM provider. The pending batch is read
+    in a short-lived session, so no connection is held during the LLM call;
+    the summary is stored through the write queue.
+    """
+    if conversation_id in _in_progress:
+        return False
+    _in_progress.add(conversation_id)
+
+    try:
+        async with AsyncSessionLocal() as db:
+            summary, messages = await db.run_sync(_load_pending, conversation_id)
+        if not messages:
+            return False
+
+        previous_content = summary.content if summary else None
+        previous_covered_until = summary.covered_until if summary else 0
+        batch: List[Dict[str, str]] = [
+            {"role": m.role, "content": m.content} for m in messages
+        ]
+
+        content = await asummarize(
+            previous_content,
+            batch,
+            max_tokens=settings.SUMMARY_MAX_TOKENS,
+        )
+
+        return await get_write_queue().submit(
+            _store_summary,
+            conversation_id,
+            previous_covered_until,
+            content,
+            messages[-1].order_index,
+        )
+    except Exception:
+        logger.exception("Summarizing conversation %s failed", conversation_id)
+        return False
+    finally:
+        _in_progress.discard(conversation_id)
@@ -0,0 +1,125 @@
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Sequence
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import Document, DocumentChunk, TermPosting
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase index terms.
+    Very short tokens are dropped, same as the original query-word filter.
+    """
+    if not text:
+        return []
+    return [t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 2]
+
+
+def term_frequencies(text: str) -> Counter:
+    """
+    Index terms of a passage with their counts. Terms are truncated to the
+    column width before counting, so long tokens sharing a prefix fold into
+    one posting instead of colliding.
+    """
+    return Counter(t[:100] for t in tokenize(text))
+
+
+def index_chunks(
+    db: Session,
+    chunks: Sequence[Dict[str, Any]],
+    term_freqs: Sequence[Counter],
+) -> int:
+    """
+    Insert chunk rows (DocumentChunk column values) together with their
+    inverted index entries (`term_freqs`, one Counter per chunk).
+
+    Chunks and postings are written as plain rows with one multi-row
+    INSERT ... RETURNING and one executemany INSERT, rather than one ORM
+    object each. The caller owns the transaction. Returns the total number
+    of terms in the chunks.
+    """
+    if not chunks:
+        return 0
+    chunk_ids = db.scalars(
+        insert(DocumentChunk).returning(DocumentChunk.id, sort_by_parameter_order=True),
+        list(chunks),
+    ).all()
+
+    postings = [
+        {
+            "term": term,
+            "chunk_id": chunk_id,
+            "document_id": chunk["document_id"],
+            "term_freq": freq,
+        }
+        for chunk, chunk_id, freqs in zip(chunks, chunk_ids, term_freqs)
+        for term, freq in freqs.items()
+    ]
+    if postings:
+        db.execute(insert(TermPosting), postings)
+    return sum(chunk["term_count"] for chunk in chunks)
+
+
+def bm25_scores(
+    db: Session,
+    query_terms: Iterable[str],
+    document_ids: Sequence[int],
+) -> Dict[int, float]:
+    """
+    Rank the chunks of the given documents with Okapi BM25.
+
+    Returns {chunk_id: score} for chunks containing at least one query term.
+    Only the postings of the query terms are read, so the cost depends on
+    query size, not on document size. Collection statistics (N, df, avgdl)
+    are taken over the chunks of `document_ids`, using the per-document
+    totals stored at ingestion.
+    """
+    terms = sorted({t[:100] for t in query_terms})
+    if not terms or not document_ids:
+        return {}
+
+    n_chunks, total_terms = (
+        db.query(
+            func.coalesce(func.sum(Document.chunk_count), 0),
+            func.coalesce(func.sum(Document.term_count), 0),
+        )
+        .filter(Document.id.in_(document_ids))
+        .one()
+    )
+    if not n_chunks:
+        return {}
+
+    postings = (
+        db.query(
+            TermPosting.term,
+            TermPosting.chunk_id,
+            TermPosting.term_freq,
+            DocumentChunk.term_count,
+        )
+        .join(DocumentChunk, DocumentChunk.id == TermPosting.chunk_id)
+        .filter(TermPosting.term.in_(terms))
+        .filter(TermPosting.document_id.in_(document_ids))
+        .all()
+    )
+
+    avgdl = (total_terms / n_chunks) or 1.0
+    k1 = settings.BM25_K1
+    b = settings.BM25_B
+
+    doc_freq: Counter = Counter(term for term, _, _, _ in postings)
+
+    scores: Dict[int, float] = {}
+    for term, chunk_id, tf, dl in postings:
+        df = doc_freq[term]
+        idf = math.log(1 + (n_chunks - df + 0.5) / (df + 0.5))
+        denom = tf + k1 * (1 - b + b * dl / avgdl)
+        scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (k1 + 1) / denom
+
+    return scores
@@ -0,0 +1,166 @@
+import logging
+from collections import defaultdict
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.models.models import Conversation, Message, UsageRollup
+
+logger = logging.getLogger(__name__)
+
+# Rollup model for replies stored before Message.model existed.
+UNKNOWN_MODEL = "unknown"
+
+RollupKey = Tuple[int, date, str]
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE.
+_UPSERT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+def rollup_increments(
+    rows: Iterable[Any],
+    user_id: Optional[int] = None,
+) -> Dict[RollupKey, List[int]]:
+    """
+    Sum assistant replies into {(user_id, day, model): [messages, prompt, completion]}.
+    Rows need created_at, model, prompt_tokens, completion_tokens and,
+    unless `user_id` is given, user_id.
+    """
+    increments: Dict[RollupKey, List[int]] = defaultdict(lambda: [0, 0, 0])
+    for row in rows:
+        key = (
+            row.user_id if user_id is None else user_id,
+            row.created_at.date(),
+            row.model or UNKNOWN_MODEL,
+        )
+        totals = increments[key]
+        totals[0] += 1
+        totals[1] += row.prompt_tokens or 0
+        totals[2] += row.completion_tokens or 0
+    return increments
+
+
+def add_to_rollups(db: Session, increments: Dict[RollupKey, List[int]]) -> None:
+    """
+    Add the increments to their rollup rows, creating missing rows: one
+    upsert per row where the dialect supports it, UPDATE then INSERT
+    otherwise (safe behind the single-writer queue).
+    """
+    upsert_insert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    for (user_id, day, model), (messages, prompt, completion) in increments.items():
+        values = {
+            "user_id": user_id,
+            "day": day,
+            "model": model,
+            "message_count": messages,
+            "prompt_tokens": prompt,
+            "completion_tokens": completion,
+        }
+        if upsert_insert is not None:
+            stmt = upsert_insert(UsageRollup).values(**values)
+            db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=["user_id", "day", "model"],
+                    set_={
+                        "message_count": UsageRollup.message_count + stmt.excluded.message_count,
+                        "prompt_tokens": UsageRollup.prompt_tokens + stmt.excluded.prompt_tokens,
+                        "completion_tokens": UsageRollup.completion_tokens
+                        + stmt.excluded.completion_tokens,
+                    },
+                )
+            )
+            continue
+
+        updated = db.execute(
+            update(UsageRollup)
+            .where(
+                UsageRollup.user_id == user_id,
+                UsageRollup.day == day,
+                UsageRollup.model == model,
+            )
+            .values(
+                message_count=UsageRollup.message_count + messages,
+                prompt_tokens=UsageRollup.prompt_tokens + prompt,
+                completion_tokens=UsageRollup.completion_tokens + completion,
+            )
+        )
+        if updated.rowcount == 0:
+            db.add(UsageRollup(**values))
+            db.flush()
+
+
+def record_reply_usage(db: Session, user_id: int, replies: Iterable[Any]) -> None:
+    """
+    Count freshly stored assistant replies (MessageRead) in the user's
+    rollups, within the caller's transaction.
+    """
+    add_to_rollups(db, rollup_increments(replies, user_id=user_id))
+
+
+def rebuild_usage_rollups(session_factory: sessionmaker, batch_size: int = 5000) -> int:
+    """
+    Recompute all rollups from the stored assistant messages, reading
+    `batch_size` messages per query and committing per batch. Returns the
+    number of messages counted.
+
+    The rollups are cleared in the same transaction that reads the highest
+    message id, so replies stored while the rebuild runs (higher ids) are
+    counted once, by the write path, and older ones once, here.
+    """
+    db: Session = session_factory()
+    try:
+        db.execute(delete(UsageRollup))
+        high_water = db.scalar(select(func.max(Message.id))) or 0
+        db.commit()
+
+        counted = 0
+        last_id = 0
+        while last_id < high_water:
+            rows = db.execute(
+                select(
+                    Message.id,
+                    Conversation.user_id,
+                    Message.created_at,
+                    Message.model,
+                    Message.prompt_tokens,
+                    Message.completion_tokens,
+                )
+                .join(Conversation, Conversation.id == Message.conversation_id)
+                .where(
+                    Message.role == "assistant",
+                    Message.id > last_id,
+                    Message.id <= high_water,
+                )
+                .order_by(Message.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            add_to_rollups(db, rollup_increments(rows))
+            db.commit()
+            counted += len(rows)
+            last_id = rows[-1].id
+            logger.info("Usage backfill: %d messages counted (up to id %d)", counted, last_id)
+        return counted
+    finally:
+        db.close()
+
+
+def usage_cost(model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """
+    Cost in LLM_TOKEN_PRICES units, or None for a model without a price.
+    """
+    prices = settings.LLM_TOKEN_PRICES.get(model)
+    if prices is None:
+        return None
+    return (
+        prompt_tokens * prices.get("prompt", 0.0)
+        + completion_tokens * prices.get("completion", 0.0)
+    ) / 1000
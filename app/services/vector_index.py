@@ -0,0 +1,257 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import run_blocking
+from app.models.models import Document, DocumentChunk
+from app.services.embeddings import get_embedder
+
+# Rows scored per matrix product when assigning vectors to IVF lists.
+_ASSIGN_BATCH_ROWS = 16384
+
+
+def embedding_to_bytes(vector: np.ndarray) -> bytes:
+    return np.ascontiguousarray(vector, dtype=np.float32).tobytes()
+
+
+class VectorIndex:
+    """
+    In-memory dense index over one user's chunk embeddings.
+
+    Vectors live in a single contiguous float32 matrix with rows grouped by
+    document, so a conversation's linked documents are scored with one
+    matrix-vector product per document slice. Past `ivf_min_vectors` rows
+    an inverted-file (IVF) index is trained as well: rows are clustered
+    with spherical k-means and only the `nprobe` closest clusters are
+    scanned for large candidate sets.
+    """
+
+    def __init__(
+        self,
+        chunk_ids: np.ndarray,
+        document_ids: np.ndarray,
+        vectors: np.ndarray,
+        ivf_min_vectors: int = 20000,
+        seed: int = 0,
+    ):
+        order = np.argsort(document_ids, kind="stable")
+        self.chunk_ids = np.ascontiguousarray(chunk_ids[order])
+        self.document_ids = np.ascontiguousarray(document_ids[order])
+        self.vectors = np.ascontiguousarray(vectors[order], dtype=np.float32)
+
+        docs, starts, counts = np.unique(
+            self.document_ids, return_index=True, return_counts=True
+        )
+        self._doc_slices: Dict[int, Tuple[int, int]] = {
+            int(d): (int(s), int(s + c)) for d, s, c in zip(docs, starts, counts)
+        }
+
+        self.centroids: Optional[np.ndarray] = None
+        self._list_rows: List[np.ndarray] = []
+        if len(self) >= max(ivf_min_vectors, 1):
+            self._train_ivf(np.random.default_rng(seed))
+
+    def __len__(self) -> int:
+        return int(self.chunk_ids.shape[0])
+
+    def _train_ivf(self, rng: np.random.Generator, iterations: int = 8) -> None:
+        n = len(self)
+        nlist = max(1, int(np.sqrt(n)))
+        sample = self.vectors[rng.choice(n, size=min(n, nlist * 40), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assign == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            np.divide(centroids, norms, out=centroids, where=norms > 0)
+
+        assign = np.empty(n, dtype=np.int64)
+        for start in range(0, n, _ASSIGN_BATCH_ROWS):
+            block = self.vectors[start : start + _ASSIGN_BATCH_ROWS]
+            assign[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(nlist + 1))
+        self._list_rows = [order[bounds[c] : bounds[c + 1]] for c in range(nlist)]
+        self.centroids = centroids
+
+    def search(
+        self,
+        query: np.ndarray,
+        document_ids: Sequence[int],
+        k: int,
+        nprobe: int = 8,
+    ) -> List[Tuple[int, float]]:
+        """
+        Return up to k (chunk_id, cosine similarity) pairs, best first,
+        among the chunks of `document_ids`.
+        """
+        slices = [self._doc_slices[d] for d in set(document_ids) if d in self._doc_slices]
+        n_candidates = sum(end - start for start, end in slices)
+        if k <= 0 or not n_candidates:
+            return []
+
+        query = np.asarray(query, dtype=np.float32)
+
+        # IVF pays off only when the candidates outnumber the rows it would scan.
+        use_ivf = (
+            self.centroids is not None
+            and n_candidates > len(self) * nprobe / len(self._list_rows)
+        )
+        if use_ivf:
+            rows, scores = self._search_ivf(query, slices, nprobe)
+        elif n_candidates == len(self):
+            rows = None
+            scores = self.vectors @ query
+        else:
+            rows = np.concatenate([np.arange(start, end) for start, end in slices])
+            scores = np.concatenate(
+                [self.vectors[start:end] @ query for start, end in slices]
+            )
+
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        picked = top if rows is None else rows[top]
+        return [
+            (int(self.chunk_ids[r]), float(s))
+            for r, s in zip(picked, scores[top])
+        ]
+
+    def _search_ivf(
+        self,
+        query: np.ndarray,
+        slices: List[Tuple[int, int]],
+        nprobe: int,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        nprobe = min(nprobe, len(self._list_rows))
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        rows = np.concatenate([self._list_rows[c] for c in probe])
+
+        if len(slices) < len(self._doc_slices):
+            allowed = np.zeros(len(self), dtype=bool)
+            for start, end in slices:
+                allowed[start:end] = True
+            rows = rows[allowed[rows]]
+
+        return rows, self.vectors[rows] @ query
+
+
+def load_user_index(db: Session, user_id: int) -> VectorIndex:
+    """
+    Build a VectorIndex from the stored chunk embeddings of a user's documents.
+    """
+    dim = get_embedder().dim
+    rows = (
+        db.query(DocumentChunk.id, DocumentChunk.document_id, DocumentChunk.embedding)
+        .join(Document, Document.id == DocumentChunk.document_id)
+        .filter(Document.user_id == user_id)
+        .filter(DocumentChunk.embedding.isnot(None))
+        .all()
+    )
+    # Skip vectors written with a different embedding size.
+    rows = [r for r in rows if len(r.embedding) == dim * 4]
+
+    if rows:
+        vectors = np.frombuffer(b"".join(r.embedding for r in rows), dtype=np.float32)
+    else:
+        vectors = np.zeros(0, dtype=np.float32)
+
+    # Sorting and IVF training are CPU-bound; keep them off the event loop.
+    return run_blocking(
+        VectorIndex,
+        chunk_ids=np.fromiter((r.id for r in rows), dtype=np.int64, count=len(rows)),
+        document_ids=np.fromiter((r.document_id for r in rows), dtype=np.int64, count=len(rows)),
+        vectors=vectors.reshape(len(rows), dim),
+        ivf_min_vectors=settings.VECTOR_IVF_MIN_VECTORS,
+    )
+
+
+_indexes: "OrderedDict[int, Tuple[tuple, VectorIndex]]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_user_index(db: Session, user_id: int) -> VectorIndex:
+    """
+    Return the user's cached VectorIndex, rebuilding it when their
+    documents changed (tracked by document count, newest id and chunk total).
+    At most VECTOR_INDEX_CACHE_USERS indexes are kept, least recently used
+    first out.
+    """
+    signature = tuple(
+        db.query(
+            func.count(Document.id),
+            func.max(Document.id),
+            func.coalesce(func.sum(Document.chunk_count), 0),
+        )
+        .filter(Document.user_id == user_id)
+        .one()
+    ) + (settings.EMBEDDING_PROVIDER, settings.EMBEDDING_DIM)
+
+    with _indexes_lock:
+        cached = _indexes.get(user_id)
+        if cached is not None and cached[0] == signature:
+            _indexes.move_to_end(user_id)
+            return cached[1]
+
+    # Load outside the lock: under the async engine the queries yield to
+    # the event loop, and another request blocking on a thread lock there
+    # would deadlock the loop. Concurrent rebuilds are rare and identical.
+    index = load_user_index(db, user_id)
+    with _indexes_lock:
+        _indexes[user_id] = (signature, index)
+        _indexes.move_to_end(user_id)
+        while len(_indexes) > max(settings.VECTOR_INDEX_CACHE_USERS, 1):
+            _indexes.popitem(last=False)
+    return index
+
+
+def vector_scores(
+    db: Session,
+    document_ids: Sequence[int],
+    query_text: str,
+    limit: int,
+) -> Dict[int, float]:
+    """
+    Return {chunk_id: cosine similarity} for the `limit` chunks of
+    `document_ids` closest to the query embedding.
+    """
+    if not document_ids or not query_text or limit <= 0:
+        return {}
+
+    query = get_embedder().embed([query_text])[0]
+    if not query.any():
+        return {}
+
+    user_ids = [
+        user_id
+        for (user_id,) in db.query(Document.user_id)
+        .filter(Document.id.in_(document_ids))
+        .distinct()
+        .all()
+    ]
+
+    scores: Dict[int, float] = {}
+    for user_id in user_ids:
+        index = get_user_index(db, user_id)
+        for chunk_id, score in index.search(
+            query, document_ids, limit, nprobe=settings.VECTOR_IVF_NPROBE
+        ):
+            scores[chunk_id] = score
+
+    if len(scores) > limit:
+        best = sorted(scores, key=scores.get, reverse=True)[:limit]
+        scores = {chunk_id: scores[chunk_id] for chunk_id in best}
+    return scores
@@ -1,14 +1,31 @@
 import logging
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 
 from app.core.config import settings
-from app.core.database import Base, engine
+from app.core.database import Base, engine, sync_engine, writer_engine
 from app.core.logging_config import configure_logging
+from app.core.metrics import CONTENT_TYPE, REGISTRY, MetricsMiddleware, instrument_engine
+from app.core.tracing import TracingMiddleware, trace_engine
 from app.core.error_handlers import register_exception_handlers
+from app.core.write_queue import close_write_queue
 from app.api.conversations import router as conversations_router
 from app.api.users import router as users_router
 from app.api.documents import router as documents_router
+from app.api.usage import router as usage_router
+from app.api.search import router as search_router
+from app.api.jobs import router as jobs_router
+from app.api.debug import router as debug_router
+from app.services.bulk_import import resume_pending_documents
+from app.services.completion_cache import close_completion_cache
+from app.services.generation_jobs import get_generation_pool, stop_generation_workers
+from app.services.llm_client import close_http_client
+from app.services.rate_limiter import (
+    load_rate_limit_state,
+    start_rate_limit_persistence,
+    stop_rate_limit_persistence,
+)
 
 configure_logging()
 logger = logging.getLogger(__name__)
@@ -19,15 +36,46 @@ app = FastAPI(
     description="Backend service for chat conversations with LLM and RAG (Case Study).",
 )
 
+app.add_middleware(TracingMiddleware)
+app.add_middleware(MetricsMiddleware)
+for _engine, _name in ((engine.sync_engine, "async"), (sync_engine, "sync"), (writer_engine, "writer")):
+    instrument_engine(_engine, _name)
+    trace_engine(_engine, _name)
+
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     """
     Application startup hook.
-    Ensures all database tables are created.
+    Ensures all database tables are created, restores rate limit state and
+    starts the generation workers, which resume unfinished async turns.
+    Documents still waiting to be indexed are indexed in the background.
     """
     logger.info("Starting application, ensuring database tables exist...")
-    Base.metadata.create_all(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
     logger.info("Database tables ready.")
+    await load_rate_limit_state()
+    start_rate_limit_persistence()
+    await get_generation_pool().start()
+    await resume_pending_documents()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """
+    Application shutdown hook.
+    Stops the generation workers (interrupted jobs resume on the next
+    start), persists rate limit state, drains the write queue and the
+    completion cache's disk writes, and closes pooled connections to the
+    LLM provider and the database.
+    """
+    await stop_generation_workers()
+    await stop_rate_limit_persistence()
+    await close_http_client()
+    close_completion_cache()
+    close_write_queue()
+    await engine.dispose()
+    sync_engine.dispose()
+    writer_engine.dispose()
 
 @app.get("/health", tags=["health"])
 def health_check():
@@ -37,8 +85,21 @@ def health_check():
     """
     return {"status": "ok", "message": "Service is up and running"}
 
+@app.get("/metrics", tags=["health"], response_class=PlainTextResponse)
+def metrics():
+    """
+    Prometheus metrics: request, database, context-building and LLM
+    latency histograms, token and cache counters.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
 register_exception_handlers(app)
 
 app.include_router(users_router)
 app.include_router(documents_router)
-app.include_router(conversations_router)
\ No newline at end of file
+app.include_router(conversations_router)
+app.include_router(usage_router)
+app.include_router(search_router)
+app.include_router(jobs_router)
+if settings.TRACING_ENABLED:
+    app.include_router(debug_router)
\ No newline at end of file
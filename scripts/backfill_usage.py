@@ -0,0 +1,43 @@
+"""
+Rebuild the usage rollups from the stored assistant messages.
+
+    python -m scripts.backfill_usage [--batch-size 5000]
+
+Reads messages in keyset batches of --batch-size and commits per batch,
+so memory and lock time stay bounded. Safe to run while the app is
+serving: replies stored meanwhile are counted by the write path.
+"""
+
+import argparse
+import logging
+import sys
+import time
+from typing import List
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    from app.core.database import Base, SessionLocal, sync_engine
+    from app.core.logging_config import configure_logging
+    from app.services.usage import rebuild_usage_rollups
+
+    configure_logging()
+    # The rollup table may predate this database.
+    Base.metadata.create_all(bind=sync_engine)
+
+    start = time.perf_counter()
+    counted = rebuild_usage_rollups(SessionLocal, batch_size=args.batch_size)
+    logging.getLogger(__name__).info(
+        "Rebuilt usage rollups from %d messages in %.1fs", counted, time.perf_counter() - start
+    )
+    sync_engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
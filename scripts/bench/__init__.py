@@ -0,0 +1,5 @@
+"""
+Load and latency benchmarks: seeded dataset (dataset.py), concurrent
+in-process scenario drivers (scenarios.py) and a percentile report with
+baseline regression gates (report.py). Run with `python -m scripts.bench.run`.
+"""
@@ -0,0 +1,166 @@
+"""
+Seeded synthetic dataset for the benchmark database.
+
+Everything is derived from `DatasetSpec.seed`, so two runs with the same
+spec produce the same users, conversations, messages and documents.
+"""
+
+import random
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.models.models import (
+    Conversation,
+    ConversationDocument,
+    Document,
+    Message,
+    User,
+    utcnow,
+)
+from app.services.blob_store import text_fingerprint
+from app.services.ingestion import ingest_document
+from app.services.llm_client import estimate_tokens
+
+_WORDS = (
+    "account address agent answer archive balance batch billing budget cache "
+    "capacity channel checkout client cluster commit config contract customer "
+    "dashboard database deadline delivery deploy device discount document draft "
+    "error estimate export feature feedback filter forecast gateway incident index "
+    "inventory invoice latency ledger license limit metric migration model network "
+    "order outage partner payment pipeline policy pricing priority product profile "
+    "quota record refund region release replica report request revenue review "
+    "risk rollout schedule schema search server service session shipment storage "
+    "subscription supplier support team tenant ticket timeout token traffic "
+    "upgrade usage vendor version warehouse webhook workflow"
+).split()
+
+
+@dataclass
+class DatasetSpec:
+    users: int = 20
+    conversations_per_user: int = 5
+    messages_per_conversation: int = 20
+    documents_per_user: int = 2
+    document_chars: int = 20000
+    seed: int = 1234
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class Dataset:
+    spec: DatasetSpec
+    user_ids: List[int] = field(default_factory=list)
+    open_conversation_ids: List[int] = field(default_factory=list)
+    grounded_conversation_ids: List[int] = field(default_factory=list)
+    document_ids_by_user: Dict[int, List[int]] = field(default_factory=dict)
+
+    @property
+    def conversation_ids(self) -> List[int]:
+        return self.open_conversation_ids + self.grounded_conversation_ids
+
+
+def sentence(rng: random.Random, min_words: int = 6, max_words: int = 18) -> str:
+    words = rng.choices(_WORDS, k=rng.randint(min_words, max_words))
+    return " ".join(words).capitalize() + "."
+
+
+def paragraph_text(rng: random.Random, chars: int) -> str:
+    parts: List[str] = []
+    size = 0
+    while size < chars:
+        para = " ".join(sentence(rng) for _ in range(rng.randint(3, 7)))
+        parts.append(para)
+        size += len(para) + 2
+    return "\n\n".join(parts)[:chars]
+
+
+def seed_database(session_factory: sessionmaker, spec: DatasetSpec) -> Dataset:
+    """
+    Insert the dataset into an empty database. Messages are written with
+    multi-row INSERTs; documents are chunked and indexed like API uploads
+    so grounded turns retrieve from them.
+    """
+    rng = random.Random(spec.seed)
+    dataset = Dataset(spec=spec)
+    db: Session = session_factory()
+    try:
+        dataset.user_ids = list(
+            db.scalars(
+                insert(User).returning(User.id, sort_by_parameter_order=True),
+                [
+                    {"email": f"bench-{i}@example.com", "full_name": f"Bench User {i}"}
+                    for i in range(spec.users)
+                ],
+            )
+        )
+
+        for user_id in dataset.user_ids:
+            doc_ids = []
+            for d in range(spec.documents_per_user):
+                text = paragraph_text(rng, spec.document_chars)
+                content_hash, size_bytes = text_fingerprint(text)
+                document = Document(
+                    user_id=user_id,
+                    name=f"bench-doc-{user_id}-{d}.txt",
+                    source_type="bench",
+                    raw_text=text,
+                    content_hash=content_hash,
+                    size_bytes=size_bytes,
+                )
+                db.add(document)
+                db.flush()
+                # Seeding owns the database, so batches go straight to `db`.
+                ingest_document(lambda fn, *args: fn(db, *args), document.id, raw_text=text)
+                doc_ids.append(document.id)
+            dataset.document_ids_by_user[user_id] = doc_ids
+            db.commit()
+
+        m = spec.messages_per_conversation
+        for user_id in dataset.user_ids:
+            for c in range(spec.conversations_per_user):
+                grounded = c % 2 == 1 and bool(dataset.document_ids_by_user[user_id])
+                now = utcnow()
+                conversation = Conversation(
+                    user_id=user_id,
+                    mode="grounded" if grounded else "open",
+                    title=sentence(rng, 3, 6),
+                    next_seq=m + 1,
+                    message_count=m,
+                    last_message_at=now if m else None,
+                    updated_at=now,
+                )
+                db.add(conversation)
+                db.flush()
+
+                rows = []
+                for i in range(1, m + 1):
+                    content = " ".join(sentence(rng) for _ in range(rng.randint(1, 4)))
+                    rows.append(
+                        {
+                            "conversation_id": conversation.id,
+                            "role": "user" if i % 2 else "assistant",
+                            "content": content,
+                            "order_index": i,
+                            "token_count": estimate_tokens(content),
+                        }
+                    )
+                if rows:
+                    db.execute(insert(Message), rows)
+
+                if grounded:
+                    db.add_all(
+                        ConversationDocument(conversation_id=conversation.id, document_id=doc_id)
+                        for doc_id in dataset.document_ids_by_user[user_id]
+                    )
+                    dataset.grounded_conversation_ids.append(conversation.id)
+                else:
+                    dataset.open_conversation_ids.append(conversation.id)
+            db.commit()
+    finally:
+        db.close()
+    return dataset
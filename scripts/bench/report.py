@@ -0,0 +1,116 @@
+"""
+Benchmark report: throughput and latency percentiles per scenario, and
+the comparison against a stored baseline that decides pass / fail.
+"""
+
+import json
+import math
+from typing import Any, Dict, List, Optional, Sequence
+
+Summary = Dict[str, float]
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """
+    q-th percentile (0-100) with linear interpolation between ranks.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100.0
+    low, high = math.floor(rank), math.ceil(rank)
+    if low == high:
+        return ordered[low]
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(latencies: Sequence[float], errors: int, wall_seconds: float) -> Summary:
+    """
+    Latencies in seconds -> throughput (successful requests / s) and
+    mean / p50 / p95 / p99 / max in milliseconds.
+    """
+    total = len(latencies) + errors
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": errors / total if total else 0.0,
+        "throughput_rps": len(latencies) / wall_seconds if wall_seconds > 0 else 0.0,
+        "mean_ms": 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+        "p50_ms": 1000 * percentile(latencies, 50),
+        "p95_ms": 1000 * percentile(latencies, 95),
+        "p99_ms": 1000 * percentile(latencies, 99),
+        "max_ms": 1000 * max(latencies, default=0.0),
+    }
+
+
+def compare(
+    current: Dict[str, Summary],
+    baseline: Dict[str, Summary],
+    max_latency_regression: float = 0.25,
+    max_throughput_drop: float = 0.25,
+    max_error_rate: float = 0.01,
+) -> List[str]:
+    """
+    Return one message per failed gate: p95 / p99 latency above the
+    baseline by more than `max_latency_regression` (a fraction),
+    throughput below it by more than `max_throughput_drop`, or an error
+    rate above `max_error_rate`. Scenarios missing from the baseline are
+    only checked for errors.
+    """
+    failures: List[str] = []
+    for name, summary in current.items():
+        if summary["error_rate"] > max_error_rate:
+            failures.append(
+                f"{name}: error rate {summary['error_rate']:.1%} > {max_error_rate:.1%}"
+            )
+
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric in ("p95_ms", "p99_ms"):
+            limit = base[metric] * (1 + max_latency_regression)
+            if base[metric] > 0 and summary[metric] > limit:
+                failures.append(
+                    f"{name}: {metric} {summary[metric]:.2f} > {limit:.2f} "
+                    f"(baseline {base[metric]:.2f} +{max_latency_regression:.0%})"
+                )
+        floor = base["throughput_rps"] * (1 - max_throughput_drop)
+        if summary["throughput_rps"] < floor:
+            failures.append(
+                f"{name}: throughput {summary['throughput_rps']:.1f} rps < {floor:.1f} "
+                f"(baseline {base['throughput_rps']:.1f} -{max_throughput_drop:.0%})"
+            )
+    return failures
+
+
+def _delta(value: float, base: Optional[float]) -> str:
+    if not base:
+        return ""
+    return f" ({(value - base) / base:+.0%})"
+
+
+def format_table(current: Dict[str, Summary], baseline: Optional[Dict[str, Summary]] = None) -> str:
+    baseline = baseline or {}
+    header = f"{'scenario':<22}{'reqs':>6}{'err':>5}{'rps':>16}{'p50 ms':>18}{'p95 ms':>18}{'p99 ms':>18}"
+    lines = [header, "-" * len(header)]
+    for name, s in current.items():
+        base = baseline.get(name, {})
+        lines.append(
+            f"{name:<22}{s['requests']:>6.0f}{s['errors']:>5.0f}"
+            f"{s['throughput_rps']:>9.1f}{_delta(s['throughput_rps'], base.get('throughput_rps')):>7}"
+            f"{s['p50_ms']:>11.2f}{_delta(s['p50_ms'], base.get('p50_ms')):>7}"
+            f"{s['p95_ms']:>11.2f}{_delta(s['p95_ms'], base.get('p95_ms')):>7}"
+            f"{s['p99_ms']:>11.2f}{_delta(s['p99_ms'], base.get('p99_ms')):>7}"
+        )
+    return "\n".join(lines)
+
+
+def load_report(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_report(path: str, report: Dict[str, Any]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
@@ -0,0 +1,159 @@
+"""
+Run the benchmark suite against a freshly seeded, isolated database.
+
+    python -m scripts.bench.run                      # compare with baseline.json
+    python -m scripts.bench.run --save-baseline      # record a new baseline
+    python -m scripts.bench.run --users 5 --requests 50 --scenarios list_conversations
+
+Exits with status 1 when a scenario regresses past the thresholds.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+from typing import Dict, List
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def _parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="./data/bench/bench.db", help="SQLite file, recreated on every run")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--conversations-per-user", type=int, default=5)
+    parser.add_argument("--messages", type=int, default=20, help="messages per seeded conversation")
+    parser.add_argument("--documents-per-user", type=int, default=2)
+    parser.add_argument("--document-chars", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--scenarios", default="", help="comma-separated subset (default: all)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the baseline")
+    parser.add_argument("--max-latency-regression", type=float, default=0.25)
+    parser.add_argument("--max-throughput-drop", type=float, default=0.25)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--json", dest="json_path", help="also write the report to this file")
+    return parser.parse_args(argv)
+
+
+def _isolate(db_path: str) -> None:
+    """
+    Point the app at a fresh database before any app module reads settings.
+    """
+    db_path = os.path.abspath(db_path)
+    directory = os.path.dirname(db_path)
+    os.makedirs(directory, exist_ok=True)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["BLOB_STORE_DIR"] = os.path.join(directory, "blobs")
+    # Measure the service, not the per-user limits (the check still runs).
+    os.environ.setdefault("RATE_LIMIT_REQUESTS_PER_MINUTE", "0")
+    os.environ.setdefault("RATE_LIMIT_TOKENS_PER_MINUTE", "0")
+
+
+async def _run_scenarios(dataset, names: List[str], args: argparse.Namespace) -> Dict[str, dict]:
+    import httpx
+
+    from app.core.database import engine
+    from main import app
+    from scripts.bench.report import summarize
+    from scripts.bench.scenarios import build_scenarios, run_scenario
+
+    available = build_scenarios(dataset)
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise SystemExit(f"Unknown or unsupported scenarios: {', '.join(unknown)}")
+
+    summaries: Dict[str, dict] = {}
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name in names or list(available):
+                # Each scenario gets its own stream, independent of the others.
+                rng = random.Random(f"{args.seed}:{name}")
+                result = await run_scenario(
+                    client,
+                    name,
+                    available[name](dataset, rng),
+                    requests=args.requests,
+                    concurrency=args.concurrency,
+                    warmup=args.warmup,
+                )
+                summaries[name] = summarize(result.latencies, result.errors, result.wall_seconds)
+    finally:
+        # aiosqlite connections belong to this event loop; close them here.
+        await engine.dispose()
+    return summaries
+
+
+def main(argv: List[str] = None) -> int:
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+    _isolate(args.db)
+    # One INFO line per request would dominate the measured latency.
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    from app.core.database import SessionLocal, sync_engine, writer_engine
+    from app.core.write_queue import close_write_queue
+    from main import Base
+    from scripts.bench.dataset import DatasetSpec, seed_database
+    from scripts.bench.report import compare, format_table, load_report, save_report
+
+    spec = DatasetSpec(
+        users=args.users,
+        conversations_per_user=args.conversations_per_user,
+        messages_per_conversation=args.messages,
+        documents_per_user=args.documents_per_user,
+        document_chars=args.document_chars,
+        seed=args.seed,
+    )
+    config = {"requests": args.requests, "concurrency": args.concurrency, "warmup": args.warmup}
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+
+    Base.metadata.create_all(bind=sync_engine)
+    try:
+        dataset = seed_database(SessionLocal, spec)
+        results = asyncio.run(_run_scenarios(dataset, names, args))
+    finally:
+        close_write_queue()
+        sync_engine.dispose()
+        writer_engine.dispose()
+
+    report = {"spec": spec.to_dict(), "config": config, "results": results}
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        baseline = load_report(args.baseline)
+        if baseline.get("spec") != report["spec"] or baseline.get("config") != report["config"]:
+            print(f"Baseline {args.baseline} was recorded with a different spec/config; not comparing.")
+            baseline = None
+
+    print(format_table(results, baseline["results"] if baseline else None))
+    if args.json_path:
+        save_report(args.json_path, report)
+
+    if args.save_baseline:
+        save_report(args.baseline, report)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    failures = compare(
+        results,
+        baseline["results"] if baseline else {},
+        max_latency_regression=args.max_latency_regression,
+        max_throughput_drop=args.max_throughput_drop,
+        max_error_rate=args.max_error_rate,
+    )
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Scenario drivers: each scenario sends `requests` calls against the app
+in-process (httpx ASGI transport) from `concurrency` concurrent workers
+and records per-request latency.
+"""
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+from scripts.bench.dataset import Dataset, sentence
+
+# One request of a scenario: (client, request number) -> response.
+RequestFn = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    latencies: List[float] = field(default_factory=list)  # seconds, successful calls
+    errors: int = 0
+    wall_seconds: float = 0.0
+    status_counts: Dict[int, int] = field(default_factory=dict)
+
+
+def _create_conversation(dataset: Dataset, rng: random.Random) -> RequestFn:
+    async def call(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        user_id = dataset.user_ids[i % len(dataset.user_ids)]
+        return await client.post(
+            "/conversations",
+            json={"user_id": user_id, "mode": "open", "first_message": sentence(rng)},
+        )
+
+    return call
+
+
+def _append_message(conversation_ids: List[int]) -> Callable[[Dataset, random.Random], RequestFn]:
+    def build(dataset: Dataset, rng: random.Random) -> RequestFn:
+        async def call(client: httpx.AsyncClient, i: int) -> httpx.Response:
+            conversation_id = conversation_ids[i % len(conversation_ids)]
+            return await client.post(
+                f"/conversations/{conversation_id}/messages",
+                json={"content": sentence(rng)},
+            )
+
+        return call
+
+    return build
+
+
+def _list_conversations(dataset: Dataset, rng: random.Random) -> RequestFn:
+    async def call(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        user_id = dataset.user_ids[i % len(dataset.user_ids)]
+        return await client.get(f"/users/{user_id}/conversations", params={"limit": 20})
+
+    return call
+
+
+def _conversation_detail(dataset: Dataset, rng: random.Random) -> RequestFn:
+    async def call(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        conversation_ids = dataset.conversation_ids
+        return await client.get(f"/conversations/{conversation_ids[i % len(conversation_ids)]}")
+
+    return call
+
+
+def build_scenarios(dataset: Dataset) -> Dict[str, Callable[[Dataset, random.Random], RequestFn]]:
+    """
+    Scenario name -> request builder, for the scenarios this dataset supports.
+    """
+    scenarios: Dict[str, Callable[[Dataset, random.Random], RequestFn]] = {
+        "create_conversation": _create_conversation,
+        "list_conversations": _list_conversations,
+    }
+    if dataset.conversation_ids:
+        scenarios["conversation_detail"] = _conversation_detail
+    if dataset.open_conversation_ids:
+        scenarios["append_message"] = _append_message(dataset.open_conversation_ids)
+    if dataset.grounded_conversation_ids:
+        scenarios["grounded_turn"] = _append_message(dataset.grounded_conversation_ids)
+    return scenarios
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    name: str,
+    request_fn: RequestFn,
+    requests: int,
+    concurrency: int,
+    warmup: int = 0,
+) -> ScenarioResult:
+    """
+    Send `warmup` unmeasured calls, then `requests` measured calls spread
+    over `concurrency` workers. Responses with status >= 400 and
+    exceptions count as errors.
+    """
+    for i in range(warmup):
+        await request_fn(client, i)
+
+    result = ScenarioResult(name=name)
+    counter = iter(range(warmup, warmup + requests))
+
+    async def worker() -> None:
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await request_fn(client, i)
+            except Exception:
+                result.errors += 1
+                continue
+            elapsed = time.perf_counter() - start
+            result.status_counts[response.status_code] = (
+                result.status_counts.get(response.status_code, 0) + 1
+            )
+            if response.status_code >= 400:
+                result.errors += 1
+            else:
+                result.latencies.append(elapsed)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    result.wall_seconds = time.perf_counter() - start
+    return result
@@ -0,0 +1,24 @@
+import pytest
+
+from app.core.database import Base, sync_engine
+from app.services import rate_limiter
+import app.models.models  # noqa: F401  (registers the tables on Base)
+
+
+@pytest.fixture(autouse=True, scope="session")
+def database_tables():
+    """
+    Create (or upgrade) the schema before any test runs. Module-level
+    TestClients never run the startup hook, so a fresh checkout would
+    otherwise have no tables.
+    """
+    Base.metadata.create_all(bind=sync_engine)
+
+
+@pytest.fixture(autouse=True)
+def fresh_admission_controller(monkeypatch):
+    """
+    Give every test its own rate limiter, so budgets spent (or restored from
+    rate_limit_states) by earlier tests and runs never turn requests into 429s.
+    """
+    monkeypatch.setattr(rate_limiter, "_controller", None)
@@ -0,0 +1,55 @@
+import asyncio
+
+import httpx
+import pytest
+
+from main import app
+from scripts.bench.report import compare, percentile, summarize
+from scripts.bench.scenarios import run_scenario
+
+
+def test_percentile_interpolates_between_ranks():
+    values = [4.0, 1.0, 3.0, 2.0]
+    assert percentile(values, 0) == 1.0
+    assert percentile(values, 50) == pytest.approx(2.5)
+    assert percentile(values, 100) == 4.0
+    assert percentile([], 95) == 0.0
+
+
+def test_summarize_reports_milliseconds_and_error_rate():
+    summary = summarize([0.01, 0.02, 0.03], errors=1, wall_seconds=0.5)
+    assert summary["requests"] == 4
+    assert summary["error_rate"] == pytest.approx(0.25)
+    assert summary["throughput_rps"] == pytest.approx(6.0)
+    assert summary["p50_ms"] == pytest.approx(20.0)
+    assert summary["max_ms"] == pytest.approx(30.0)
+
+
+def test_compare_flags_regressions_past_thresholds():
+    baseline = {"list": summarize([0.010] * 100, errors=0, wall_seconds=1.0)}
+    steady = {"list": summarize([0.011] * 100, errors=0, wall_seconds=1.1)}
+    slower = {"list": summarize([0.020] * 100, errors=0, wall_seconds=2.0)}
+    failing = {"list": summarize([0.010] * 90, errors=10, wall_seconds=1.0)}
+
+    assert compare(steady, baseline) == []
+    failures = compare(slower, baseline)
+    assert any("p95_ms" in f for f in failures)
+    assert any("throughput" in f for f in failures)
+    assert any("error rate" in f for f in compare(failing, baseline))
+    # Scenarios without a baseline are only gated on errors.
+    assert compare(slower, {}) == []
+
+
+def test_run_scenario_counts_error_responses():
+    async def call(client, i):
+        return await client.get("/health" if i % 2 else "/no-such-route")
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return await run_scenario(client, "mixed", call, requests=10, concurrency=3)
+
+    result = asyncio.run(run())
+    assert len(result.latencies) == 5
+    assert result.errors == 5
+    assert result.status_counts[404] == 5
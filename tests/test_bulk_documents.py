@@ -0,0 +1,197 @@
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine, sync_engine, writer_engine
+from app.models.models import Document
+from app.services import bulk_import
+from app.services.bulk_import import BulkParseError, JSONRowParser, index_documents
+from main import app
+
+
+client = TestClient(app)
+
+
+def _create_user(email: str = "bulk@example.com"):
+    resp = client.post(
+        "/users",
+        json={
+            "email": email,
+            "full_name": "Bulk User",
+        },
+    )
+    assert resp.status_code in (200, 201, 400)
+    if resp.status_code == 400:
+        return 1
+    return resp.json()["id"]
+
+
+def _feed_in_pieces(body: str, size: int = 7):
+    parser = JSONRowParser()
+    rows = []
+    data = body.encode("utf-8")
+    for start in range(0, len(data), size):
+        rows.extend(parser.feed(data[start : start + size]))
+    rows.extend(parser.close())
+    return rows
+
+
+def test_parser_handles_arrays_and_ndjson_split_anywhere():
+    rows = [{"n": i, "text": "naïve ✓"} for i in range(5)] + [12345]
+
+    assert _feed_in_pieces(json.dumps(rows)) == rows
+    assert _feed_in_pieces("\n".join(json.dumps(r) for r in rows) + "\n") == rows
+
+    with pytest.raises(BulkParseError):
+        _feed_in_pieces('[{"n": 1}, {"n": ')
+
+
+def test_bulk_import_reports_per_row_results_and_indexes_in_background():
+    user_id = _create_user()
+    lines = [
+        json.dumps({"user_id": user_id, "name": "Doc A", "raw_text": "Alpha bulk content"}),
+        json.dumps({"user_id": user_id}),
+        "{not json",
+        json.dumps({"user_id": 999999, "name": "Orphan", "raw_text": "x"}),
+        json.dumps({"user_id": user_id, "name": "Doc B", "raw_text": "Beta bulk content"}),
+    ]
+
+    resp = client.post(
+        "/documents/bulk",
+        content="\n".join(lines),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert resp.status_code == 202
+    data = resp.json()
+
+    assert data["created"] == 2 and data["failed"] == 3
+    assert [r["index"] for r in data["results"]] == [0, 1, 2, 3, 4]
+    assert [r["status"] for r in data["results"]] == [
+        "created", "error", "error", "error", "created",
+    ]
+    assert "name" in data["results"][1]["error"]
+    assert "not found" in data["results"][3]["error"]
+
+    # Background indexing has run by the time TestClient returns.
+    doc = client.get(f"/documents/{data['results'][4]['id']}").json()
+    assert doc["name"] == "Doc B"
+    assert doc["index_status"] == "ready"
+
+
+def test_document_writes_go_through_the_writer(monkeypatch):
+    monkeypatch.setattr(settings, "CHUNK_SIZE_CHARS", 100)
+    monkeypatch.setattr(settings, "INGEST_BATCH_CHUNKS", 2)
+    user_id = _create_user("bulk-writer@example.com")
+    pooled, writer = [], []
+
+    def recorder(statements):
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement.split()[0])
+        return record
+
+    listeners = [
+        (sync_engine, recorder(pooled)),
+        (engine.sync_engine, recorder(pooled)),
+        (writer_engine, recorder(writer)),
+    ]
+    for target, listener in listeners:
+        event.listen(target, "before_cursor_execute", listener)
+    try:
+        text = " ".join(f"word{i}" for i in range(200))
+        inline = client.post(
+            "/documents", json={"user_id": user_id, "name": "Inline", "raw_text": text}
+        )
+        bulk = client.post(
+            "/documents/bulk",
+            content=json.dumps({"user_id": user_id, "name": "Bulk", "raw_text": text}),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+    finally:
+        for target, listener in listeners:
+            event.remove(target, "before_cursor_execute", listener)
+
+    assert inline.status_code == 201 and inline.json()["index_status"] == "ready"
+    assert bulk.status_code == 202
+    assert not {"INSERT", "UPDATE", "DELETE"} & set(pooled)
+    # Each document's chunks are committed a few at a time, not in one
+    # long transaction.
+    assert writer.count("BEGIN") > 6
+    db = SessionLocal()
+    try:
+        for doc_id in (inline.json()["id"], bulk.json()["results"][0]["id"]):
+            document = db.get(Document, doc_id)
+            assert document.index_status == "ready"
+            assert document.chunk_count > 4
+    finally:
+        db.close()
+
+
+def _pending_documents(user_id: int, count: int):
+    db = SessionLocal()
+    try:
+        documents = [
+            Document(
+                user_id=user_id,
+                name=f"Pending {i}",
+                raw_text=f"Pending document number {i}",
+                index_status="pending",
+            )
+            for i in range(count)
+        ]
+        db.add_all(documents)
+        db.commit()
+        return [d.id for d in documents]
+    finally:
+        db.close()
+
+
+def _index_statuses(document_ids):
+    db = SessionLocal()
+    try:
+        rows = db.query(Document.id, Document.index_status).filter(
+            Document.id.in_(document_ids)
+        )
+        return {doc_id: status for doc_id, status in rows}
+    finally:
+        db.close()
+
+
+def test_failing_document_does_not_fail_its_batch(monkeypatch):
+    user_id = _create_user("bulk-savepoint@example.com")
+    good, bad, other = _pending_documents(user_id, 3)
+
+    ingest = bulk_import.ingest_document
+
+    def flaky_ingest(write, document_id, **kwargs):
+        ingest(write, document_id, **kwargs)
+        if document_id == bad:
+            raise RuntimeError("boom")
+
+    monkeypatch.setattr(bulk_import, "ingest_document", flaky_ingest)
+    index_documents([good, bad, other])
+
+    assert _index_statuses([good, bad, other]) == {
+        good: "ready",
+        bad: "failed",
+        other: "ready",
+    }
+    db = SessionLocal()
+    try:
+        assert db.get(Document, bad).chunk_count == 0
+    finally:
+        db.close()
+
+
+def test_pending_documents_are_indexed_on_startup():
+    user_id = _create_user("bulk-resume@example.com")
+    document_ids = _pending_documents(user_id, 2)
+
+    with TestClient(app):
+        deadline = time.monotonic() + 10
+        while set(_index_statuses(document_ids).values()) != {"ready"}:
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+from app.services.completion_cache import CompletionCache, completion_cache_key
+from main import app
+
+
+client = TestClient(app)
+
+
+def _create_user(email: str = "cache@example.com"):
+    resp = client.post(
+        "/users",
+        json={
+            "email": email,
+            "full_name": "Cache User",
+        },
+    )
+    assert resp.status_code in (200, 201, 400)
+    if resp.status_code == 400:
+        return 1
+    return resp.json()["id"]
+
+
+def test_cache_key_depends_on_every_input():
+    messages = [{"role": "user", "content": "hi"}]
+    key = completion_cache_key("m", messages, "sys", None)
+
+    assert key == completion_cache_key("m", [dict(m) for m in messages], "sys", None)
+    assert key != completion_cache_key("other", messages, "sys", None)
+    assert key != completion_cache_key("m", messages, "sys", "ctx")
+    assert key != completion_cache_key("m", [{"role": "assistant", "content": "hi"}], "sys", None)
+
+
+def test_lru_evicts_least_recently_used_and_expires():
+    cache = CompletionCache(max_entries=2)
+    cache.set("a", "A", {})
+    cache.set("b", "B", {})
+    assert cache.get("a") == ("A", {})
+    cache.set("c", "C", {})
+
+    assert cache.get("b") is None
+    assert cache.get("c") == ("C", {})
+    assert cache.stats() == {"entries": 2, "hits": 2, "misses": 1, "disk_hits": 0}
+
+    expired = CompletionCache(ttl_seconds=0)
+    expired.set("a", "A", {})
+    assert expired.get("a") is None
+
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first = CompletionCache(path=path)
+    first.set("k", "reply", {"prompt_tokens": 3, "completion_tokens": 1})
+    first.close()
+
+    second = CompletionCache(path=path)
+    assert second.get("k") == ("reply", {"prompt_tokens": 3, "completion_tokens": 1})
+    assert second.stats()["disk_hits"] == 1
+    second.close()
+
+
+def test_disk_hit_keeps_the_disk_expiry(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    writer = CompletionCache(ttl_seconds=60, path=path)
+    writer.set("k", "reply", {})
+    writer.flush()
+
+    reader = CompletionCache(ttl_seconds=3600, path=path)
+    assert asyncio.run(reader.aget("k")) == ("reply", {})
+    expires_at, _ = reader._entries["k"]
+    assert expires_at - time.monotonic() <= 60
+    assert reader.stats()["disk_hits"] == 1
+
+    writer.close()
+    reader.close()
+
+
+def test_repeated_prompt_is_served_from_cache_unless_opted_out():
+    user_id = _create_user()
+    body = {"user_id": user_id, "mode": "open", "first_message": "What is a cache key?"}
+
+    first = client.post("/conversations", json=body).json()["messages"][1]
+    second = client.post("/conversations", json=body).json()["messages"][1]
+    opted_out = client.post(
+        "/conversations", json={**body, "cache_enabled": False}
+    ).json()["messages"][1]
+
+    assert second["content"] == first["content"]
+    assert second["prompt_tokens"] == 0 and second["completion_tokens"] == 0
+    assert opted_out["content"] == first["content"]
+    assert opted_out["completion_tokens"] > 0
@@ -1,5 +1,8 @@
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 
+from app.api import conversations
+from app.core.database import engine, writer_engine
 from main import app
 
 
@@ -74,4 +77,163 @@ def test_append_message_to_conversation():
     conv_detail = resp3.json()
     roles = [m["role"] for m in conv_detail["messages"]]
     assert roles.count("assistant") >= 2
-    assert roles.count("user") >= 2
\ No newline at end of file
+    assert roles.count("user") >= 2
+
+def test_list_conversations_keyset_pagination():
+    user_id = _create_user(email="testuser3@example.com")
+
+    created = []
+    for i in range(5):
+        resp = client.post(
+            "/conversations",
+            json={
+                "user_id": user_id,
+                "mode": "open",
+                "title": f"Paged conv {i}",
+                "first_message": f"Message {i}",
+            },
+        )
+        assert resp.status_code == 201
+        created.append(resp.json()["id"])
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        resp = client.get(f"/users/{user_id}/conversations", params=params)
+        assert resp.status_code == 200
+        page = resp.json()
+        assert len(page) <= 2
+        seen.extend(page)
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    ids = [c["id"] for c in seen]
+    assert len(ids) == len(set(ids))
+    assert set(created) <= set(ids)
+
+    newest = seen[0]
+    assert newest["id"] == created[-1]
+    assert newest["message_count"] == 2
+    assert newest["last_message_at"] is not None
+
+
+def test_list_conversations_rejects_bad_cursor():
+    user_id = _create_user(email="testuser3@example.com")
+    resp = client.get(f"/users/{user_id}/conversations", params={"cursor": "not-a-cursor"})
+    assert resp.status_code == 400
+
+
+def test_messages_get_consecutive_order_indexes():
+    user_id = _create_user(email="testuser4@example.com")
+
+    resp = client.post(
+        "/conversations",
+        json={
+            "user_id": user_id,
+            "mode": "open",
+            "first_message": "First",
+        },
+    )
+    assert resp.status_code == 201
+    conv_id = resp.json()["id"]
+
+    for i in range(3):
+        resp = client.post(
+            f"/conversations/{conv_id}/messages",
+            json={"content": f"Follow-up {i}"},
+        )
+        assert resp.status_code == 201
+
+    messages = client.get(f"/conversations/{conv_id}").json()["messages"]
+    assert [m["order_index"] for m in messages] == list(range(1, 9))
+
+
+def test_conversation_detail_paginates_messages():
+    user_id = _create_user(email="testuser5@example.com")
+
+    resp = client.post(
+        "/conversations",
+        json={
+            "user_id": user_id,
+            "mode": "open",
+            "first_message": "Page me",
+        },
+    )
+    conv_id = resp.json()["id"]
+    for i in range(2):
+        client.post(f"/conversations/{conv_id}/messages", json={"content": f"More {i}"})
+
+    order = []
+    cursor = None
+    while True:
+        params = {"limit": 4}
+        if cursor:
+            params["cursor"] = cursor
+        resp = client.get(f"/conversations/{conv_id}", params=params)
+        assert resp.status_code == 200
+        order.extend(m["order_index"] for m in resp.json()["messages"])
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert order == list(range(1, 7))
+
+
+def test_turn_is_written_in_one_transaction():
+    user_id = _create_user(email="testuser6@example.com")
+    conv_id = client.post(
+        "/conversations",
+        json={"user_id": user_id, "mode": "open", "first_message": "One shot"},
+    ).json()["id"]
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0])
+
+    event.listen(writer_engine, "before_cursor_execute", record)
+    try:
+        resp = client.post(
+            f"/conversations/{conv_id}/messages",
+            json={"content": "Both rows at once"},
+        )
+    finally:
+        event.remove(writer_engine, "before_cursor_execute", record)
+
+    assert resp.status_code == 201
+    assert resp.json()["order_index"] == 3
+    # One BEGIN, one seq UPDATE, one INSERT for both messages and one
+    # usage rollup upsert.
+    assert statements.count("BEGIN") == 1
+    assert statements.count("UPDATE") == 1
+    assert statements.count("INSERT") == 2
+    assert "SELECT" not in statements
+
+    messages = client.get(f"/conversations/{conv_id}").json()["messages"]
+    assert [(m["order_index"], m["role"]) for m in messages][-2:] == [
+        (3, "user"),
+        (4, "assistant"),
+    ]
+
+
+def test_no_connection_is_held_while_the_llm_generates(monkeypatch):
+    user_id = _create_user(email="testuser7@example.com")
+    checked_out = []
+
+    async def fake_generate_reply(**kwargs):
+        checked_out.append(engine.sync_engine.pool.checkedout())
+        return "Reply", {"prompt_tokens": 1, "completion_tokens": 1}
+
+    monkeypatch.setattr(conversations, "agenerate_reply", fake_generate_reply)
+    conv_id = client.post(
+        "/conversations",
+        json={"user_id": user_id, "mode": "open", "first_message": "First"},
+    ).json()["id"]
+    resp = client.post(f"/conversations/{conv_id}/messages", json={"content": "Second"})
+
+    assert resp.status_code == 201
+    assert checked_out == [0, 0]
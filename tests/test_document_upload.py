@@ -0,0 +1,164 @@
+import hashlib
+import os
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import Conversation, DocumentChunk
+from app.services.blob_store import get_blob_store
+from app.services.context_builder import build_rag_passages
+from app.services.ingestion import chunk_texts, split_into_chunks
+from main import app
+
+
+client = TestClient(app)
+
+
+def _create_user(email: str = "upload@example.com"):
+    resp = client.post(
+        "/users",
+        json={
+            "email": email,
+            "full_name": "Upload User",
+        },
+    )
+    assert resp.status_code in (200, 201, 400)
+    if resp.status_code == 400:
+        return 1
+    return resp.json()["id"]
+
+
+def test_split_into_chunks_gives_same_spans_for_bytes():
+    text = " ".join(f"word{i}" for i in range(300))
+
+    assert split_into_chunks(text.encode(), 100, 20) == split_into_chunks(text, 100, 20)
+
+
+def test_upload_streams_file_into_content_addressed_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "BLOB_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "CHUNK_SIZE_CHARS", 200)
+    monkeypatch.setattr(settings, "INGEST_BATCH_CHUNKS", 2)
+    user_id = _create_user()
+    body = ("Café crème notes. " * 40 + "The turbine manual lives here. ").encode("utf-8")
+
+    resp = client.post(
+        "/documents/upload",
+        data={"user_id": str(user_id)},
+        files={"file": ("manual.txt", body, "text/plain")},
+    )
+    assert resp.status_code == 201
+    doc = resp.json()
+
+    assert doc["name"] == "manual.txt"
+    assert doc["raw_text"] is None
+    assert doc["size_bytes"] == len(body)
+    assert doc["content_hash"] == hashlib.sha256(body).hexdigest()
+    with open(get_blob_store().absolute_path(doc["storage_path"]), "rb") as f:
+        assert f.read() == body
+
+    # Identical content is stored once.
+    again = client.post(
+        "/documents/upload",
+        data={"user_id": str(user_id), "name": "copy"},
+        files={"file": ("copy.txt", body, "text/plain")},
+    ).json()
+    assert again["storage_path"] == doc["storage_path"]
+    assert os.listdir(get_blob_store().tmp_dir) == []
+
+    # Chunked from the file in the background, a few chunks per batch;
+    # offsets are byte positions and passages are read from the blob
+    # rather than copied into the database.
+    assert client.get(f"/documents/{doc['id']}").json()["index_status"] == "ready"
+    db = SessionLocal()
+    try:
+        chunks = (
+            db.query(DocumentChunk)
+            .filter(DocumentChunk.document_id == doc["id"])
+            .order_by(DocumentChunk.chunk_index)
+            .all()
+        )
+        texts = chunk_texts(db, chunks)
+        passages = build_rag_passages(
+            db, Conversation(), query_text="turbine manual", document_ids=[doc["id"]]
+        )
+    finally:
+        db.close()
+    assert len(chunks) > 2
+    assert [chunk.chunk_index for chunk in chunks] == list(range(len(chunks)))
+    for chunk, text in zip(chunks, texts):
+        assert chunk.content == ""
+        assert body[chunk.start_offset : chunk.end_offset].decode("utf-8") == text
+    assert "turbine" in texts[-1]
+    assert "The turbine manual lives here." in passages[0][0]
+
+
+def test_upload_requires_file_part():
+    user_id = _create_user()
+
+    resp = client.post(
+        "/documents/upload",
+        data={"user_id": str(user_id)},
+        files={"other": ("x.txt", b"x", "text/plain")},
+    )
+    assert resp.status_code == 400
+
+
+def test_listing_is_metadata_only_and_keyset_paginated():
+    # A user of its own, so the listing holds only this run's documents.
+    user_id = _create_user(f"{uuid.uuid4().hex}@listing.com")
+    ids = [
+        client.post(
+            "/documents",
+            json={"user_id": user_id, "name": f"doc{i}", "raw_text": f"body {i} " * 100},
+        ).json()["id"]
+        for i in range(3)
+    ]
+
+    first = client.get("/documents", params={"user_id": user_id, "limit": 2})
+    assert first.status_code == 200
+    assert [d["id"] for d in first.json()] == ids[::-1][:2]
+    assert "raw_text" not in first.json()[0]
+    assert first.json()[0]["size_bytes"] == len(("body 2 " * 100).encode())
+
+    second = client.get(
+        "/documents",
+        params={"user_id": user_id, "limit": 2, "cursor": first.headers["X-Next-Cursor"]},
+    )
+    assert [d["id"] for d in second.json()] == [ids[0]]
+    assert "X-Next-Cursor" not in second.headers
+
+    detail = client.get(f"/documents/{ids[0]}").json()
+    assert "raw_text" not in detail and detail["name"] == "doc0"
+    selected = client.get(f"/documents/{ids[0]}", params={"fields": "raw_text"}).json()
+    assert selected == {"id": ids[0], "raw_text": "body 0 " * 100}
+    assert client.get(f"/documents/{ids[0]}", params={"fields": "nope"}).status_code == 400
+
+
+def test_content_endpoint_serves_byte_ranges(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "BLOB_STORE_DIR", str(tmp_path))
+    user_id = _create_user("range@example.com")
+    body = bytes(range(256)) * 1000
+    doc_id = client.post(
+        "/documents/upload",
+        data={"user_id": str(user_id)},
+        files={"file": ("data.bin", body, "application/octet-stream")},
+    ).json()["id"]
+    url = f"/documents/{doc_id}/content"
+
+    full = client.get(url)
+    assert full.status_code == 200 and full.content == body
+    assert full.headers["accept-ranges"] == "bytes"
+
+    part = client.get(url, headers={"Range": "bytes=100000-199999"})
+    assert part.status_code == 206
+    assert part.content == body[100000:200000]
+    assert part.headers["content-range"] == f"bytes 100000-199999/{len(body)}"
+
+    tail = client.get(url, headers={"Range": "bytes=-10"})
+    assert tail.content == body[-10:]
+
+    bad = client.get(url, headers={"Range": f"bytes={len(body)}-"})
+    assert bad.status_code == 416
+    assert bad.headers["content-range"] == f"bytes */{len(body)}"
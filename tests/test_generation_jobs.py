@@ -0,0 +1,170 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.conversations import _enqueue_turn
+from app.core.database import SessionLocal, engine
+from app.models.models import GenerationJob
+from app.services import generation_jobs
+from main import app
+
+
+client = TestClient(app)
+
+
+def _create_user(email: str):
+    resp = client.post("/users", json={"email": email, "full_name": "Jobs User"})
+    if resp.status_code == 400:
+        return 1
+    return resp.json()["id"]
+
+
+def _conversation() -> int:
+    user_id = _create_user(f"{uuid.uuid4().hex}@jobs.com")
+    resp = client.post(
+        "/conversations",
+        json={"user_id": user_id, "mode": "open", "first_message": "Jobs opener"},
+    )
+    assert resp.status_code == 201
+    return resp.json()["id"]
+
+
+@pytest.fixture
+def live_client():
+    # One event loop for the whole test, so the workers keep running
+    # between requests.
+    with TestClient(app) as live:
+        yield live
+
+
+def test_async_turn_returns_202_and_long_poll_gets_reply(live_client):
+    conv_id = _conversation()
+
+    resp = live_client.post(
+        f"/conversations/{conv_id}/messages",
+        params={"async": "true"},
+        json={"content": "Answer me later"},
+    )
+    assert resp.status_code == 202
+    job = resp.json()
+    assert job["status"] == "queued"
+    assert job["assistant_message"] is None
+    assert resp.headers["Location"] == f"/jobs/{job['id']}"
+
+    done = live_client.get(f"/jobs/{job['id']}", params={"wait": 10}).json()
+    assert done["status"] == "succeeded"
+    assert done["attempts"] == 1
+    assert done["finished_at"] is not None
+    reply = done["assistant_message"]
+    assert reply["role"] == "assistant"
+    assert reply["prompt_tokens"] > 0
+
+    messages = live_client.get(f"/conversations/{conv_id}").json()["messages"]
+    assert [m["id"] for m in messages[-2:]] == [job["user_message_id"], reply["id"]]
+
+
+def test_async_turns_of_a_conversation_are_answered_in_order(live_client):
+    conv_id = _conversation()
+    job_ids = [
+        live_client.post(
+            f"/conversations/{conv_id}/messages",
+            params={"async": "true"},
+            json={"content": f"Queued turn {i}"},
+        ).json()["id"]
+        for i in range(3)
+    ]
+    replies = [
+        live_client.get(f"/jobs/{job_id}", params={"wait": 10}).json()["assistant_message"]
+        for job_id in job_ids
+    ]
+    order = [r["order_index"] for r in replies]
+    assert order == sorted(order)
+
+
+def test_unfinished_job_is_resumed_after_a_restart():
+    conv_id = _conversation()
+    conversation = client.get(f"/conversations/{conv_id}").json()
+    with SessionLocal() as db:
+        # A job claimed by a process that died mid-generation.
+        job = GenerationJob(
+            conversation_id=conv_id,
+            user_id=conversation["user_id"],
+            user_message_id=conversation["messages"][0]["id"],
+            status="running",
+            attempts=1,
+        )
+        db.add(job)
+        db.commit()
+        job_id = job.id
+
+    resumed = client.get(f"/jobs/{job_id}", params={"wait": 10}).json()
+    assert resumed["status"] == "succeeded"
+    assert resumed["attempts"] == 2
+
+
+def test_each_queued_job_answers_its_own_message():
+    conv_id = _conversation()
+    user_id = client.get(f"/conversations/{conv_id}").json()["user_id"]
+    with SessionLocal() as db:
+        # Both turns are queued before either reply is generated.
+        jobs = [
+            _enqueue_turn(db, conv_id, user_id, content)[1]
+            for content in ("question ONE", "question TWO")
+        ]
+        db.commit()
+
+    replies = [
+        client.get(f"/jobs/{job.id}", params={"wait": 10}).json()["assistant_message"]
+        for job in jobs
+    ]
+    assert "question ONE" in replies[0]["content"]
+    assert "question TWO" not in replies[0]["content"]
+    assert "question TWO" in replies[1]["content"]
+
+
+def test_long_poll_holds_no_connection_while_waiting(live_client, monkeypatch):
+    checked_out = []
+    handler = generation_jobs._handler
+
+    async def slow_handler(job):
+        # By now the poll below is waiting on the job.
+        await asyncio.sleep(0.2)
+        checked_out.append(engine.sync_engine.pool.checkedout())
+        await handler(job)
+
+    monkeypatch.setattr(generation_jobs, "_handler", slow_handler)
+    conv_id = _conversation()
+    job_id = live_client.post(
+        f"/conversations/{conv_id}/messages",
+        params={"async": "true"},
+        json={"content": "Take your time"},
+    ).json()["id"]
+
+    done = live_client.get(f"/jobs/{job_id}", params={"wait": 10}).json()
+    assert done["status"] == "succeeded"
+    assert checked_out == [0]
+
+
+def test_failed_generation_marks_the_job_failed(live_client, monkeypatch):
+    async def broken_handler(job):
+        raise RuntimeError("provider down")
+
+    monkeypatch.setattr(generation_jobs, "_handler", broken_handler)
+    conv_id = _conversation()
+    job_id = live_client.post(
+        f"/conversations/{conv_id}/messages",
+        params={"async": "true"},
+        json={"content": "This will fail"},
+    ).json()["id"]
+
+    failed = live_client.get(f"/jobs/{job_id}", params={"wait": 10}).json()
+    assert failed["status"] == "failed"
+    assert failed["error"] == "provider down"
+    assert failed["assistant_message"] is None
+
+
+def test_poll_without_wait_and_unknown_job():
+    assert client.get("/jobs/999999999").status_code == 404
+    assert client.get("/jobs/1", params={"wait": -1}).status_code == 422
@@ -1,5 +1,6 @@
 from fastapi.testclient import TestClient
 
+from app.core.database import async_database_url
 from main import app
 
 
@@ -11,4 +12,12 @@ def test_health_ok():
     assert response.status_code == 200
     data = response.json()
     assert data["status"] == "ok"
-    assert "message" in data
\ No newline at end of file
+    assert "message" in data
+
+def test_async_database_url_maps_sync_drivers():
+    assert async_database_url("sqlite:///./app.db") == "sqlite+aiosqlite:///./app.db"
+    assert (
+        async_database_url("postgresql://u:p@db/app")
+        == "postgresql+asyncpg://u:p@db/app"
+    )
+    assert async_database_url("sqlite+aiosqlite:///x.db") == "sqlite+aiosqlite:///x.db"
@@ -0,0 +1,231 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.core.config import settings
+from app.services import llm_client
+from app.services.llm_client import (
+    BatchScheduler,
+    CompletionRequest,
+    DummyProvider,
+    LLMProviderError,
+    OpenAICompatibleProvider,
+    agenerate_reply,
+    close_http_client,
+)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """
+    Minimal OpenAI-compatible /chat/completions stub.
+    Fails with 503 for the first `failures` requests.
+    """
+
+    failures = 0
+    requests = 0
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length))
+        type(self).requests += 1
+
+        if type(self).requests <= type(self).failures:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        last = body["messages"][-1]["content"]
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for word in ["Echo: ", last]:
+                event = {"choices": [{"delta": {"content": word}}]}
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+            usage = {"choices": [], "usage": {"prompt_tokens": 7, "completion_tokens": 2}}
+            self.wfile.write(f"data: {json.dumps(usage)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
+
+        payload = json.dumps(
+            {
+                "choices": [{"message": {"role": "assistant", "content": f"Echo: {last}"}}],
+                "usage": {"prompt_tokens": 7, "completion_tokens": 2},
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_RETRY_BASE_DELAY", 0.01)
+    _StubHandler.failures = 0
+    _StubHandler.requests = 0
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    thread = threading.Thread(
+        target=server.serve_forever,
+        kwargs={"poll_interval": 0.05},
+        daemon=True,
+    )
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+def _run(coro):
+    async def wrapper():
+        try:
+            return await coro
+        finally:
+            await close_http_client()
+
+    return asyncio.run(wrapper())
+
+
+def test_complete_against_stub_server(stub_server):
+    provider = OpenAICompatibleProvider(base_url=stub_server, api_key="test", model="stub")
+
+    text, usage = _run(provider.complete([{"role": "user", "content": "hello"}]))
+
+    assert text == "Echo: hello"
+    assert usage == {"prompt_tokens": 7, "completion_tokens": 2}
+
+
+def test_complete_retries_transient_errors(stub_server):
+    _StubHandler.failures = 2
+    provider = OpenAICompatibleProvider(base_url=stub_server, max_retries=3)
+
+    text, _ = _run(provider.complete([{"role": "user", "content": "retry"}]))
+
+    assert text == "Echo: retry"
+    assert _StubHandler.requests == 3
+
+
+def test_complete_gives_up_after_max_retries(stub_server):
+    _StubHandler.failures = 10
+    provider = OpenAICompatibleProvider(base_url=stub_server, max_retries=1)
+
+    with pytest.raises(LLMProviderError):
+        _run(provider.complete([{"role": "user", "content": "fail"}]))
+    assert _StubHandler.requests == 2
+
+
+def test_stream_against_stub_server(stub_server):
+    provider = OpenAICompatibleProvider(base_url=stub_server)
+
+    async def consume():
+        stream = provider.stream([{"role": "user", "content": "stream me"}])
+        deltas = [delta async for delta in stream]
+        return deltas, stream
+
+    deltas, stream = _run(consume())
+
+    assert deltas == ["Echo: ", "stream me"]
+    assert stream.text == "Echo: stream me"
+    assert stream.usage == {"prompt_tokens": 7, "completion_tokens": 2}
+
+
+def test_concurrent_completions_share_one_client(stub_server, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MAX_CONCURRENCY", 4)
+    provider = OpenAICompatibleProvider(base_url=stub_server)
+
+    async def many():
+        return await asyncio.gather(
+            *(provider.complete([{"role": "user", "content": str(i)}]) for i in range(20))
+        )
+
+    results = _run(many())
+
+    assert [text for text, _ in results] == [f"Echo: {i}" for i in range(20)]
+
+
+class _RecordingProvider(DummyProvider):
+    """
+    Dummy provider recording its batch sizes; "fail" requests get an error.
+    """
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    async def complete_batch(self, requests):
+        self.batch_sizes.append(len(requests))
+        results = await super().complete_batch(requests)
+        return [
+            LLMProviderError("rejected") if r.messages[-1]["content"] == "fail" else result
+            for r, result in zip(requests, results)
+        ]
+
+
+def _request(content: str) -> CompletionRequest:
+    return CompletionRequest([{"role": "user", "content": content}])
+
+
+def test_batch_scheduler_groups_concurrent_requests():
+    provider = _RecordingProvider()
+    scheduler = BatchScheduler(max_batch_size=4, max_wait_ms=50)
+
+    async def many():
+        return await asyncio.gather(
+            *(scheduler.submit(provider, _request(f"q{i}")) for i in range(10))
+        )
+
+    results = asyncio.run(many())
+
+    assert sorted(provider.batch_sizes) == [2, 4, 4]
+    assert scheduler.batches == 3
+    for i, (text, usage) in enumerate(results):
+        assert f"q{i}" in text
+        assert usage["completion_tokens"] > 0
+
+
+def test_batch_scheduler_fans_out_per_request_errors():
+    provider = _RecordingProvider()
+    scheduler = BatchScheduler(max_batch_size=8, max_wait_ms=10)
+
+    async def mixed():
+        return await asyncio.gather(
+            scheduler.submit(provider, _request("ok")),
+            scheduler.submit(provider, _request("fail")),
+            return_exceptions=True,
+        )
+
+    ok, failed = asyncio.run(mixed())
+
+    assert provider.batch_sizes == [2]
+    assert "ok" in ok[0]
+    assert isinstance(failed, LLMProviderError)
+
+
+def test_agenerate_reply_batches_when_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "dummy")
+    monkeypatch.setattr(settings, "LLM_BATCHING_ENABLED", True)
+    monkeypatch.setattr(settings, "DUMMY_LLM_LATENCY_MS", 20.0)
+    scheduler = BatchScheduler(max_batch_size=16, max_wait_ms=20)
+    monkeypatch.setattr(llm_client, "_scheduler", scheduler)
+
+    async def turns():
+        return await asyncio.gather(
+            *(
+                agenerate_reply([{"role": "user", "content": f"turn {i}"}], use_cache=False)
+                for i in range(6)
+            )
+        )
+
+    replies = asyncio.run(turns())
+
+    assert scheduler.batches == 1
+    assert all(f"turn {i}" in text for i, (text, _) in enumerate(replies))
+
@@ -0,0 +1,122 @@
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.services import message_search
+from main import app
+
+
+client = TestClient(app)
+
+
+def _create_user(email: str):
+    resp = client.post("/users", json={"email": email, "full_name": "Search User"})
+    if resp.status_code == 400:
+        return 1
+    return resp.json()["id"]
+
+
+def _conversation(user_id: int, first_message: str, *contents: str) -> int:
+    resp = client.post(
+        "/conversations",
+        json={"user_id": user_id, "mode": "open", "first_message": first_message},
+    )
+    assert resp.status_code == 201
+    conv_id = resp.json()["id"]
+    for content in contents:
+        client.post(f"/conversations/{conv_id}/messages", json={"content": content})
+    return conv_id
+
+
+def _search(user_id: int, **params):
+    return client.get(f"/users/{user_id}/messages/search", params=params)
+
+
+def test_search_returns_ranked_hits_with_snippets():
+    user_id = _create_user(f"{uuid.uuid4().hex}@search.com")
+    word = "zebra" + uuid.uuid4().hex[:8]
+    conv_id = _conversation(
+        user_id,
+        f"Tell me about the {word}",
+        f"{word} {word} {word} stripes",
+        "Nothing relevant here",
+    )
+    other_user = _create_user(f"{uuid.uuid4().hex}@search.com")
+    _conversation(other_user, f"Another {word} story")
+
+    resp = _search(user_id, q=word)
+    assert resp.status_code == 200
+    hits = resp.json()
+    user_hits = [h for h in hits if h["role"] == "user"]
+    assert len(user_hits) == 2
+    assert all(h["conversation_id"] == conv_id for h in hits)
+    assert hits[0]["snippet"].count("<mark>") == 3
+    assert [h["score"] for h in hits] == sorted(h["score"] for h in hits)
+    assert "X-Next-Cursor" not in resp.headers
+
+
+def test_search_paginates_with_cursor():
+    user_id = _create_user(f"{uuid.uuid4().hex}@search.com")
+    word = "paged" + uuid.uuid4().hex[:8]
+    _conversation(user_id, f"{word} one", *(f"{word} turn {i}" for i in range(4)))
+
+    expected = [h["message_id"] for h in _search(user_id, q=word, limit=100).json()]
+    assert len(expected) >= 5
+
+    seen, cursor = [], None
+    while True:
+        params = {"q": word, "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        resp = _search(user_id, **params)
+        assert resp.status_code == 200
+        seen.extend(h["message_id"] for h in resp.json())
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == expected
+
+
+def test_deleted_conversation_leaves_the_index():
+    user_id = _create_user(f"{uuid.uuid4().hex}@search.com")
+    word = "gone" + uuid.uuid4().hex[:8]
+    conv_id = _conversation(user_id, f"Soon {word}")
+    assert _search(user_id, q=word).json()
+
+    assert client.delete(f"/conversations/{conv_id}").status_code == 204
+    assert _search(user_id, q=word).json() == []
+
+
+def test_prefix_terms_and_operator_characters():
+    user_id = _create_user(f"{uuid.uuid4().hex}@search.com")
+    # Ends in "x" so the Porter stemmer strips "ing" and nothing else.
+    stem = "prefix" + uuid.uuid4().hex[:8] + "x"
+    _conversation(user_id, f"{stem}ing works")
+
+    hits = _search(user_id, q=f"{stem}*").json()
+    assert [h["role"] for h in hits if h["role"] == "user"] == ["user"]
+    resp = _search(user_id, q=f'"{stem}* AND (NEAR OR -')
+    assert resp.status_code == 200
+    assert _search(user_id, q="?!").status_code == 400
+    assert _search(user_id, q=stem, cursor="not-a-cursor").status_code == 400
+
+
+def test_unknown_user_is_404():
+    assert _search(10**9, q="anything").status_code == 404
+
+
+def test_like_fallback_without_fts_index(monkeypatch):
+    user_id = _create_user(f"{uuid.uuid4().hex}@search.com")
+    word = "fallback" + uuid.uuid4().hex[:8]
+    _conversation(user_id, f"Plain {word} text", f"More {word}")
+    monkeypatch.setattr(message_search, "has_fts_index", lambda db: False)
+    expected = [h["message_id"] for h in _search(user_id, q=word, limit=100).json()]
+    assert len(expected) >= 2
+
+    first = _search(user_id, q=word.upper(), limit=1)
+    assert first.status_code == 200
+    (hit,) = first.json()
+    assert hit["score"] == 0
+    assert word in hit["snippet"]
+    rest = _search(user_id, q=word, limit=100, cursor=first.headers["X-Next-Cursor"]).json()
+    assert [hit["message_id"]] + [h["message_id"] for h in rest] == expected
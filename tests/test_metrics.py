@@ -0,0 +1,66 @@
+from fastapi.testclient import TestClient
+
+from app.core.metrics import Histogram, MetricsRegistry
+from main import app
+
+
+client = TestClient(app)
+
+
+def _create_user(email: str):
+    resp = client.post("/users", json={"email": email, "full_name": "Metrics User"})
+    if resp.status_code == 400:
+        return 1
+    return resp.json()["id"]
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("demo_seconds", "Demo.", ("stage",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage="a")
+    histogram.observe(0.1, stage="a")
+    histogram.observe(5.0, stage="a")
+
+    text = registry.render()
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{stage="a",le="0.1"} 2' in text
+    assert 'demo_seconds_bucket{stage="a",le="1"} 2' in text
+    assert 'demo_seconds_bucket{stage="a",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{stage="a"} 3' in text
+
+
+def test_histogram_time_works_as_decorator():
+    histogram = Histogram("timed_seconds", "Timed.", ("step",))
+
+    @histogram.time(step="x")
+    def work():
+        return 42
+
+    assert work() == 42
+    assert work() == 42
+    assert histogram.count(step="x") == 2
+
+
+def test_metrics_endpoint_reports_turn_stages():
+    user_id = _create_user("metrics@example.com")
+    resp = client.post(
+        "/conversations",
+        json={"user_id": user_id, "mode": "open", "first_message": "Measure me"},
+    )
+    conv_id = resp.json()["id"]
+    client.post(f"/conversations/{conv_id}/messages", json={"content": "Again"})
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+    text = resp.text
+    assert (
+        'http_request_duration_seconds_count{method="POST",'
+        'route="/conversations/{conversation_id}/messages",status="201"}'
+    ) in text
+    assert 'db_query_duration_seconds_count{engine="writer",operation="INSERT"}' in text
+    assert 'context_build_duration_seconds_count{step="history"}' in text
+    assert 'llm_generate_duration_seconds_count{provider="dummy",mode="complete"}' in text
+    assert 'llm_tokens_total{provider="dummy",kind="completion"}' in text
+    assert 'completion_cache_requests_total{result="miss"}' in text
@@ -0,0 +1,73 @@
+from app.services.prompt_packer import pack_prompt
+
+
+def _msg(role: str, words: int, label: str):
+    return {
+        "role": role,
+        "content": " ".join([label] * words),
+        "token_count": words,
+    }
+
+
+def test_pack_prompt_keeps_newest_history_within_budget():
+    history = [_msg("user", 40, f"m{i}") for i in range(10)]
+
+    packed = pack_prompt("sys", history, budget=121)
+
+    # 1 token of system prompt + 3 messages of 40 tokens.
+    assert [m["content"].split()[0] for m in packed.messages] == ["m7", "m8", "m9"]
+    assert packed.prompt_tokens == 121
+    assert all("token_count" not in m for m in packed.messages)
+
+
+def test_pack_prompt_always_keeps_newest_message():
+    history = [_msg("user", 500, "huge")]
+
+    packed = pack_prompt("sys", history, budget=50)
+
+    assert len(packed.messages) == 1
+    assert packed.prompt_tokens > 50
+
+
+def test_pack_prompt_prefers_context_over_old_history():
+    history = [_msg("user", 30, "old"), _msg("assistant", 30, "reply"), _msg("user", 10, "q")]
+    passages = [("passage one", 40), ("too big", 500), ("passage two", 20)]
+
+    packed = pack_prompt(
+        "sys",
+        history,
+        passages,
+        context_instructions="use context",
+        budget=110,
+    )
+
+    assert "passage one" in packed.context
+    assert "passage two" in packed.context
+    assert "too big" not in packed.context
+    assert packed.system_prompt.endswith("use context")
+    assert [m["content"].split()[0] for m in packed.messages] == ["reply", "q"]
+    assert packed.prompt_tokens <= 110
+
+
+def test_pack_prompt_drops_instructions_without_context():
+    packed = pack_prompt(
+        "sys",
+        [_msg("user", 5, "q")],
+        [("too big", 500)],
+        context_instructions="use context",
+        budget=50,
+    )
+
+    assert packed.context is None
+    assert packed.system_prompt == "sys"
+
+
+def test_pack_prompt_keeps_pinned_summary_ahead_of_old_history():
+    summary = {"role": "system", "content": "summary", "token_count": 20, "pinned": True}
+    history = [summary] + [_msg("user", 30, f"m{i}") for i in range(5)]
+
+    packed = pack_prompt("sys", history, budget=81)
+
+    # 1 token of system prompt + newest message + summary + one older message.
+    assert [m["content"].split()[0] for m in packed.messages] == ["summary", "m3", "m4"]
+    assert packed.prompt_tokens == 81
@@ -0,0 +1,142 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.core.database import SessionLocal
+from app.models.models import RateLimitState
+from app.services import rate_limiter
+from app.services.rate_limiter import (
+    AdmissionController,
+    RateLimitExceeded,
+    flush_rate_limit_state,
+)
+from main import app
+
+
+client = TestClient(app)
+
+
+class _Clock:
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _create_user(email: str):
+    resp = client.post("/users", json={"email": email, "full_name": "Limited User"})
+    if resp.status_code == 400:
+        return 1
+    return resp.json()["id"]
+
+
+def test_request_bucket_allows_burst_then_refills():
+    clock = _Clock()
+    limiter = AdmissionController(requests_per_minute=60, request_burst=3, clock=clock)
+
+    for _ in range(3):
+        limiter.admit(7)
+    with pytest.raises(RateLimitExceeded) as exc:
+        limiter.admit(7)
+    assert exc.value.reason == "requests_per_minute"
+    assert exc.value.retry_after == 1
+
+    # Other users have their own buckets.
+    limiter.admit(8)
+
+    clock.now += 1.0
+    limiter.admit(7)
+
+
+def test_token_debt_and_daily_budget_block_turns():
+    clock = _Clock()
+    limiter = AdmissionController(
+        tokens_per_minute=600, token_burst=100, daily_token_budget=1000, clock=clock
+    )
+
+    limiter.admit(1)
+    limiter.record_usage(1, {"prompt_tokens": 150, "completion_tokens": 50})
+    with pytest.raises(RateLimitExceeded) as exc:
+        limiter.admit(1)
+    assert exc.value.reason == "tokens_per_minute"
+    assert exc.value.retry_after == 10  # 100 tokens of debt at 10 tokens/s
+
+    clock.now += 10
+    limiter.admit(1)
+    limiter.record_usage(1, {"prompt_tokens": 800, "completion_tokens": 0})
+    clock.now += 60
+    with pytest.raises(RateLimitExceeded) as exc:
+        limiter.admit(1)
+    assert exc.value.reason == "daily_token_budget"
+
+    clock.now += exc.value.retry_after
+    limiter.admit(1)
+
+
+def test_state_survives_a_restart():
+    clock = _Clock()
+    limiter = AdmissionController(requests_per_minute=60, request_burst=2, clock=clock)
+    limiter.admit(3)
+    limiter.admit(3)
+    limiter.record_usage(3, {"prompt_tokens": 10, "completion_tokens": 5})
+
+    rows = limiter.dirty_states()
+    assert [row["user_id"] for row in rows] == [3]
+    assert limiter.dirty_states() == []
+
+    restarted = AdmissionController(requests_per_minute=60, request_burst=2, clock=clock)
+    restarted.restore([RateLimitState(**row) for row in rows])
+    with pytest.raises(RateLimitExceeded):
+        restarted.admit(3)
+    restarted.record_usage(3, {"prompt_tokens": 5})
+    assert restarted.dirty_states()[0]["day_tokens"] == 20
+
+
+def test_turn_endpoint_returns_429_with_retry_after(monkeypatch):
+    user_id = _create_user(f"{uuid.uuid4().hex}@limited.com")
+    limiter = AdmissionController(requests_per_minute=1, request_burst=1)
+    monkeypatch.setattr(rate_limiter, "_controller", limiter)
+
+    resp = client.post(
+        "/conversations",
+        json={"user_id": user_id, "mode": "open", "first_message": "First turn"},
+    )
+    assert resp.status_code == 201
+    conversation_id = resp.json()["id"]
+
+    resp = client.post(
+        f"/conversations/{conversation_id}/messages", json={"content": "Too soon"}
+    )
+    assert resp.status_code == 429
+    assert resp.headers["Retry-After"] == "60"
+    body = resp.json()["error"]
+    assert body["code"] == "RATE_LIMITED"
+    assert body["details"]["reason"] == "requests_per_minute"
+
+    # The refused turn was not stored.
+    detail = client.get(f"/conversations/{conversation_id}").json()
+    assert len(detail["messages"]) == 2
+
+
+def test_flush_writes_changed_users(monkeypatch):
+    user_id = _create_user(f"{uuid.uuid4().hex}@limited.com")
+    limiter = AdmissionController()
+    monkeypatch.setattr(rate_limiter, "_controller", limiter)
+    limiter.admit(user_id)
+    limiter.record_usage(user_id, {"prompt_tokens": 40, "completion_tokens": 2})
+
+    asyncio.run(flush_rate_limit_state())
+
+    db = SessionLocal()
+    try:
+        row = db.scalars(
+            select(RateLimitState).where(RateLimitState.user_id == user_id)
+        ).one()
+    finally:
+        db.close()
+    assert row.day_tokens == 42
+    assert row.month_tokens == 42
@@ -0,0 +1,139 @@
+from fastapi.testclient import TestClient
+
+from app.core.database import SessionLocal
+from app.models.models import DocumentChunk
+from app.services.context_builder import select_context_chunks
+from app.services.ingestion import split_into_chunks
+from app.services.text_index import bm25_scores, tokenize
+from main import app
+
+
+client = TestClient(app)
+
+
+def _create_user(email: str):
+    resp = client.post(
+        "/users",
+        json={
+            "email": email,
+            "full_name": "Retrieval User",
+        },
+    )
+    assert resp.status_code in (200, 201, 400)
+    if resp.status_code == 400:
+        return 1
+    return resp.json()["id"]
+
+
+def _create_document(user_id: int, name: str, raw_text: str) -> int:
+    resp = client.post(
+        "/documents",
+        json={
+            "user_id": user_id,
+            "name": name,
+            "raw_text": raw_text,
+        },
+    )
+    assert resp.status_code == 201
+    return resp.json()["id"]
+
+
+def test_tokenize_drops_short_words():
+    assert tokenize("What is a Python list?") == ["what", "python", "list"]
+
+
+def test_bm25_ranks_matching_document_first():
+    user_id = _create_user("retrieval1@example.com")
+    python_doc = _create_document(
+        user_id,
+        "Python",
+        "Python lists are ordered. Python dictionaries map keys to values.",
+    )
+    cooking_doc = _create_document(
+        user_id,
+        "Cooking",
+        "Boil the pasta for ten minutes and season the sauce.",
+    )
+
+    db = SessionLocal()
+    try:
+        scores = bm25_scores(db, tokenize("python lists"), [python_doc, cooking_doc])
+        matched_docs = {
+            db.get(DocumentChunk, chunk_id).document_id for chunk_id in scores
+        }
+    finally:
+        db.close()
+
+    assert matched_docs == {python_doc}
+
+
+def test_long_tokens_sharing_a_prefix_index_once():
+    user_id = _create_user("retrieval-long@example.com")
+    doc_id = _create_document(
+        user_id,
+        "Long tokens",
+        "_" * 120 + " " + "_" * 150,
+    )
+
+    db = SessionLocal()
+    try:
+        scores = bm25_scores(db, ["_" * 130], [doc_id])
+    finally:
+        db.close()
+
+    assert len(scores) == 1
+
+
+def test_split_into_chunks_overlaps_and_covers_text():
+    text = " ".join(f"word{i}" for i in range(200))
+    spans = split_into_chunks(text, chunk_size=100, overlap=20)
+
+    assert spans[0][0] == 0
+    assert spans[-1][1] == len(text)
+    for (_, prev_end), (start, end) in zip(spans, spans[1:]):
+        assert start < prev_end
+        assert end - start <= 100
+
+
+def test_select_context_chunks_returns_relevant_passage_within_budget():
+    user_id = _create_user("retrieval3@example.com")
+    filler = " ".join(["lorem ipsum dolor sit amet"] * 200)
+    doc_id = _create_document(
+        user_id,
+        "Manual",
+        f"{filler} The reactor coolant pump must be inspected weekly. {filler}",
+    )
+
+    db = SessionLocal()
+    try:
+        selected = select_context_chunks(
+            db, [doc_id], "How often is the coolant pump inspected?", max_chars=1000
+        )
+    finally:
+        db.close()
+
+    assert selected
+    assert sum(len(chunk.content) for chunk, _ in selected) <= 1000
+    assert "coolant pump" in selected[0][0].content
+
+
+def test_grounded_conversation_uses_linked_documents():
+    user_id = _create_user("retrieval2@example.com")
+    doc_id = _create_document(
+        user_id,
+        "Guide",
+        "FastAPI is a web framework for building APIs with Python.",
+    )
+
+    resp = client.post(
+        "/conversations",
+        json={
+            "user_id": user_id,
+            "mode": "grounded",
+            "first_message": "What is FastAPI?",
+            "document_ids": [doc_id],
+        },
+    )
+    assert resp.status_code == 201
+    assistant = resp.json()["messages"][1]
+    assert "retrieved context" in assistant["content"]
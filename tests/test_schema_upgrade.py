@@ -0,0 +1,111 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from app.api.conversations import _conversation_page_query
+from app.api.pagination import decode_cursor, encode_cursor
+from app.models.models import Base
+
+
+# Tables as created by the first release, before the denormalized
+# counters, chunking and token caching were added.
+_OLD_SCHEMA = (
+    """
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY, email VARCHAR(255) NOT NULL UNIQUE,
+        full_name VARCHAR(255), created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE conversations (
+        id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id),
+        mode VARCHAR(50) NOT NULL, title VARCHAR(255), is_archived BOOLEAN NOT NULL,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE messages (
+        id INTEGER PRIMARY KEY, conversation_id INTEGER NOT NULL REFERENCES conversations (id),
+        role VARCHAR(20) NOT NULL, content TEXT NOT NULL, order_index INTEGER NOT NULL,
+        prompt_tokens INTEGER, completion_tokens INTEGER,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE documents (
+        id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id),
+        name VARCHAR(255) NOT NULL, source_type VARCHAR(50), storage_path VARCHAR(500),
+        raw_text TEXT, created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "INSERT INTO users (id, email) VALUES (1, 'old@example.com')",
+    "INSERT INTO conversations (id, user_id, mode, is_archived) VALUES (1, 1, 'open', 0)",
+    """
+    INSERT INTO messages (conversation_id, role, content, order_index) VALUES
+        (1, 'user', 'Hi', 1), (1, 'assistant', 'Hello', 2), (1, 'user', 'Bye', 3)
+    """,
+    "INSERT INTO documents (id, user_id, name, raw_text) VALUES (1, 1, 'Old doc', 'Old text')",
+)
+
+
+def _old_database(tmp_path, *statements):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for statement in _OLD_SCHEMA + statements:
+            conn.execute(text(statement))
+    return engine
+
+
+def test_create_all_upgrades_an_old_database(tmp_path):
+    engine = _old_database(tmp_path)
+
+    Base.metadata.create_all(engine)
+    # A second start finds nothing left to add.
+    Base.metadata.create_all(engine)
+
+    inspector = inspect(engine)
+    assert {"next_seq", "message_count", "cache_enabled"} <= {
+        c["name"] for c in inspector.get_columns("conversations")
+    }
+    assert "uq_message_conversation_order" in {
+        i["name"] for i in inspector.get_indexes("messages") if i["unique"]
+    }
+    with engine.connect() as conn:
+        conversation = conn.execute(
+            text("SELECT next_seq, message_count, last_message_at, cache_enabled FROM conversations")
+        ).one()
+        document = conn.execute(
+            text("SELECT index_status, chunk_count FROM documents")
+        ).one()
+
+    assert conversation.next_seq == 4
+    assert conversation.message_count == 3
+    assert conversation.last_message_at is not None
+    assert conversation.cache_enabled == 1
+    assert tuple(document) == ("pending", 0)
+    engine.dispose()
+
+
+def test_conversation_listing_pages_to_the_end_after_upgrade(tmp_path):
+    # Server-default timestamps, several of them equal.
+    engine = _old_database(
+        tmp_path,
+        "INSERT INTO conversations (id, user_id, mode, is_archived) VALUES "
+        "(2, 1, 'open', 0), (3, 1, 'open', 0), (4, 1, 'open', 0), (5, 1, 'open', 0)",
+    )
+    Base.metadata.create_all(engine)
+
+    seen, after = [], None
+    with Session(engine) as db:
+        for _ in range(5):
+            page = db.scalars(_conversation_page_query(1, 2, after)).all()
+            if not page:
+                break
+            seen += [conversation.id for conversation in page]
+            # Round-trip through the cursor like the API does.
+            after = decode_cursor(encode_cursor(page[-1].updated_at, page[-1].id), datetime, int)
+
+    assert seen == [5, 4, 3, 2, 1]
+    engine.dispose()
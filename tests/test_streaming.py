@@ -0,0 +1,136 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from app.api import conversations
+from app.core.database import engine
+from app.services.llm_client import AsyncReplyStream, LLMProviderError
+from main import app
+
+
+client = TestClient(app)
+
+
+def _create_conversation(email: str) -> int:
+    resp = client.post(
+        "/users",
+        json={
+            "email": email,
+            "full_name": "Streaming User",
+        },
+    )
+    assert resp.status_code in (200, 201, 400)
+    user_id = 1 if resp.status_code == 400 else resp.json()["id"]
+
+    resp = client.post(
+        "/conversations",
+        json={
+            "user_id": user_id,
+            "mode": "open",
+            "first_message": "Hi",
+        },
+    )
+    assert resp.status_code == 201
+    return resp.json()["id"]
+
+
+def _parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_sse_stream_emits_deltas_and_stores_reply():
+    conv_id = _create_conversation("stream1@example.com")
+
+    resp = client.post(
+        f"/conversations/{conv_id}/messages/stream",
+        json={"content": "Stream this"},
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+
+    events = _parse_sse(resp.text)
+    kinds = [kind for kind, _ in events]
+    assert kinds[0] == "message"
+    assert kinds[-1] == "done"
+    assert kinds.count("delta") > 1
+
+    streamed = "".join(data["delta"] for kind, data in events if kind == "delta")
+    done = events[-1][1]
+    assert done["role"] == "assistant"
+    assert done["content"] == streamed
+    assert done["completion_tokens"] > 0
+
+    detail = client.get(f"/conversations/{conv_id}").json()
+    assert detail["messages"][-1]["content"] == streamed
+
+
+def test_websocket_streams_reply():
+    conv_id = _create_conversation("stream2@example.com")
+
+    with client.websocket_connect(f"/conversations/{conv_id}/ws") as ws:
+        ws.send_json({"content": "Over the socket"})
+
+        first = ws.receive_json()
+        assert first["type"] == "message"
+        assert first["message"]["content"] == "Over the socket"
+
+        deltas = []
+        while True:
+            event = ws.receive_json()
+            if event["type"] == "done":
+                break
+            assert event["type"] == "delta"
+            deltas.append(event["delta"])
+
+        assert event["message"]["content"] == "".join(deltas)
+        assert "Over the socket" in event["message"]["content"]
+
+
+def test_websocket_reports_failed_reply_and_stays_open(monkeypatch):
+    conv_id = _create_conversation("stream3@example.com")
+
+    def failing_stream(**kwargs):
+        raise LLMProviderError("provider unavailable")
+
+    with client.websocket_connect(f"/conversations/{conv_id}/ws") as ws:
+        with monkeypatch.context() as patch:
+            patch.setattr(conversations, "astream_reply", failing_stream)
+            ws.send_json({"content": "This one fails"})
+            assert ws.receive_json()["type"] == "message"
+            assert ws.receive_json()["type"] == "error"
+
+        ws.send_json({"content": "This one works"})
+        assert ws.receive_json()["type"] == "message"
+        while True:
+            event = ws.receive_json()
+            if event["type"] != "delta":
+                break
+        assert event["type"] == "done"
+
+
+def test_streams_hold_no_connection_while_generating(monkeypatch):
+    conv_id = _create_conversation("stream4@example.com")
+    checked_out = []
+
+    def recording_stream(**kwargs):
+        async def deltas():
+            for word in ("Hello", " there"):
+                checked_out.append(engine.sync_engine.pool.checkedout())
+                yield word
+
+        return AsyncReplyStream(deltas(), lambda text: {"prompt_tokens": 1, "completion_tokens": 2})
+
+    monkeypatch.setattr(conversations, "astream_reply", recording_stream)
+    resp = client.post(f"/conversations/{conv_id}/messages/stream", json={"content": "SSE"})
+    assert _parse_sse(resp.text)[-1][0] == "done"
+
+    with client.websocket_connect(f"/conversations/{conv_id}/ws") as ws:
+        ws.send_json({"content": "Socket"})
+        while ws.receive_json()["type"] != "done":
+            pass
+
+    assert checked_out == [0, 0, 0, 0]
@@ -0,0 +1,84 @@
+import logging
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.core.tracing import TraceContextFilter, start_span
+from main import app
+
+
+client = TestClient(app)
+
+
+def _create_user(email: str):
+    resp = client.post("/users", json={"email": email, "full_name": "Trace User"})
+    if resp.status_code == 400:
+        return 1
+    return resp.json()["id"]
+
+
+def test_grounded_turn_trace_has_stage_and_sql_spans():
+    user_id = _create_user(f"{uuid.uuid4().hex}@tracing.com")
+    doc = client.post(
+        "/documents",
+        json={"user_id": user_id, "name": "Cats", "raw_text": "Cats like warm milk."},
+    ).json()
+
+    resp = client.post(
+        "/conversations",
+        json={
+            "user_id": user_id,
+            "mode": "grounded",
+            "first_message": "What do cats like?",
+            "document_ids": [doc["id"]],
+        },
+    )
+    assert resp.status_code == 201
+    trace_id = resp.headers["X-Trace-Id"]
+
+    trace = client.get(f"/debug/traces/{trace_id}").json()
+    assert trace["name"] == "POST /conversations"
+    spans = trace["spans"]
+    names = {s["name"] for s in spans}
+    assert {"context.build_rag_passages", "llm.generate_reply", "db.query"} <= names
+
+    root = next(s for s in spans if s["parent_id"] is None)
+    assert root["attributes"]["http.status_code"] == 201
+    # Writes run on the writer thread but still join the request's trace.
+    assert any(
+        s["name"] == "db.query" and s["attributes"]["db.statement"].startswith("INSERT INTO messages")
+        for s in spans
+    )
+    assert all(s["trace_id"] == trace_id for s in spans)
+
+    listed = client.get("/debug/traces", params={"limit": 5}).json()
+    assert trace_id in [t["trace_id"] for t in listed]
+
+
+def test_incoming_traceparent_is_continued():
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    resp = client.get(
+        "/users/1",
+        headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"},
+    )
+    assert resp.headers["X-Trace-Id"] == trace_id
+
+    trace = client.get(f"/debug/traces/{trace_id}").json()
+    root = trace["spans"][0]
+    assert root["parent_id"] == "00f067aa0ba902b7"
+
+
+def test_log_records_carry_trace_id():
+    log_filter = TraceContextFilter()
+    record = logging.LogRecord("t", logging.INFO, __file__, 1, "msg", (), None)
+
+    log_filter.filter(record)
+    assert record.trace_id == "-"
+
+    with start_span("test", root=True) as span:
+        log_filter.filter(record)
+    assert record.trace_id == span.trace_id
+
+
+def test_unknown_trace_is_404():
+    assert client.get("/debug/traces/does-not-exist").status_code == 404
@@ -0,0 +1,85 @@
+import uuid
+from datetime import date, timedelta
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.usage import rebuild_usage_rollups
+from main import app
+
+
+client = TestClient(app)
+
+
+def _create_user(email: str):
+    resp = client.post("/users", json={"email": email, "full_name": "Usage User"})
+    if resp.status_code == 400:
+        return 1
+    return resp.json()["id"]
+
+
+def _chat(user_id: int, turns: int) -> list:
+    resp = client.post(
+        "/conversations",
+        json={"user_id": user_id, "mode": "open", "first_message": "Usage opener"},
+    )
+    assert resp.status_code == 201
+    conv_id = resp.json()["id"]
+    for i in range(turns):
+        client.post(f"/conversations/{conv_id}/messages", json={"content": f"Usage turn {i}"})
+    messages = client.get(f"/conversations/{conv_id}").json()["messages"]
+    return [m for m in messages if m["role"] == "assistant"]
+
+
+def test_usage_report_reads_rollups_written_with_replies():
+    user_id = _create_user(f"{uuid.uuid4().hex}@usage.com")
+    replies = _chat(user_id, turns=2)
+    assert {m["model"] for m in replies} == {settings.LLM_MODEL_NAME}
+
+    report = client.get(f"/users/{user_id}/usage").json()
+    assert report["message_count"] == 3
+    assert report["prompt_tokens"] == sum(m["prompt_tokens"] for m in replies)
+    assert report["completion_tokens"] == sum(m["completion_tokens"] for m in replies)
+    assert report["total_tokens"] == report["prompt_tokens"] + report["completion_tokens"]
+    assert report["cost"] is None
+    (row,) = report["rows"]
+    assert row["model"] == settings.LLM_MODEL_NAME
+    assert row["message_count"] == 3
+
+    tomorrow = (date.fromisoformat(row["day"]) + timedelta(days=1)).isoformat()
+    empty = client.get(f"/users/{user_id}/usage", params={"start": tomorrow}).json()
+    assert empty["message_count"] == 0
+    assert empty["rows"] == []
+
+
+def test_usage_report_groups_and_prices(monkeypatch):
+    user_id = _create_user(f"{uuid.uuid4().hex}@usage.com")
+    _chat(user_id, turns=1)
+    monkeypatch.setitem(
+        settings.LLM_TOKEN_PRICES,
+        settings.LLM_MODEL_NAME,
+        {"prompt": 1.0, "completion": 2.0},
+    )
+
+    report = client.get(f"/users/{user_id}/usage", params={"group_by": "model"}).json()
+    (row,) = report["rows"]
+    assert row["day"] is None
+    assert row["cost"] == (row["prompt_tokens"] + 2 * row["completion_tokens"]) / 1000
+    assert report["cost"] == row["cost"]
+
+
+def test_backfill_rebuilds_identical_rollups():
+    user_id = _create_user(f"{uuid.uuid4().hex}@usage.com")
+    _chat(user_id, turns=3)
+    before = client.get(f"/users/{user_id}/usage").json()
+
+    counted = rebuild_usage_rollups(SessionLocal, batch_size=2)
+
+    assert counted >= 4
+    assert client.get(f"/users/{user_id}/usage").json() == before
+
+
+def test_usage_for_unknown_user_is_404():
+    resp = client.get("/users/999999/usage")
+    assert resp.status_code == 404
@@ -0,0 +1,117 @@
+import uuid
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import DocumentChunk
+from app.services.context_builder import rank_context_chunks
+from app.services import vector_index
+from app.services.embeddings import HashingEmbedder
+from app.services.vector_index import VectorIndex, get_user_index, vector_scores
+from main import app
+
+
+client = TestClient(app)
+
+
+def _create_user(email: str):
+    resp = client.post(
+        "/users",
+        json={
+            "email": email,
+            "full_name": "Vector User",
+        },
+    )
+    assert resp.status_code in (200, 201, 400)
+    if resp.status_code == 400:
+        return 1
+    return resp.json()["id"]
+
+
+def _create_document(user_id: int, name: str, raw_text: str) -> int:
+    resp = client.post(
+        "/documents",
+        json={
+            "user_id": user_id,
+            "name": name,
+            "raw_text": raw_text,
+        },
+    )
+    assert resp.status_code == 201
+    return resp.json()["id"]
+
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    embedder = HashingEmbedder(dim=64)
+    first = embedder.embed(["Inspecting the pumps", "", "inspection of a pump"])
+    second = embedder.embed(["Inspecting the pumps"])
+
+    assert first.dtype == np.float32 and first.shape == (3, 64)
+    assert np.array_equal(first[0], second[0])
+    assert np.isclose(np.linalg.norm(first[0]), 1.0)
+    assert not first[1].any()
+    # Shared character trigrams make related word forms similar.
+    assert first[0] @ first[2] > 0.3
+
+
+def test_ivf_search_matches_exact_search_for_nearest_neighbour():
+    rng = np.random.default_rng(7)
+    vectors = rng.standard_normal((2000, 32)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    chunk_ids = np.arange(1, 2001)
+    document_ids = np.repeat(np.arange(20), 100)
+
+    exact = VectorIndex(chunk_ids, document_ids, vectors, ivf_min_vectors=10**9)
+    ivf = VectorIndex(chunk_ids, document_ids, vectors, ivf_min_vectors=1000)
+    assert exact.centroids is None and ivf.centroids is not None
+
+    query = vectors[500]
+    all_docs = list(range(20))
+    assert exact.search(query, all_docs, 5)[0][0] == 501
+    assert ivf.search(query, all_docs, 5, nprobe=4)[0][0] == 501
+    # Restricting to other documents never returns rows outside them.
+    hits = ivf.search(query, [0, 1], 5, nprobe=44)
+    assert hits and all(chunk_id <= 200 for chunk_id, _ in hits)
+
+
+def test_hybrid_ranking_finds_passage_without_literal_match():
+    user_id = _create_user("vector1@example.com")
+    doc_id = _create_document(
+        user_id,
+        "Maintenance",
+        "Pumps require weekly inspections by certified technicians. "
+        + " ".join(["Unrelated filler about cafeteria menus and parking."] * 40),
+    )
+
+    db = SessionLocal()
+    try:
+        semantic = vector_scores(db, [doc_id], "inspecting pump", limit=3)
+        ranked = rank_context_chunks(db, [doc_id], "inspecting pump", limit=1)
+        best_chunk = db.get(DocumentChunk, max(semantic, key=semantic.get))
+    finally:
+        db.close()
+
+    assert "inspections" in best_chunk.content
+    assert "inspections" in ranked[0][0].content
+    assert ranked[0][1] > 0
+
+
+def test_user_index_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_INDEX_CACHE_USERS", 2)
+    monkeypatch.setattr(vector_index, "_indexes", vector_index.OrderedDict())
+    first, second, third = (
+        _create_user(f"{uuid.uuid4().hex}@vector.com") for _ in range(3)
+    )
+
+    db = SessionLocal()
+    try:
+        get_user_index(db, first)
+        get_user_index(db, second)
+        get_user_index(db, first)
+        get_user_index(db, third)
+    finally:
+        db.close()
+
+    assert list(vector_index._indexes) == [first, third]
@@ -0,0 +1,104 @@
+import asyncio
+import sqlite3
+import threading
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+
+from app.core.database import AsyncSessionLocal, SessionLocal, run_blocking, sync_engine
+from app.core.error_handlers import _is_database_busy
+from app.core.write_queue import WriteQueue
+from app.models.models import User
+from main import app
+
+
+client = TestClient(app)
+
+
+def test_sqlite_connections_use_wal_profile():
+    with sync_engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+
+def _insert_user(db, email):
+    db.add(User(email=email, full_name="Queued"))
+    db.flush()
+    return email
+
+
+def _fail(db, message):
+    db.add(User(email=f"{uuid.uuid4().hex}@rolled-back.com", full_name="Gone"))
+    db.flush()
+    raise ValueError(message)
+
+
+def test_write_queue_group_commits_and_isolates_failures():
+    write_queue = WriteQueue(max_batch=64)
+    gate = threading.Event()
+    prefix = uuid.uuid4().hex
+    emails = [f"{prefix}-{i}@queue.com" for i in range(10)]
+
+    async def run():
+        # Hold the writer so the following jobs queue up behind it.
+        blocker = asyncio.ensure_future(write_queue.submit(lambda db: gate.wait(5)))
+        await asyncio.sleep(0.05)
+        jobs = [write_queue.submit(_insert_user, email) for email in emails]
+        jobs.append(write_queue.submit(_fail, "boom"))
+        pending = asyncio.gather(*jobs, return_exceptions=True)
+        await asyncio.sleep(0.05)
+        gate.set()
+        await blocker
+        return await pending
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        write_queue.stop()
+
+    assert results[:-1] == emails
+    assert isinstance(results[-1], ValueError)
+    # The blocker, then everything queued behind it in one commit.
+    assert write_queue.batches == 2
+    assert write_queue.jobs == 12
+
+    db = SessionLocal()
+    try:
+        stored = db.scalars(select(User.email).where(User.email.like(f"{prefix}-%"))).all()
+        rolled_back = db.scalars(
+            select(User.email).where(User.email.like("%@rolled-back.com"))
+        ).all()
+    finally:
+        db.close()
+    assert sorted(stored) == sorted(emails)
+    assert rolled_back == []
+
+
+def test_locked_database_is_reported_as_busy():
+    locked = OperationalError("INSERT", {}, sqlite3.OperationalError("database is locked"))
+    other = OperationalError("INSERT", {}, sqlite3.OperationalError("no such table: x"))
+    assert _is_database_busy(locked)
+    assert not _is_database_busy(other)
+
+
+def test_duplicate_user_rejected_through_queue():
+    email = f"{uuid.uuid4().hex}@queue.com"
+    first = client.post("/users", json={"email": email, "full_name": "A"})
+    second = client.post("/users", json={"email": email, "full_name": "B"})
+    assert first.status_code == 201
+    assert second.status_code == 400
+
+
+def test_run_blocking_leaves_the_event_loop_under_run_sync():
+    async def main():
+        loop_thread = threading.get_ident()
+        async with AsyncSessionLocal() as db:
+            worker = await db.run_sync(lambda _: run_blocking(threading.get_ident))
+        return loop_thread, worker
+
+    loop_thread, worker = asyncio.run(main())
+    assert worker != loop_thread
+    assert run_blocking(threading.get_ident) == threading.get_ident()